@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('icon.ico', '.')],
-    hiddenimports=[],
+    hiddenimports=['requests', 'urllib3', 'keyring', 'pystray', 'PIL.ImageDraw', 'tkinter', 'tkinter.ttk', 'windows_toasts', 'http.server'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
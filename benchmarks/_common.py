@@ -0,0 +1,105 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(fake_key: bool = True, root: str = ROOT):
+    """Import ``main`` headlessly with the API key and network pointed at stubs.
+
+    ``root`` selects the tree ``main`` is imported from, e.g. a worktree of
+    an older commit to compare against.
+    """
+    # pystray picks a display backend at import time; the dummy one needs no X server.
+    os.environ.setdefault('PYSTRAY_BACKEND', 'dummy')
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import main
+    if fake_key:
+        main.get_api_key = lambda: 'bench-key'
+    # Every call should reach the stand-in server; keep the user's cache and
+    # translation memory untouched.
+    main.update_config({'cache_enabled': False, 'tm_enabled': False})
+    main.CACHE_DIR = tempfile.mkdtemp(prefix='copypolish-bench-')
+    main.TM_PATH = os.path.join(tempfile.mkdtemp(prefix='copypolish-bench-'), 'tm.sqlite3')
+    return main
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(label, samples_s):
+    ms = [v * 1000.0 for v in samples_s]
+    print(
+        f'{label:<28} n={len(ms):<4} mean={statistics.fmean(ms):8.2f} ms  '
+        f'p50={percentile(ms, 50):8.2f} ms  p95={percentile(ms, 95):8.2f} ms'
+    )
+
+
+class FakeClipboard:
+    """In-memory stand-in for ``pyperclip`` in trees without ``set_clipboard_backend``."""
+
+    def __init__(self, text: str = ''):
+        self.text = text
+        self.lock = threading.Lock()
+
+    def copy(self, text):
+        with self.lock:
+            self.text = str(text)
+
+    def paste(self) -> str:
+        with self.lock:
+            return self.text
+
+
+class FakeKeyboard:
+    """Stand-in for ``keyboard``: ctrl+c copies ``selection``, ctrl+v records the clipboard."""
+
+    def __init__(self, clipboard: FakeClipboard, copy_delay: float = 0.0):
+        self.clipboard = clipboard
+        self.copy_delay = copy_delay
+        self.selection = ''
+        self.pasted = []
+        self.lock = threading.Lock()
+
+    def send(self, keys):
+        if keys == 'ctrl+c':
+            selection = self.selection
+            # Like a real app, the copy lands asynchronously after the keystroke
+            threading.Timer(self.copy_delay, self.clipboard.copy, args=(selection,)).start()
+        elif keys == 'ctrl+v':
+            with self.lock:
+                self.pasted.append(self.clipboard.paste())
+
+    def release(self, key):
+        pass
+
+    def add_hotkey(self, hotkey, callback, suppress=False):
+        return hotkey
+
+    def remove_hotkey(self, handle):
+        pass
+
+
+def install_fake_io(app, copy_delay: float = 0.0):
+    """Swap the app's clipboard and keyboard modules for in-memory fakes."""
+    if hasattr(app, 'set_clipboard_backend'):
+        clipboard = app.MemoryClipboard()
+        app.set_clipboard_backend(clipboard)
+    else:
+        # Trees from before the clipboard backends (replay_trace --app-root) call pyperclip directly
+        clipboard = FakeClipboard()
+        app.pyperclip = clipboard
+    keyboard = FakeKeyboard(clipboard, copy_delay)
+    app.keyboard = keyboard
+    app.show_notification = lambda *args, **kwargs: None
+    return clipboard, keyboard
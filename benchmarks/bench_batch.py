@@ -0,0 +1,67 @@
+"""Batch mode throughput: the same folder of drafts at several concurrency levels.
+
+Creates ``--files`` synthetic drafts, then runs ``run_batch`` against the
+stand-in server once per ``--concurrency`` value (fresh output folder each
+time), and finally re-runs the last level to show that finished files are
+skipped on resume.
+
+    python benchmarks/bench_batch.py --files 40 --latency 0.3 --concurrency 1 4 8
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from _common import load_app
+from stub_server import StubOpenRouter
+
+TEXT = (
+    'Merhaba,\n\nekteki raporu inceleyip görüşlerinizi paylaşabilir misiniz? '
+    'Toplantı yarın saat onda yapılacak, lütfen katılım durumunuzu bildirin.\n\nTeşekkürler\n'
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--files', type=int, default=40)
+    ap.add_argument('--latency', type=float, default=0.3)
+    ap.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix='copypolish-batch-')
+    # run_batch() loads config.json; keep it away from the user's real one
+    app.CONFIG_PATH = os.path.join(work, 'config.json')
+    src = os.path.join(work, 'drafts')
+    os.makedirs(src)
+    for i in range(args.files):
+        with open(os.path.join(src, f'draft{i:03d}.txt'), 'w', encoding='utf-8') as f:
+            f.write(f'#{i} ' + TEXT)
+
+    try:
+        with StubOpenRouter(latency=args.latency) as stub:
+            with open(app.CONFIG_PATH, 'w', encoding='utf-8') as f:
+                json.dump({'api_base_url': stub.base_url, 'cache_enabled': False}, f)
+            print(f'{"concurrency":>11} {"ok":>4} {"skipped":>7} {"wall s":>7} {"files/s":>8} {"p50 ms":>8} {"p95 ms":>8}')
+            for n in args.concurrency + [args.concurrency[-1]]:
+                out = os.path.join(work, f'out{n}')
+                report = os.path.join(work, 'report.json')
+                with open(os.devnull, 'w') as devnull:
+                    stderr, app.sys.stderr = app.sys.stderr, devnull
+                    try:
+                        app.run_batch([src, '--out', out, '--concurrency', str(n), '--report', report])
+                    finally:
+                        app.sys.stderr = stderr
+                with open(report, encoding='utf-8') as f:
+                    t = json.load(f)['totals']
+                print(
+                    f'{n:>11} {t["ok"]:>4} {t["skipped"]:>7} {t["wall_s"]:>7.2f} {t["files_per_s"]:>8.2f} '
+                    f'{t["p50_ms"]:>8.1f} {t["p95_ms"]:>8.1f}'
+                )
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Cancellation: repeat hotkeys on the same window, and the tray "İptal Et" item.
+
+The stand-in server answers after ``--latency`` seconds and echoes the
+selection, so every paste can be traced back to its hotkey press.
+
+* repeat   - ``--repeats`` presses ``--interval`` apart on one window, each with
+             a new selection, with ``supersede_on_repeat`` off (the old
+             behaviour: every answer is pasted) and on. A paste that is not
+             the newest selection's answer counts as stale.
+* cancel   - one press, then ``cancel_all_tasks()`` after ``--cancel-after``
+             seconds, buffered and streamed: how long until the worker is
+             free again and whether anything reached the document.
+
+    python benchmarks/bench_cancel.py --latency 1.0 --repeats 3 --interval 0.2
+"""
+import argparse
+import time
+
+from _common import install_fake_io, load_app
+from stub_server import StubOpenRouter
+
+
+def repeat(app, keyboard, args, supersede):
+    app.update_config({'supersede_on_repeat': supersede, 'stream_output': False})
+    app.reset_metrics()
+    keyboard.pasted.clear()
+    with StubOpenRouter(latency=args.latency) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        for i in range(args.repeats):
+            keyboard.selection = f'seçim {i}'
+            app.run_hotkey('rewrite')
+            time.sleep(args.interval)
+        t0 = time.perf_counter()
+        app.task_queue.join()
+        done = time.perf_counter() - t0
+        requests = stub.requests
+    newest = f'seçim {args.repeats - 1}'
+    stale = sum(1 for text in keyboard.pasted if newest not in text)
+    counters = app.metrics_snapshot()['counters']
+    print(
+        f'{"repeat " + ("supersede" if supersede else "all"):<18} {len(keyboard.pasted):>6} {stale:>6} '
+        f'{counters.get("tasks_cancelled", 0):>9} {requests:>8} {done:>8.2f}'
+    )
+
+
+def cancel(app, keyboard, args, streaming):
+    app.update_config({'stream_output': streaming})
+    app.reset_metrics()
+    keyboard.pasted.clear()
+    stub_args = {'ttfb': 0.1, 'chunk_delay': args.latency / 40} if streaming else {'latency': args.latency}
+    with StubOpenRouter(**stub_args) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        keyboard.selection = ' '.join(['uzun bir seçim'] * 40)
+        app.run_hotkey('rewrite')
+        time.sleep(args.cancel_after)
+        t0 = time.perf_counter()
+        app.cancel_all_tasks()
+        app.task_queue.join()
+        freed = time.perf_counter() - t0
+    counters = app.metrics_snapshot()['counters']
+    print(
+        f'{"cancel " + ("stream" if streaming else "buffered"):<18} {len(keyboard.pasted):>6} {"-":>6} '
+        f'{counters.get("tasks_cancelled", 0):>9} {"-":>8} {freed:>8.2f}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--latency', type=float, default=1.0)
+    ap.add_argument('--repeats', type=int, default=3)
+    ap.add_argument('--interval', type=float, default=0.2)
+    ap.add_argument('--cancel-after', type=float, default=0.3)
+    args = ap.parse_args()
+
+    app = load_app()
+    _, keyboard = install_fake_io(app, copy_delay=0.01)
+    app.update_config({'worker_count': 4, 'hedge_delay_ms': 60000, 'fallback_models': []})
+    app.start_workers()
+
+    print(f'{"run":<18} {"pastes":>6} {"stale":>6} {"cancelled":>9} {"requests":>8} {"done s":>8}')
+    for supersede in (False, True):
+        repeat(app, keyboard, args, supersede)
+    for streaming in (False, True):
+        cancel(app, keyboard, args, streaming)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Wall-clock time vs. selection size, with and without parallel chunking.
+
+The stand-in answers after ``--latency`` plus ``--per-char`` seconds per
+output character, so a single big request grows linearly with its size
+while chunks of it are generated side by side.
+
+    python benchmarks/bench_chunking.py --sizes 2000 8000 32000
+"""
+import argparse
+import time
+
+from _common import load_app
+from stub_server import StubOpenRouter
+
+PARAGRAPH = (
+    'Merhaba, geçen haftaki toplantıda konuştuğumuz teklif dosyasını güncelledim. '
+    'Fiyat tablosunu ve teslim tarihlerini yeniden kontrol ettim. '
+    'Eksik gördüğünüz bir nokta olursa lütfen bana iletin.'
+)
+
+
+def make_text(size: int) -> str:
+    parts = []
+    while sum(len(p) + 2 for p in parts) < size:
+        parts.append(PARAGRAPH)
+    return '\n\n'.join(parts)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=int, nargs='+', default=[2000, 8000, 16000, 32000])
+    ap.add_argument('--latency', type=float, default=0.2)
+    ap.add_argument('--per-char', type=float, default=0.0001)
+    ap.add_argument('--chunk-size', type=int, default=3000)
+    ap.add_argument('--concurrency', type=int, default=4)
+    args = ap.parse_args()
+
+    app = load_app()
+    app.update_config({'chunk_size_chars': args.chunk_size, 'chunk_concurrency': args.concurrency})
+    with StubOpenRouter(latency=args.latency, per_char_delay=args.per_char) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        print(f'{"chars":>8} {"single":>10} {"chunked":>10} {"speedup":>8}')
+        for size in args.sizes:
+            text = make_text(size)
+            timings = []
+            for threshold in (0, args.chunk_size):  # 0 disables chunking
+                app.update_config({'chunk_threshold_chars': threshold})
+                t0 = time.perf_counter()
+                out = app.rewrite_text(text)
+                timings.append(time.perf_counter() - t0)
+                assert out and out.count('\n\n') >= text.count('\n\n'), 'paragraph breaks lost'
+            single, chunked = timings
+            print(f'{len(text):>8} {single:>9.2f}s {chunked:>9.2f}s {single / chunked:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Clipboard backends: copy/paste round trips, alone and under contention.
+
+Each available backend (``native`` is ``Win32Clipboard`` on Windows and
+``X11Clipboard`` where ``DISPLAY`` is set; ``memory`` shows the cost of the
+abstraction itself) runs ``--count`` round trips of ``copy`` + ``paste`` with
+a ``--size`` character text, timing both calls. Then ``--threads`` threads do
+the same at once for ``--count`` rounds each, and on Windows a further thread
+keeps the clipboard open for ``--hold-ms`` at a time, the way a clipboard
+manager or a slow Office paste does. Failed calls are counted; a round trip
+reading another thread's text is not a failure.
+
+Backends that cannot start here (no display, no xclip/xsel) are reported
+and skipped. The user's clipboard is overwritten.
+
+    python benchmarks/bench_clipboard.py --count 200 --size 2000 --threads 4
+"""
+import argparse
+import os
+import threading
+import time
+
+from _common import load_app, percentile
+
+
+def make_backend(app, name):
+    if name == 'memory':
+        return app.MemoryClipboard()
+    if name == 'pyperclip':
+        backend = app.PyperclipClipboard()
+        # pyperclip only finds out on the first call that it has no clipboard
+        backend.paste()
+        return backend
+    if os.name == 'nt':
+        return app.Win32Clipboard()
+    if not os.getenv('DISPLAY'):
+        raise OSError('DISPLAY is not set')
+    return app.X11Clipboard()
+
+
+def round_trips(backend, count, text, copy_ms, paste_ms, errors):
+    for i in range(count):
+        value = f'{i} {text}'
+        try:
+            t0 = time.perf_counter()
+            backend.copy(value)
+            t1 = time.perf_counter()
+            backend.paste()
+            t2 = time.perf_counter()
+        except Exception:
+            errors.append(i)
+            continue
+        copy_ms.append((t1 - t0) * 1000.0)
+        paste_ms.append((t2 - t1) * 1000.0)
+
+
+def hold_clipboard(stop, hold_s):
+    import ctypes
+    user32 = ctypes.windll.user32
+    while not stop.is_set():
+        if user32.OpenClipboard(None):
+            time.sleep(hold_s)
+            user32.CloseClipboard()
+        time.sleep(hold_s)
+
+
+def run(app, name, args, text):
+    try:
+        backend = make_backend(app, name)
+    except Exception as e:
+        print(f'{name:<16} unavailable: {e}')
+        return
+    label = f'{name}/{backend.name}' if name == 'native' else name
+
+    copy_ms, paste_ms, errors = [], [], []
+    round_trips(backend, args.count, text, copy_ms, paste_ms, errors)
+    print(
+        f'{label:<16} {"alone":<10} {percentile(copy_ms, 50):8.3f} {percentile(copy_ms, 95):8.3f} '
+        f'{percentile(paste_ms, 50):9.3f} {percentile(paste_ms, 95):9.3f} {len(errors):>6}/{args.count}'
+    )
+
+    copy_ms, paste_ms, errors = [], [], []
+    stop = threading.Event()
+    holder = None
+    if os.name == 'nt' and args.hold_ms > 0 and name != 'memory':
+        holder = threading.Thread(target=hold_clipboard, args=(stop, args.hold_ms / 1000.0), daemon=True)
+        holder.start()
+    workers = [
+        threading.Thread(target=round_trips, args=(backend, args.count, text, copy_ms, paste_ms, errors))
+        for _ in range(args.threads)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    stop.set()
+    if holder is not None:
+        holder.join()
+    print(
+        f'{label:<16} {"contended":<10} {percentile(copy_ms, 50):8.3f} {percentile(copy_ms, 95):8.3f} '
+        f'{percentile(paste_ms, 50):9.3f} {percentile(paste_ms, 95):9.3f} '
+        f'{len(errors):>6}/{args.count * args.threads}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=200)
+    ap.add_argument('--size', type=int, default=2000, help='characters per copied text')
+    ap.add_argument('--threads', type=int, default=4)
+    ap.add_argument('--hold-ms', type=float, default=20.0, help='Windows: how long another thread keeps the clipboard open')
+    ap.add_argument('--backends', default='memory,pyperclip,native')
+    args = ap.parse_args()
+
+    app = load_app()
+    text = ('Panoya kopyalanan örnek metin, ğüşiöç. ' * (args.size // 40 + 1))[:args.size]
+    print(f'{"backend":<16} {"mode":<10} {"copy p50":>8} {"copy p95":>8} {"paste p50":>9} {"paste p95":>9}  failed   (ms)')
+    for name in args.backends.split(','):
+        run(app, name.strip(), args, text)
+    print(f'clipboard_busy_retries: {app.metrics_snapshot()["counters"].get("clipboard_busy_retries", 0)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Per-hotkey cost of reading the API key and config.
+
+A keyring backend that sleeps ``--keyring-ms`` per lookup stands in for
+Windows Credential Manager / Secret Service. Compares:
+
+* keyring   - ``get_api_key()`` on every request (the old request path)
+* snapshot  - ``cached_api_key()`` reading the in-memory snapshot
+* config    - ``config.get`` under ``config_lock`` vs. the lock-free snapshot,
+              with ``--threads`` readers hammering it while settings are saved
+
+    python benchmarks/bench_credentials.py --keyring-ms 20
+"""
+import argparse
+import threading
+import time
+
+import keyring
+from keyring.backend import KeyringBackend
+
+from _common import load_app, summarize
+
+
+class SlowKeyring(KeyringBackend):
+    priority = 1
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.store = {}
+        self.lookups = 0
+
+    def get_password(self, service, username):
+        self.lookups += 1
+        time.sleep(self.delay)
+        return self.store.get((service, username))
+
+    def set_password(self, service, username, password):
+        self.store[(service, username)] = password
+
+    def delete_password(self, service, username):
+        self.store.pop((service, username), None)
+
+
+def time_calls(fn, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def config_reads(app, locked, threads, seconds):
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def reader(i):
+        while not stop.is_set():
+            if locked:
+                with app.config_lock:
+                    app.config.get('model')
+            else:
+                app.config.get('model')
+            counts[i] += 1
+
+    def writer():
+        # Settings saved ten times a second, far more often than in real use
+        while not stop.is_set():
+            app.update_config({'stream_output': not app.config.get('stream_output', False)})
+            time.sleep(0.1)
+
+    workers = [threading.Thread(target=reader, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=writer))
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--keyring-ms', type=float, default=20.0)
+    ap.add_argument('--iterations', type=int, default=50)
+    ap.add_argument('--threads', type=int, default=4)
+    ap.add_argument('--seconds', type=float, default=1.0)
+    args = ap.parse_args()
+
+    app = load_app(fake_key=False)
+    backend = SlowKeyring(args.keyring_ms / 1000.0)
+    keyring.set_keyring(backend)
+    keyring.set_password(app.APP_NAME, 'OPENROUTER_API_KEY', 'bench-key')
+
+    summarize('keyring per request', time_calls(app.get_api_key, args.iterations))
+    app.refresh_api_key()
+    backend.lookups = 0
+    summarize('snapshot per request', time_calls(app.cached_api_key, args.iterations))
+    print(f'keyring lookups on the snapshot path: {backend.lookups}')
+
+    for locked in (True, False):
+        rate = config_reads(app, locked, args.threads, args.seconds)
+        print(f'config reads ({"locked" if locked else "snapshot"}, {args.threads} threads): {rate:,.0f}/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""End-to-end benchmark: hotkey -> capture -> worker pool -> stand-in API -> paste.
+
+Everything runs in-process and headless: a local OpenRouter stand-in serves
+the completions and in-memory fakes replace the clipboard and keyboard, so
+the real hotkey work (``run_hotkey``: capture + submit) and
+``processing_worker`` threads are exercised without an API key or a display.
+Presses are replayed back to back, so the hook-side debounce is bypassed;
+``bench_hotkey.py`` covers that part.
+
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --scenario burst-mixed --json run.json
+    python benchmarks/bench_e2e.py --baseline run.json --tolerance 0.25
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from _common import install_fake_io, load_app
+from stub_server import StubOpenRouter
+
+WORDS = (
+    'merhaba ekteki raporu inceleyip görüşlerinizi paylaşabilir misiniz toplantı '
+    'yarın saat onda yapılacak lütfen katılım durumunuzu bildirin teşekkürler'
+).split()
+
+# name -> stand-in settings, app config and the hotkey pattern to replay
+SCENARIOS = {
+    'short-fast': {'stub': {'latency': 0.05}, 'count': 20, 'size': 200},
+    'short-slow': {'stub': {'latency': 0.5}, 'count': 10, 'size': 200},
+    'burst-mixed': {'stub': {'latency': 0.2}, 'count': 30, 'size': 400, 'mixed': True, 'interval': 0.0},
+    'streaming': {
+        'stub': {'ttfb': 0.2, 'chunk_delay': 0.005},
+        'config': {'stream_output': True},
+        'count': 10,
+        'size': 600,
+    },
+    'errors': {'stub': {'latency': 0.1, 'error_rate': 0.2}, 'count': 20, 'size': 200},
+    'throttled': {'stub': {'latency': 0.05, 'rate_limit': 5, 'rate_window': 1.0}, 'count': 20, 'size': 200},
+    'long-chunked': {
+        'stub': {'latency': 0.2, 'per_char_delay': 0.0001},
+        'config': {'chunk_threshold_chars': 4000, 'chunk_size_chars': 2000},
+        'count': 3,
+        'size': 12000,
+    },
+}
+
+
+def make_text(i: int, size: int) -> str:
+    # Distinct per request so neither the cache nor in-flight dedup kicks in
+    out, n = [f'#{i}'], i
+    while sum(len(w) + 1 for w in out) < size:
+        n = (n * 1103515245 + 12345) & 0x7FFFFFFF
+        out.append(WORDS[n % len(WORDS)])
+        if n % 11 == 0:
+            out[-1] += '.\n\n'
+    return ' '.join(out)
+
+
+def run_scenario(app, keyboard, name, spec):
+    defaults = {'stream_output': False, 'chunk_threshold_chars': 0}
+    app.update_config(defaults)
+    app.update_config(spec.get('config', {}))
+    app.reset_metrics()
+    app.reset_model_health()
+    app.rate_limiter.reset()
+    with StubOpenRouter(**spec['stub']) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        keyboard.pasted.clear()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for i in range(spec['count']):
+            keyboard.selection = make_text(i, spec['size'])
+            if spec.get('mixed') and i % 2:
+                app.run_hotkey('translate')
+            else:
+                app.run_hotkey('rewrite')
+            if spec.get('interval'):
+                time.sleep(spec['interval'])
+        app.task_queue.join()
+        wall = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snap = app.metrics_snapshot()
+    e2e = snap['stages'].get('end_to_end', {})
+    done = e2e.get('count', 0)
+    return {
+        'tasks': spec['count'],
+        'succeeded': done,
+        'failed': snap['counters'].get('tasks_failed', 0),
+        'injected_errors': stub.errors,
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(done / wall, 2) if wall else 0.0,
+        'p50_ms': e2e.get('p50_ms', 0.0),
+        'p95_ms': e2e.get('p95_ms', 0.0),
+        'p99_ms': e2e.get('p99_ms', 0.0),
+        'peak_mem_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, cur in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in ('p95_ms', 'p99_ms'):
+            if old.get(key) and cur[key] > old[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {old[key]:.1f} -> {cur[key]:.1f} ms')
+        if old.get('throughput_per_s') and cur['throughput_per_s'] < old['throughput_per_s'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {old['throughput_per_s']:.2f} -> {cur['throughput_per_s']:.2f}/s"
+            )
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these (repeatable)')
+    ap.add_argument('--workers', type=int, default=2)
+    ap.add_argument('--copy-delay', type=float, default=0.02, help='seconds until a fake ctrl+c fills the clipboard')
+    ap.add_argument('--json', help='write results to this file')
+    ap.add_argument('--baseline', help='results file from an earlier run to compare against')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    args = ap.parse_args()
+
+    app = load_app()
+    _, keyboard = install_fake_io(app, copy_delay=args.copy_delay)
+    # Every press is a separate request here; on one fake window they would supersede each other
+    app.update_config({
+        'worker_count': args.workers, 'queue_size': 1000, 'queue_policy': 'reject', 'supersede_on_repeat': False,
+    })
+    app.start_workers()
+
+    results = {}
+    print(f'{"scenario":<14} {"ok":>4} {"fail":>4} {"tput/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"peak KB":>8}')
+    for name in args.scenario or SCENARIOS:
+        r = results[name] = run_scenario(app, keyboard, name, SCENARIOS[name])
+        print(
+            f'{name:<14} {r["succeeded"]:>4} {r["failed"]:>4} {r["throughput_per_s"]:>7.2f} '
+            f'{r["p50_ms"]:>8.1f} {r["p95_ms"]:>8.1f} {r["p99_ms"]:>8.1f} {r["peak_mem_kb"]:>8.1f}'
+        )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Model fallback: success rate and latency with one model vs. a hedged model chain.
+
+The stand-in server plays a flaky free-tier primary model (errors, empty
+``choices``, or slow answers depending on the scenario) and a steady fallback
+model. Each scenario runs ``rewrite_text`` ``--count`` times, first with only
+the primary model configured, then with ``fallback_models`` and hedging.
+
+    python benchmarks/bench_fallback.py --count 40 --hedge-ms 500
+"""
+import argparse
+import time
+
+from _common import load_app, percentile
+from stub_server import StubOpenRouter
+
+PRIMARY = 'qwen/qwen3-coder:free'
+FALLBACK = 'stub/echo'
+
+SCENARIOS = {
+    'flaky': {PRIMARY: {'latency': 0.1, 'error_rate': 0.3, 'error_status': 429, 'empty_rate': 0.1}},
+    'slow': {PRIMARY: {'latency': 2.0, 'ttfb': 2.0}},
+    'down': {PRIMARY: {'latency': 0.05, 'error_rate': 1.0, 'error_status': 503}},
+}
+
+
+def run(app, overrides, count, chain, hedge_ms, stream):
+    app.reset_metrics()
+    app.reset_model_health()
+    app.update_config({
+        'model': PRIMARY,
+        'fallback_models': chain,
+        'hedge_delay_ms': hedge_ms,
+        'stream_output': stream,
+    })
+    overrides = dict(overrides)
+    overrides.setdefault(FALLBACK, {'latency': 0.15, 'ttfb': 0.15})
+    ok, samples = 0, []
+    with StubOpenRouter(model_overrides=overrides) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        for i in range(count):
+            t0 = time.perf_counter()
+            if stream:
+                try:
+                    text = ''.join(app.stream_rewrite_text(f'metin {i}'))
+                except Exception:
+                    text = ''
+            else:
+                text = app.rewrite_text(f'metin {i}')
+            samples.append(time.perf_counter() - t0)
+            ok += bool(text)
+        sent = dict(stub.model_requests)
+    counters = app.metrics_snapshot()['counters']
+    served = {k.split(':', 1)[1]: v for k, v in counters.items() if k.startswith('served_by:')}
+    return ok, samples, served, sent, counters.get('hedged_requests', 0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=30)
+    ap.add_argument('--hedge-ms', type=int, default=500)
+    ap.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    ap.add_argument('--stream', action='store_true', help='use the streaming path')
+    args = ap.parse_args()
+
+    app = load_app()
+    print(f'{"scenario":<8} {"setup":<10} {"ok":>7} {"p50 ms":>8} {"p95 ms":>8} {"hedged":>6}  served / sent')
+    for name in args.scenario or SCENARIOS:
+        for label, chain in (('single', []), ('chain', [FALLBACK])):
+            ok, samples, served, sent, hedged = run(
+                app, SCENARIOS[name], args.count, chain, args.hedge_ms, args.stream
+            )
+            ms = [v * 1000.0 for v in samples]
+            print(
+                f'{name:<8} {label:<10} {ok:>3}/{args.count:<3} {percentile(ms, 50):8.1f} '
+                f'{percentile(ms, 95):8.1f} {hedged:>6}  {served} / {sent}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Re-paste from history vs. a new model call, and the history's memory/disk caps.
+
+Runs ``--count`` rewrites through the real workers against the stand-in
+server (``--latency``), then pastes the newest result again with
+``repaste_history()``. Finally ``--flood`` entries of ``--entry-kb`` KB are
+recorded with ``history_persist`` on, and the ring and SQLite file sizes are
+reported against ``history_size`` / ``history_max_kb``.
+
+    python benchmarks/bench_history.py --latency 0.5 --flood 500 --entry-kb 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from _common import install_fake_io, load_app, summarize
+from stub_server import StubOpenRouter
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=10)
+    ap.add_argument('--latency', type=float, default=0.5)
+    ap.add_argument('--flood', type=int, default=500)
+    ap.add_argument('--entry-kb', type=int, default=8)
+    ap.add_argument('--size', type=int, default=20, help='history_size')
+    ap.add_argument('--max-kb', type=int, default=128, help='history_max_kb')
+    args = ap.parse_args()
+
+    app = load_app()
+    _, keyboard = install_fake_io(app, copy_delay=0.01)
+    work = tempfile.mkdtemp(prefix='copypolish-history-')
+    app.CONFIG_DIR = work
+    app.HISTORY_PATH = os.path.join(work, 'history.sqlite3')
+    app.update_config({
+        'worker_count': 2, 'supersede_on_repeat': False,
+        'history_persist': True, 'history_size': args.size, 'history_max_kb': args.max_kb,
+    })
+    app.start_workers()
+    try:
+        with StubOpenRouter(latency=args.latency) as stub:
+            app.update_config({'api_base_url': stub.base_url})
+            app.close_http_session()
+            calls = []
+            for i in range(args.count):
+                keyboard.selection = f'metin {i}'
+                t0 = time.perf_counter()
+                app.run_hotkey('rewrite')
+                app.task_queue.join()
+                calls.append(time.perf_counter() - t0)
+            summarize('hotkey -> model -> paste', calls)
+            sent = stub.requests
+            repastes = []
+            for _ in range(args.count):
+                t0 = time.perf_counter()
+                app.repaste_history()
+                repastes.append(time.perf_counter() - t0)
+            summarize('re-paste from history', repastes)
+            print(f'API calls during re-paste: {stub.requests - sent}')
+
+        body = 'x' * (args.entry_kb * 512)
+        t0 = time.perf_counter()
+        for i in range(args.flood):
+            app.record_history(
+                {'operation': 'rewrite', 'started': time.perf_counter(), 'text': body, 'target': None}, body
+            )
+        per_entry = (time.perf_counter() - t0) / args.flood * 1000
+        entries = app.history_entries()
+        disk_kb = os.path.getsize(app.HISTORY_PATH) / 1024
+        print(
+            f'after {args.flood} x {args.entry_kb} KB entries: {len(entries)} in memory, '
+            f'{app._history_chars / 1024:.0f} KB text (cap {args.max_kb} KB), '
+            f'SQLite file {disk_kb:.0f} KB, {per_entry:.2f} ms per recorded entry'
+        )
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""How long the keyboard hook is blocked per hotkey, and what debouncing lets through.
+
+While a ``keyboard.add_hotkey`` callback runs, the global hook (and with it
+all typing) waits. Measures, with a clipboard that fills ``--copy-delay``
+seconds after ctrl+c:
+
+* inline    - the capture done directly in the callback (the old handlers)
+* enqueue   - ``on_hotkey_activate`` as registered now
+* auto-repeat - a key held for ``--hold`` seconds (repeat every 33 ms): how
+  many captures actually start
+
+Exits with 1 when the enqueue callback's p99 exceeds ``--budget-us``.
+
+    python benchmarks/bench_hotkey.py --copy-delay 0.05 --budget-us 200
+"""
+import argparse
+import sys
+import time
+
+from _common import install_fake_io, load_app, percentile, summarize
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--presses', type=int, default=200)
+    ap.add_argument('--copy-delay', type=float, default=0.05)
+    ap.add_argument('--hold', type=float, default=1.0)
+    ap.add_argument('--budget-us', type=float, default=200.0)
+    args = ap.parse_args()
+
+    app = load_app()
+    _, keyboard = install_fake_io(app, copy_delay=args.copy_delay)
+    submitted = []
+    # Only the hook side is measured; tasks are recorded, not sent to the API
+    app.submit_task = lambda original, text, operation, started=None: submitted.append(operation)
+    app.start_listener()
+
+    inline = []
+    for i in range(10):
+        keyboard.selection = f'metin {i}'
+        t0 = time.perf_counter()
+        app.run_hotkey('rewrite')
+        inline.append(time.perf_counter() - t0)
+    summarize('inline capture in callback', inline)
+
+    # Distinct presses further apart than the debounce window are all accepted;
+    # the window is set to 0 here so every callback takes the enqueue path.
+    app.update_config({'hotkey_debounce_ms': 0})
+    app.start_capture_thread()
+    enqueue = []
+    for i in range(args.presses):
+        t0 = time.perf_counter()
+        app.on_hotkey_activate()
+        enqueue.append(time.perf_counter() - t0)
+        app._hotkey_pending.clear()
+    summarize('enqueue in callback', enqueue)
+    p99_us = percentile(enqueue, 99) * 1e6
+    print(f'enqueue p99: {p99_us:.1f} us (budget {args.budget_us:.0f} us)')
+
+    # Drain what the enqueue loop produced before the auto-repeat run
+    deadline = time.time() + 30
+    while len(submitted) < 10 + args.presses and time.time() < deadline:
+        time.sleep(0.05)
+    app.update_config({'hotkey_debounce_ms': app.DEFAULT_HOTKEY_DEBOUNCE_MS})
+    app.start_capture_thread()
+    time.sleep(0.5)
+    before = len(submitted)
+    presses, t_end = 0, time.perf_counter() + args.hold
+    keyboard.selection = 'basılı tutulan metin'
+    while time.perf_counter() < t_end:
+        app.on_hotkey_activate()
+        presses += 1
+        time.sleep(0.033)
+    time.sleep(args.copy_delay + 0.5)
+    print(f'auto-repeat: {presses} callbacks in {args.hold:.1f} s -> {len(submitted) - before} capture(s)')
+
+    if p99_us > args.budget_us:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
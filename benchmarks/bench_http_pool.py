@@ -0,0 +1,77 @@
+"""Cold vs. warm OpenRouter call latency against a local stand-in server.
+
+The stand-in sleeps ``--connect-delay`` seconds on every new connection to
+model DNS + TCP + TLS setup, so the numbers show what connection reuse and
+pre-warming save per hotkey press. The script exits with 1 if a warm call
+(after the first pooled one, or after a pre-warm) opens a new connection.
+
+    python benchmarks/bench_http_pool.py --connect-delay 0.08 --latency 0.02
+"""
+import argparse
+import sys
+import time
+
+import requests
+
+from _common import load_app, summarize
+from stub_server import StubOpenRouter
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--iterations', type=int, default=20)
+    ap.add_argument('--connect-delay', type=float, default=0.08)
+    ap.add_argument('--latency', type=float, default=0.02)
+    args = ap.parse_args()
+
+    app = load_app()
+    with StubOpenRouter(latency=args.latency, connect_delay=args.connect_delay) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+
+        # Cold: a bare requests.post per call, i.e. the pre-pooling behaviour.
+        cold = []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            r = requests.post(
+                f'{stub.base_url}/chat/completions',
+                json={'model': 'stub/echo', 'messages': [{'role': 'user', 'content': 'x'}]},
+                timeout=30,
+            )
+            r.raise_for_status()
+            cold.append(time.perf_counter() - t0)
+
+        # Warm: shared pooled session; the first call opens the connection.
+        app.close_http_session()
+        warm = []
+        reconnects = 0
+        for i in range(args.iterations):
+            before = stub.connections
+            t0 = time.perf_counter()
+            assert app.rewrite_text('x')
+            warm.append(time.perf_counter() - t0)
+            reconnects += bool(i) and stub.connections != before
+
+        # Pre-warmed first call: what a hotkey press sees after start_listener().
+        first = []
+        for _ in range(max(1, args.iterations // 4)):
+            app.close_http_session()
+            app._http_last_used = 0.0
+            app._prewarm()
+            before = stub.connections
+            t0 = time.perf_counter()
+            assert app.rewrite_text('x')
+            first.append(time.perf_counter() - t0)
+            reconnects += stub.connections != before
+
+        print(f'stand-in: connect_delay={args.connect_delay * 1000:.0f} ms latency={args.latency * 1000:.0f} ms')
+        summarize('cold (requests.post)', cold)
+        summarize('pooled session', warm)
+        summarize('first call after prewarm', first)
+        print(f'connections opened: {stub.connections}, warm calls that reconnected: {reconnects}')
+    if reconnects:
+        print('FAIL warm calls did not reuse the pooled connection')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Worker time spent on notifications: inline toasts vs. the notification thread.
+
+Runs ``--count`` hotkey presses through the real workers against the
+stand-in server while toasts take ``--toast-ms`` each to show (like a slow
+``WindowsToaster.show_toast``). Reports per mode how long the workers spent
+inside ``show_notification`` and the end-to-end latency, plus how many toasts
+were actually shown after coalescing.
+
+    python benchmarks/bench_notifications.py --count 20 --toast-ms 80
+"""
+import argparse
+import time
+
+from _common import install_fake_io, load_app
+from stub_server import StubOpenRouter
+
+
+def run(app, keyboard, args, asynchronous):
+    app.update_config({'notifications_async': asynchronous})
+    app.reset_metrics()
+    with StubOpenRouter(latency=args.latency) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        for i in range(args.count):
+            keyboard.selection = f'metin {i} ' * 20
+            app.run_hotkey('rewrite')
+        app.task_queue.join()
+        # Let the notification thread drain before reading its counters
+        time.sleep(app.NOTIFY_COALESCE_WINDOW + args.toast_ms / 1000.0 * args.count)
+    snap = app.metrics_snapshot()
+    caller = snap['stages'].get('notify_caller', {})
+    e2e = snap['stages'].get('end_to_end', {})
+    with app._metrics_lock:
+        caller_total = sum(app._metrics.get('notify_caller', ()))
+    print(
+        f'{"async" if asynchronous else "inline":<7} {caller.get("count", 0):>6} {caller_total * 1000:>12.1f} '
+        f'{caller.get("p95_ms", 0.0):>9.2f} {e2e.get("p50_ms", 0.0):>8.1f} {e2e.get("p95_ms", 0.0):>8.1f} '
+        f'{snap["counters"].get("notifications_shown", 0):>6} {snap["counters"].get("notifications_coalesced", 0):>9}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=20)
+    ap.add_argument('--toast-ms', type=float, default=80.0)
+    ap.add_argument('--latency', type=float, default=0.05)
+    args = ap.parse_args()
+
+    app = load_app()
+    show_notification = app.show_notification
+    _, keyboard = install_fake_io(app, copy_delay=0.01)
+    # Keep the real dispatcher; only the toast itself is faked
+    app.show_notification = show_notification
+    app._deliver_notification = lambda title, body='': time.sleep(args.toast_ms / 1000.0)
+    app.update_config({'worker_count': 2, 'queue_size': 1000, 'queue_policy': 'reject', 'supersede_on_repeat': False})
+    app.start_workers()
+
+    print(f'{"mode":<7} {"calls":>6} {"worker ms":>12} {"p95 ms":>9} {"e2e p50":>8} {"e2e p95":>8} {"shown":>6} {"coalesced":>9}')
+    for asynchronous in (False, True):
+        run(app, keyboard, args, asynchronous)
+
+
+if __name__ == '__main__':
+    main()
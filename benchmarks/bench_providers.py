@@ -0,0 +1,75 @@
+"""Endpoint routing: two OpenAI-compatible providers of different speeds.
+
+Two stand-in servers play a slow cloud endpoint (the built-in OpenRouter
+provider, ``--cloud-latency``) and a fast self-hosted one on the LAN
+(``providers`` entry ``lan``, ``--lan-latency``). ``rewrite_text`` runs
+``--count`` times in each phase:
+
+* normal     - both endpoints up
+* lan-down   - the LAN server answers 503 to everything
+* recovered  - the LAN server is back; after ``route_probe_s`` it is tried again
+
+once with ``routing: order`` (always the first provider that works) and once
+with ``routing: latency``. Hedging is off so only the routing decides. The
+breaker cooldown is shortened to ``--cooldown`` seconds for the run.
+
+    python benchmarks/bench_providers.py --count 20 --lan-latency 0.02 --cloud-latency 0.3
+"""
+import argparse
+import time
+
+from _common import load_app, percentile
+from stub_server import StubOpenRouter
+
+
+def phase(app, label, mode, count):
+    app.reset_metrics()
+    samples, ok = [], 0
+    for i in range(count):
+        t0 = time.perf_counter()
+        ok += bool(app.rewrite_text(f'metin {i}'))
+        samples.append(time.perf_counter() - t0)
+    counters = app.metrics_snapshot()['counters']
+    served = {k.split(':', 1)[1]: v for k, v in counters.items() if k.startswith('served_by:')}
+    ms = [v * 1000.0 for v in samples]
+    print(
+        f'{mode:<8} {label:<10} {ok:>3}/{count:<3} {percentile(ms, 50):8.1f} {percentile(ms, 95):8.1f} '
+        f'{sum(ms):9.0f}  {served}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=20)
+    ap.add_argument('--lan-latency', type=float, default=0.02)
+    ap.add_argument('--cloud-latency', type=float, default=0.3)
+    ap.add_argument('--probe-s', type=float, default=1.0)
+    ap.add_argument('--cooldown', type=float, default=1.0)
+    args = ap.parse_args()
+
+    app = load_app()
+    app.BREAKER_COOLDOWN = args.cooldown
+    print(f'{"routing":<8} {"phase":<10} {"ok":>7} {"p50 ms":>8} {"p95 ms":>8} {"total ms":>9}  served')
+    for mode in ('order', 'latency'):
+        app.reset_model_health()
+        with StubOpenRouter(latency=args.cloud_latency) as cloud, StubOpenRouter(latency=args.lan_latency) as lan:
+            app.update_config({
+                'api_base_url': cloud.base_url,
+                'model': 'qwen/qwen3-coder:free',
+                'fallback_models': [],
+                'hedge_delay_ms': 0,
+                'routing': mode,
+                'route_probe_s': args.probe_s,
+                'providers': [{'name': 'lan', 'base_url': lan.base_url, 'model': 'stub/echo'}],
+            })
+            app.close_http_session()
+            phase(app, 'normal', mode, args.count)
+            lan.error_rate, lan.error_status = 1.0, 503
+            phase(app, 'lan-down', mode, args.count)
+            lan.error_rate = 0.0
+            time.sleep(max(args.probe_s, args.cooldown))
+            phase(app, 'recovered', mode, args.count)
+
+
+if __name__ == '__main__':
+    main()
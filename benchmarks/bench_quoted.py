@@ -0,0 +1,135 @@
+"""Replies with quoted threads, rewritten with and without ``strip_quoted``.
+
+Each of ``--emails`` generated Outlook-style replies has a short authored
+part and a closing, then a signature, a legal footer and ``--depth`` quoted
+earlier messages. A few are Gmail-style replies with ``>`` quotes. The stand-in
+server answers after ``--latency`` seconds plus ``--per-char`` seconds per
+character, so longer requests cost more. Each reply goes through
+``complete_operation('rewrite', ...)`` once with ``strip_quoted`` off and
+once with it on: latency, characters sent to the model and the estimated
+input tokens saved. The set-aside parts are checked to come back unchanged.
+
+First, ``split_authored`` is run on ``CASES``: texts whose authored part
+is known, including ones that only look like quotes, footers or
+signatures. The script exits with 1 if any of them is split differently.
+
+    python benchmarks/bench_quoted.py --emails 30 --depth 3 --latency 0.2 --per-char 0.0005
+"""
+import argparse
+import random
+import sys
+import time
+
+from _common import load_app, percentile
+from stub_server import StubOpenRouter
+
+BODIES = [
+    'Teklifi inceledim, fiyatlar uygun görünüyor ama teslim süresini netleştirmemiz gerekiyor.',
+    'Toplantıyı perşembe saat ona alabilir miyiz? Çarşamba ekibin yarısı izinde.',
+    'Faturadaki tutar siparişle uyuşmuyor, kontrol edip düzeltilmiş halini iletebilir misiniz?',
+    'Numuneler bugün elimize ulaştı, kalite ekibi yarın değerlendirmesini paylaşacak.',
+]
+SIGNATURE = 'Saygılarımla,\r\nAhmet Yılmaz\r\nSatın Alma Müdürü | Örnek Sanayi A.Ş.\r\nTel: +90 212 555 00 00'
+FOOTER = (
+    'Bu e-posta ve ekleri gizlidir ve yalnızca muhatabına yöneliktir. Muhatabı değilseniz lütfen gönderene '
+    'bildirip iletiyi siliniz. This e-mail and any attachments are confidential and intended solely for the '
+    'addressee.'
+)
+
+# (text, authored pieces after split_authored; None when nothing is set aside)
+CASES = [
+    ('Hi team,\nThis message is to confirm that the intended recipient list is final.\nPlease review.', None),
+    ('Hi team,\n\nThis message is to confirm that the intended recipient list is final.\nPlease review.', None),
+    ('Merhaba,\nTeşekkürler.\nDosyayı yarın gönderirim.\nAhmet', None),
+    ('Merhaba,\nBest\nDosyayı yarın gönderirim.\nAhmet', None),
+    ('Notlar:\n\n> Hedef bu çeyrekte bitirmek.\n\nDevamını yarın yazarım.', None),
+    ('Merhaba,\n\nrapor ekte.\n\nTeşekkürler,\nAhmet\n', ['Merhaba,\n\nrapor ekte.\n\nTeşekkürler,']),
+    (
+        'Tamam, perşembe uygun.\n\nOn Wed, Jan 3, 2024 at 10:15 AM Ayşe <ayse@example.com> wrote:\n\n> Perşembe?\n',
+        ['Tamam, perşembe uygun.'],
+    ),
+    (
+        f'Merhaba,\r\n\r\nOlur.\r\n\r\n{SIGNATURE}\r\n\r\n{FOOTER}\r\n',
+        ['Merhaba,\r\n\r\nOlur.\r\n\r\nSaygılarımla,'],
+    ),
+    ('Olur.\n\n-----Original Message-----\nFrom: a\nSent: b\n\neski\n', ['Olur.']),
+]
+
+
+def check_cases(app):
+    failed = 0
+    for text, expected in CASES:
+        pieces = app.split_authored(text)
+        got = None if pieces is None else [piece for piece, authored in pieces if authored]
+        if got != expected:
+            failed += 1
+            print(f'FAIL {text[:40]!r}: authored {got!r}, expected {expected!r}')
+    # Translations keep the quotes unless strip_quoted_translate is on
+    if app._set_aside('translate', CASES[-1][0]) is not None:
+        failed += 1
+        print('FAIL translate mode set text aside')
+    print(f'split_authored: {len(CASES) - failed + 1}/{len(CASES) + 1} checks passed')
+    return not failed
+
+
+def make_reply(rng, depth):
+    if rng.random() < 0.2:
+        quoted = '\n'.join('> ' + rng.choice(BODIES) for _ in range(depth * 3))
+        return f'{rng.choice(BODIES)}\n\nOn Wed, Jan 3, 2024 at 10:15 AM Ayşe Demir <ayse@example.com> wrote:\n\n{quoted}\n'
+    parts = [f'Merhaba Ayşe Hanım,\r\n\r\n{rng.choice(BODIES)}\r\n\r\n{SIGNATURE}\r\n\r\n{FOOTER}']
+    for i in range(depth):
+        parts.append(
+            f'Gönderen: Ayşe Demir <ayse@example.com>\r\nGönderildi: {i + 2} Ocak 2024 10:15\r\n'
+            f'Kime: Ahmet Yılmaz\r\nKonu: RE: Sipariş\r\n\r\n'
+            + '\r\n\r\n'.join(rng.choice(BODIES) for _ in range(3)) + f'\r\n\r\n{FOOTER}'
+        )
+    return '\r\n\r\n'.join(parts) + '\r\n'
+
+
+def run(app, args, replies, enabled):
+    app.update_config({'strip_quoted': enabled})
+    app.reset_metrics()
+    sent, samples, intact = [], [], 0
+    with StubOpenRouter(latency=args.latency, per_char_delay=args.per_char) as stub:
+        def echo(payload):
+            text = payload['messages'][-1]['content'].split('KISIM:\n', 1)[1]
+            sent.append(len(text))
+            return text
+        stub.reply = echo
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        for reply in replies:
+            t0 = time.perf_counter()
+            out = app.complete_operation('rewrite', reply)
+            samples.append(time.perf_counter() - t0)
+            # The stand-in echoes, so a clean splice gives the input back
+            intact += (out or '').strip() == reply.strip()
+    counters = app.metrics_snapshot()['counters']
+    ms = [v * 1000.0 for v in samples]
+    print(
+        f'{"on" if enabled else "off":<4} {percentile(ms, 50):8.1f} {percentile(ms, 95):8.1f} {sum(ms) / 1000:8.2f} '
+        f'{sum(sent):>8} {counters.get("input_trimmed", 0):>8} {counters.get("input_tokens_saved", 0):>9} '
+        f'{intact:>4}/{len(replies)}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--emails', type=int, default=30)
+    ap.add_argument('--depth', type=int, default=3, help='earlier messages quoted below each reply')
+    ap.add_argument('--latency', type=float, default=0.2)
+    ap.add_argument('--per-char', type=float, default=0.0005)
+    args = ap.parse_args()
+
+    app = load_app()
+    if not check_cases(app):
+        sys.exit(1)
+    rng = random.Random(1)
+    replies = [make_reply(rng, args.depth) for _ in range(args.emails)]
+    print(f'{"trim":<4} {"p50 ms":>8} {"p95 ms":>8} {"total s":>8} {"chars":>8} {"trimmed":>8} {"tokens -":>9} {"intact":>9}')
+    for enabled in (False, True):
+        run(app, args, replies, enabled)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Rate limiting: a request burst against a throttling stand-in server.
+
+The server admits ``--limit`` completions per ``--window`` seconds and answers
+the rest with 429 (+ ``Retry-After`` unless ``--no-retry-after``). The same
+burst of ``--count`` concurrent rewrites runs three ways:
+
+* fail-fast  - no retries, rate-limit headers ignored (the old behaviour)
+* retry      - backoff/``Retry-After`` retries, headers ignored
+* scheduler  - retries plus the token bucket fed from the headers
+
+    python benchmarks/bench_ratelimit.py --count 40 --limit 10 --window 1
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import load_app, percentile
+from stub_server import StubOpenRouter
+
+MODES = {
+    'fail-fast': {'max_retries': 0, 'bucket': False},
+    'retry': {'max_retries': 5, 'bucket': False},
+    'scheduler': {'max_retries': 5, 'bucket': True},
+}
+
+
+def run(app, args, mode):
+    spec = MODES[mode]
+    app.reset_metrics()
+    app.reset_model_health()
+    app.rate_limiter.reset()
+    app.update_config({
+        'max_retries': spec['max_retries'],
+        'request_deadline_s': args.deadline,
+        'fallback_models': [],
+    })
+    if not spec['bucket']:
+        # Instance attributes shadow the methods until the finally below
+        app.rate_limiter.update = lambda headers: False
+        if not spec['max_retries']:
+            app.rate_limiter.pause = lambda seconds: None
+    try:
+        with StubOpenRouter(
+            latency=args.latency, rate_limit=args.limit, rate_window=args.window,
+            send_retry_after=not args.no_retry_after,
+        ) as stub:
+            app.update_config({'api_base_url': stub.base_url})
+            app.close_http_session()
+
+            def one(i):
+                t0 = time.perf_counter()
+                ok = bool(app.rewrite_text(f'metin {i}'))
+                return ok, time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(one, range(args.count)))
+            wall = time.perf_counter() - t0
+            throttled = stub.throttled
+    finally:
+        vars(app.rate_limiter).pop('update', None)
+        vars(app.rate_limiter).pop('pause', None)
+    ms = [sec * 1000.0 for ok, sec in results if ok]
+    counters = app.metrics_snapshot()['counters']
+    print(
+        f'{mode:<10} {sum(ok for ok, _ in results):>4}/{args.count:<4} {throttled:>6} '
+        f'{counters.get("http_retries", 0):>7} {wall:8.2f} {percentile(ms, 50):9.1f} {percentile(ms, 95):9.1f}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=40)
+    ap.add_argument('--concurrency', type=int, default=8)
+    ap.add_argument('--limit', type=int, default=10, help='completions per window')
+    ap.add_argument('--window', type=float, default=1.0, help='seconds')
+    ap.add_argument('--latency', type=float, default=0.05)
+    ap.add_argument('--deadline', type=float, default=30.0, help='request_deadline_s')
+    ap.add_argument('--no-retry-after', action='store_true')
+    ap.add_argument('--mode', action='append', choices=sorted(MODES))
+    args = ap.parse_args()
+
+    app = load_app()
+    print(f'{"mode":<10} {"ok":>9} {"429s":>6} {"retries":>7} {"wall s":>8} {"p50 ms":>9} {"p95 ms":>9}')
+    for mode in args.mode or MODES:
+        run(app, args, mode)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Latest-screenshot lookup: per-hotkey directory scan vs. the in-memory index.
+
+Creates a synthetic folder of ``--files`` screenshots (plus some non-image
+noise) and times:
+
+* legacy   - the old ``os.listdir`` + ``isfile`` + ``getmtime`` scan per press
+* cold     - first lookup, building the index with ``os.scandir``
+* warm     - later lookups (one directory ``stat`` each)
+* new file - lookup right after a new screenshot landed, as the watcher sees it
+
+    python benchmarks/bench_screenshot_index.py --files 50000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from _common import load_app, summarize
+
+EXTS = {'.png', '.jpg', '.jpeg', '.bmp'}
+
+
+def legacy_latest(base):
+    newest_file, newest_mtime = None, -1.0
+    for name in os.listdir(base):
+        p = os.path.join(base, name)
+        if not os.path.isfile(p):
+            continue
+        if os.path.splitext(name)[1].lower() not in EXTS:
+            continue
+        mt = os.path.getmtime(p)
+        if mt > newest_mtime:
+            newest_mtime, newest_file = mt, p
+    return newest_file
+
+
+def make_folder(n):
+    base = tempfile.mkdtemp(prefix='copypolish-shots-')
+    now = time.time() - n
+    for i in range(n):
+        ext = '.txt' if i % 50 == 0 else '.png'
+        p = os.path.join(base, f'Screenshot {i:06d}{ext}')
+        with open(p, 'wb'):
+            pass
+        os.utime(p, (now + i, now + i))
+    return base
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--files', type=int, default=50000)
+    ap.add_argument('--iterations', type=int, default=5)
+    args = ap.parse_args()
+
+    app = load_app()
+    base = make_folder(args.files)
+    try:
+        app.update_config({'screenshot_dirs': [base]})
+        legacy = []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            expected = legacy_latest(base)
+            legacy.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        assert app.get_latest_screenshot_path() == expected
+        cold = [time.perf_counter() - t0]
+
+        warm = []
+        for _ in range(args.iterations * 20):
+            t0 = time.perf_counter()
+            assert app.get_latest_screenshot_path() == expected
+            warm.append(time.perf_counter() - t0)
+
+        fresh = []
+        for i in range(args.iterations):
+            p = os.path.join(base, f'Screenshot new {i}.png')
+            with open(p, 'wb'):
+                pass
+            app._note_screenshot_file(base, p)  # what the directory watcher does
+            t0 = time.perf_counter()
+            assert app.get_latest_screenshot_path() == p
+            fresh.append(time.perf_counter() - t0)
+
+        print(f'{args.files} files in {base}')
+        summarize('legacy scan per press', legacy)
+        summarize('index build (cold)', cold)
+        summarize('index lookup (warm)', warm)
+        summarize('lookup after new file', fresh)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Local API server vs. the clipboard round trip.
+
+The same rewrites run three ways against the stand-in server:
+
+* clipboard  - ``run_hotkey``: ctrl+c (the fake clipboard fills after
+               ``--copy-delay``), worker, ctrl+v; the user's clipboard is
+               overwritten by every call
+* http       - ``POST /v1/rewrite`` on the local server
+* http-sse   - the same with ``"stream": true``, timed to the first event
+
+Then ``--burst`` requests are fired at once with ``server_concurrency`` set
+to ``--limit`` to show how many are turned away with 429.
+
+    python benchmarks/bench_server.py --count 20 --latency 0.1 --copy-delay 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from _common import install_fake_io, load_app, summarize
+from stub_server import StubOpenRouter
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=20)
+    ap.add_argument('--latency', type=float, default=0.1)
+    ap.add_argument('--copy-delay', type=float, default=0.05)
+    ap.add_argument('--burst', type=int, default=12)
+    ap.add_argument('--limit', type=int, default=4)
+    args = ap.parse_args()
+
+    app = load_app()
+    clipboard, keyboard = install_fake_io(app, copy_delay=args.copy_delay)
+    app.update_config({'worker_count': 2, 'supersede_on_repeat': False, 'server_concurrency': args.limit})
+    app.start_workers()
+    server = app.start_server(port=0)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    client = requests.Session()
+
+    with StubOpenRouter(latency=args.latency, ttfb=args.latency, chunk_delay=0.005) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+
+        clip, overwritten = [], 0
+        for i in range(args.count):
+            clipboard.copy('kullanıcının panosu')
+            keyboard.selection = f'metin {i}'
+            t0 = time.perf_counter()
+            app.run_hotkey('rewrite')
+            app.task_queue.join()
+            clip.append(time.perf_counter() - t0)
+            overwritten += clipboard.paste() != 'kullanıcının panosu'
+        summarize('clipboard round trip', clip)
+        print(f'clipboard overwritten after {overwritten}/{args.count} calls')
+
+        http = []
+        for i in range(args.count):
+            t0 = time.perf_counter()
+            r = client.post(f'{url}/v1/rewrite', json={'text': f'metin {i}'})
+            r.raise_for_status()
+            http.append(time.perf_counter() - t0)
+        summarize('http', http)
+
+        first = []
+        for i in range(args.count):
+            t0 = time.perf_counter()
+            with client.post(f'{url}/v1/rewrite', json={'text': f'akış {i}. ikinci cümle.', 'stream': True}, stream=True) as r:
+                for line in r.iter_lines():
+                    if line.startswith(b'data:'):
+                        first.append(time.perf_counter() - t0)
+                        break
+        summarize('http-sse first event', first)
+
+        stub.latency = stub.ttfb = 1.0
+        with ThreadPoolExecutor(max_workers=args.burst) as pool:
+            codes = list(pool.map(
+                lambda i: requests.post(f'{url}/v1/rewrite', json={'text': f'yük {i}'}).status_code, range(args.burst)
+            ))
+        print(f'burst of {args.burst}, limit {args.limit}: {codes.count(200)} ok, {codes.count(429)} busy (429)')
+    app.stop_server()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Startup cost: module import time and time until the hotkeys are registered.
+
+Each run is a fresh interpreter (``--runs`` of them) with APPDATA pointed at a
+temp dir, so the user's config is never read. Reports:
+
+* import     - ``import main`` wall time
+* listener   - import + ``load_config`` + ``start_workers`` + ``start_listener``
+* the slowest modules from ``python -X importtime -c "import main"``
+* which heavy modules (Tk, PIL, pystray, keyring) were already loaded when the
+  listener became ready; they should only load when the tray/settings need them
+
+Exits with 1 when the median listener time exceeds ``--budget-ms`` or a heavy
+module was loaded eagerly.
+
+    python benchmarks/bench_startup.py --budget-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _common import ROOT
+
+HEAVY = ('tkinter', 'PIL', 'pystray', 'keyring')
+
+PROBE = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, ROOT)
+import main
+t_import = time.perf_counter() - t0
+from _common import install_fake_io
+install_fake_io(main)
+main.load_config()
+main.start_workers()
+main.start_listener()
+t_listener = time.perf_counter() - t0
+print(json.dumps({
+    'import': t_import,
+    'listener': t_listener,
+    'heavy': [m for m in HEAVY if m in sys.modules],
+}))
+'''
+
+
+def child_env(appdata):
+    env = dict(os.environ)
+    env['APPDATA'] = appdata
+    env.setdefault('PYSTRAY_BACKEND', 'dummy')
+    return env
+
+
+def probe(appdata):
+    code = f'ROOT = {ROOT!r}\nHEAVY = {HEAVY!r}\n' + PROBE
+    out = subprocess.run(
+        [sys.executable, '-c', code], env=child_env(appdata), cwd=ROOT,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(appdata, top):
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        env=child_env(appdata), cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cum_us), int(self_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--top', type=int, default=12, help='slowest imports to list')
+    ap.add_argument('--budget-ms', type=float, default=0.0, help='fail when median listener time exceeds this')
+    args = ap.parse_args()
+
+    appdata = tempfile.mkdtemp(prefix='copypolish-startup-')
+    runs = [probe(appdata) for _ in range(args.runs)]
+    imp = statistics.median(r['import'] for r in runs) * 1000
+    lst = statistics.median(r['listener'] for r in runs) * 1000
+    heavy = sorted({m for r in runs for m in r['heavy']})
+    print(f'import main        median {imp:8.1f} ms  ({args.runs} runs)')
+    print(f'listener ready     median {lst:8.1f} ms')
+    print(f'heavy modules      {", ".join(heavy) if heavy else "none"}')
+
+    print('\nslowest imports (cumulative):')
+    for cum_us, self_us, name in import_profile(appdata, args.top):
+        print(f'  {cum_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f})  {name.strip()}')
+
+    failed = False
+    if args.budget_ms and lst > args.budget_ms:
+        print(f'\nOVER BUDGET: {lst:.1f} ms > {args.budget_ms:.1f} ms')
+        failed = True
+    if heavy:
+        print(f'\nEAGER IMPORTS: {", ".join(heavy)} loaded before the listener was ready')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Time to first pasted text: streaming vs. buffered completions.
+
+Runs the real ``processing_worker`` paste logic against a local SSE stand-in.
+The paste itself is replaced by a recorder so no keyboard or clipboard is
+touched; everything else (HTTP, SSE parsing, token stripping, sentence
+flushing) is the production code.
+
+    python benchmarks/bench_streaming.py --ttfb 0.3 --chunk-delay 0.02
+"""
+import argparse
+import time
+
+from _common import load_app, summarize
+from stub_server import StubOpenRouter
+
+SAMPLE = (
+    'Merhaba Ahmet Bey, dün konuştuğumuz rapor ektedir. '
+    'Toplantı notlarını da en kısa sürede paylaşacağım. '
+    'Sorularınız olursa lütfen bana yazın.<|im_end|>\n\n'
+) * 4
+
+
+def run(app, stream: bool):
+    pieces = []
+    t0 = time.perf_counter()
+    first = None
+
+    def record(text, target=None, cancel=None):
+        nonlocal first
+        if first is None:
+            first = time.perf_counter() - t0
+        pieces.append(text)
+        return True
+
+    app.paste_text = record
+    if stream:
+        status, _ = app.paste_streamed(app.stream_rewrite_text(SAMPLE))
+        assert status is True
+    else:
+        text = app.rewrite_text(SAMPLE)
+        record(app.strip_technical_tokens(text).rstrip() + '\r\n\r\n')
+    total = time.perf_counter() - t0
+    return first, total, ''.join(pieces)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--iterations', type=int, default=5)
+    ap.add_argument('--ttfb', type=float, default=0.3)
+    ap.add_argument('--chunk-delay', type=float, default=0.02)
+    args = ap.parse_args()
+
+    app = load_app()
+    words = len(SAMPLE.split(' '))
+    # Buffered answers arrive only after the whole generation time.
+    latency = args.ttfb + args.chunk_delay * words
+    with StubOpenRouter(latency=latency, ttfb=args.ttfb, chunk_delay=args.chunk_delay) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        results = {}
+        for stream in (False, True):
+            firsts, totals = [], []
+            for _ in range(args.iterations):
+                first, total, text = run(app, stream)
+                firsts.append(first)
+                totals.append(total)
+                assert '<|' not in text and text.endswith('\r\n\r\n')
+            results[stream] = text
+            label = 'streaming' if stream else 'buffered'
+            summarize(f'{label}: first paste', firsts)
+            summarize(f'{label}: complete', totals)
+        assert results[True] == results[False], 'streamed and buffered output differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Translation memory: recurring business emails translated with and without it.
+
+``--emails`` generated Turkish emails share greeting, body and closing
+sentences (each with a few small variants) and carry one new sentence each.
+The stand-in server "translates" by upper-casing the text after
+``--latency`` seconds plus ``--per-char`` seconds per character, so longer
+requests cost more. Each email goes through ``translate_text_tr_en`` once
+with ``tm_enabled`` off and once on (starting from an empty memory):
+latency, requests and characters sent to the model, exact hits (reused),
+fuzzy matches (only passed to the model as hints) and the estimated time
+saved. With the memory on, each email still takes at most one request.
+Then ``--flood`` unique sentence pairs are stored with
+``tm_max_kb`` set to ``--max-kb`` to check the file stays within it.
+
+    python benchmarks/bench_tm.py --emails 40 --latency 0.2 --per-char 0.001
+"""
+import argparse
+import os
+import random
+import time
+
+from _common import load_app, percentile
+from stub_server import StubOpenRouter
+
+NAMES = ['Ahmet', 'Ayşe', 'Mehmet', 'Zeynep', 'Can', 'Elif']
+GREETINGS = ['Merhaba {} Bey,', 'Sayın {} Hanım,', 'İyi günler {},']
+BODY = [
+    ['Ekteki teklifi incelemenizi rica ederim.', 'Ekteki teklifi incelemenizi rica ediyorum.'],
+    ['Toplantıyı gelecek haftaya ertelememiz gerekiyor.', 'Toplantıyı maalesef gelecek haftaya ertelememiz gerekiyor.'],
+    ['Faturanın ödemesi henüz hesabımıza geçmedi.', 'Faturanın ödemesi henüz hesabımıza geçmemiştir.'],
+    ['Siparişiniz bugün kargoya verilmiştir.', 'Siparişiniz bugün kargoya verildi.'],
+    ['Konuyla ilgili sorularınız için bana ulaşabilirsiniz.', 'Konuyla ilgili sorularınız için bize ulaşabilirsiniz.'],
+    ['Sözleşmenin imzalı bir kopyasını bize iletebilir misiniz?', 'Sözleşmenin imzalı kopyasını bize iletebilir misiniz?'],
+    ['Proje takvimini güncelledik, ekte bulabilirsiniz.', 'Proje takvimini güncelledik; ekte bulabilirsiniz.'],
+    ['Yaşanan gecikme için özür dileriz.', 'Yaşanan gecikme için özür dilerim.'],
+]
+CLOSINGS = ['Geri dönüşünüzü bekliyoruz.\nSaygılarımla,', 'İyi çalışmalar dilerim.\nSaygılarımla,']
+TOPICS = ['depo', 'bütçe', 'teslimat', 'numune', 'lisans', 'denetim', 'eğitim', 'kurulum']
+
+
+def make_email(rng, i):
+    body = [rng.choice(variants) for variants in rng.sample(BODY, 3)]
+    novel = f'{rng.choice(TOPICS).capitalize()} konusundaki {i}. maddeyi ayrıca görüşmek isterim.'
+    return '\n\n'.join([
+        rng.choice(GREETINGS).format(rng.choice(NAMES)),
+        ' '.join(body + [novel]),
+        rng.choice(CLOSINGS) + '\n' + rng.choice(NAMES),
+    ])
+
+
+def run(app, args, emails, enabled):
+    app.update_config({'tm_enabled': enabled})
+    app.reset_metrics()
+    sent = []
+    samples = []
+    with StubOpenRouter(latency=args.latency, per_char_delay=args.per_char) as stub:
+        def translate(payload):
+            text = payload['messages'][-1]['content'].split('TEXT:\n', 1)[1]
+            sent.append(len(text))
+            return text.upper()
+        stub.reply = translate
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        for email in emails:
+            t0 = time.perf_counter()
+            if not app.translate_text_tr_en(email):
+                print('translation failed')
+            samples.append(time.perf_counter() - t0)
+        requests = stub.requests
+    snap = app.metrics_snapshot()
+    c = snap['counters']
+    ms = [v * 1000.0 for v in samples]
+    print(
+        f'{"on" if enabled else "off":<4} {percentile(ms, 50):8.1f} {percentile(ms, 95):8.1f} {sum(ms) / 1000:8.2f} '
+        f'{requests:>8} {sum(sent):>8} {c.get("tm_hits_exact", 0):>6} {c.get("tm_hits_fuzzy", 0):>6} '
+        f'{c.get("tm_sentences", 0):>6} {c.get("tm_requests_saved", 0):>6} {c.get("tm_saved_ms", 0) / 1000:8.2f} '
+        f'{snap["stages"].get("tm_lookup", {}).get("p50_ms", 0.0):9.2f}'
+    )
+
+
+def flood(app, count, max_kb):
+    app.update_config({'tm_max_kb': max_kb})
+    rng = random.Random(2)
+    t0 = time.perf_counter()
+    batch = 20
+    for start in range(0, count, batch):
+        sentences = [
+            f'{rng.choice(TOPICS).capitalize()} için {n} numaralı kayıt {rng.choice(NAMES)} tarafından açıldı.'
+            for n in range(start, start + batch)
+        ]
+        app.learn_translation(' '.join(sentences), ' '.join(s.upper() for s in sentences))
+    elapsed = time.perf_counter() - t0
+    size_kb = os.path.getsize(app.TM_PATH) / 1024
+    with app._tm_db_lock:
+        pairs = app._tm_connection().execute('SELECT count(*) FROM pairs').fetchone()[0]
+    print(
+        f'flood: {count} pairs stored in {elapsed:.2f} s, {pairs} kept, '
+        f'file {size_kb:.0f} KB (limit {max_kb} KB), evicted {app.metrics_snapshot()["counters"].get("tm_evicted", 0)}'
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--emails', type=int, default=40)
+    ap.add_argument('--latency', type=float, default=0.2)
+    ap.add_argument('--per-char', type=float, default=0.001)
+    ap.add_argument('--flood', type=int, default=5000)
+    ap.add_argument('--max-kb', type=int, default=256)
+    args = ap.parse_args()
+
+    app = load_app()
+    rng = random.Random(1)
+    emails = [make_email(rng, i) for i in range(args.emails)]
+    print(
+        f'{"tm":<4} {"p50 ms":>8} {"p95 ms":>8} {"total s":>8} {"requests":>8} {"chars":>8} {"exact":>6} '
+        f'{"hints":>6} {"sents":>6} {"local":>6} {"saved s":>8} {"lookup ms":>9}'
+    )
+    for enabled in (False, True):
+        run(app, args, emails, enabled)
+    flood(app, args.flood, args.max_kb)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Replay a recorded trace against the stand-in server.
+
+Record a trace by running CopyPolish with ``--trace`` (or ``trace_enabled``
+in config.json); it is written to ``%APPDATA%\\CopyPolish\\trace.jsonl``.
+
+Every ``hotkey`` event is replayed at its recorded time divided by
+``--speed``. A selection of the recorded size and line count is put in the
+fake window the event came from (equal hashes get equal text), and
+``run_hotkey`` runs the way the capture thread would. Debounced presses
+never reached the capture thread, so they are only counted. The app runs
+with the configuration in the trace header, workers and all; ``--set
+key=value`` overrides it.
+
+The report shows tasks per outcome, end-to-end p50/p95/p99, throughput,
+and how far the replay fell behind the schedule. It is printed next to the
+recorded numbers. Compare versions by replaying the same trace against each:
+``--app-root`` imports ``main`` from another tree, e.g. a ``git worktree``
+of an older commit. ``--synthesize`` writes a made-up trace (bursts, repeats
+on one window, mixed operations and sizes) for trying this without a
+recording.
+
+    python benchmarks/replay_trace.py --synthesize demo.jsonl --count 120
+    python benchmarks/replay_trace.py demo.jsonl --speed 4 --json before.json --app-root ../old
+    python benchmarks/replay_trace.py demo.jsonl --speed 4 --baseline before.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from _common import ROOT, install_fake_io, load_app, percentile
+from stub_server import StubOpenRouter
+
+WORDS = (
+    'merhaba ekteki raporu inceleyip görüşlerinizi paylaşabilir misiniz toplantı '
+    'yarın saat onda yapılacak lütfen katılım durumunuzu bildirin teşekkürler'
+).split()
+KINDS = ('rewrite', 'translate', 'screenshot_path', 'repaste')
+
+
+def load_trace(path):
+    header, events = {}, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if event.get('ev') == 'start':
+                # A rotated file restarts the clock; replay one recording at a time
+                if events:
+                    break
+                header = event
+            else:
+                events.append(event)
+    return header, events
+
+
+def synth_text(key, chars, lines):
+    # Stands in for the selection the hash was taken of: same key, same text
+    rng = random.Random(key)
+    out = []
+    while sum(len(w) + 1 for w in out) < chars:
+        out.append(rng.choice(WORDS))
+    words = ' '.join(out)[:max(1, chars)]
+    if lines > 1:
+        step = max(1, len(words) // lines)
+        words = '\n'.join(words[i:i + step] for i in range(0, len(words), step))
+    return words
+
+
+def synthesize(path, count, seed):
+    rng = random.Random(seed)
+    t, win, seen, made = 0.5, 0, [], 0
+    events = [{'ev': 'start', 'v': 1, 'at': time.time(), 'config': {
+        'worker_count': 2, 'queue_size': 8, 'queue_policy': 'reject', 'supersede_on_repeat': True,
+        'stream_output': False,
+    }}]
+    while made < count:
+        made += 1
+        kind = rng.choices(KINDS, weights=(60, 30, 7, 3))[0]
+        if rng.random() < 0.3:
+            win = rng.randrange(4)
+        event = {'ev': 'hotkey', 't': round(t, 4), 'kind': kind, 'win': win, 'ms': {}}
+        if kind in ('rewrite', 'translate'):
+            if seen and rng.random() < 0.1:
+                h, chars, lines = rng.choice(seen)
+            else:
+                chars = int(min(20000, rng.lognormvariate(5.7, 1.0)))
+                h, lines = f'{rng.getrandbits(48):012x}', 1 + chars // 400
+                seen.append((h, chars, lines))
+            event.update(chars=chars, lines=lines, h=h)
+        events.append({'ev': 'press', 't': event['t'], 'kind': kind})
+        events.append(event)
+        if rng.random() < 0.15:
+            # A held key or double press right after
+            events.append({'ev': 'press', 't': round(t + 0.05, 4), 'kind': kind, 'debounced': True})
+        # Bursts: a few presses a fraction of a second apart, then a pause
+        t += rng.uniform(0.2, 1.0) if rng.random() < 0.3 else rng.expovariate(1 / 4.0)
+    with open(path, 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+    print(f'wrote {made} hotkey events ({len(events) - 1} events) to {path}')
+
+
+def recorded_summary(events):
+    tasks = [e for e in events if e.get('ev') == 'task']
+    e2e = [e['ms']['end_to_end'] for e in tasks if 'end_to_end' in e.get('ms', {})]
+    outcomes = {}
+    for e in tasks:
+        outcomes[e['outcome']] = outcomes.get(e['outcome'], 0) + 1
+    span = max((e['done'] for e in tasks), default=0.0) - min((e['t'] for e in tasks), default=0.0)
+    return {
+        'tasks': len(tasks),
+        'outcomes': outcomes,
+        'wall_s': round(span, 3),
+        'throughput_per_s': round(len(e2e) / span, 2) if span else 0.0,
+        'p50_ms': round(percentile(e2e, 50), 1),
+        'p95_ms': round(percentile(e2e, 95), 1),
+        'p99_ms': round(percentile(e2e, 99), 1),
+    }
+
+
+def replay(app, keyboard, events, speed, window):
+    hotkeys = [e for e in events if e.get('ev') == 'hotkey' and e.get('kind') in KINDS]
+    debounced = sum(1 for e in events if e.get('ev') == 'press' and e.get('debounced'))
+    lag = []
+    if not hotkeys:
+        return {'replayed': 0}
+    first = hotkeys[0]['t']
+    t0 = time.perf_counter()
+    for event in hotkeys:
+        due = t0 + (event['t'] - first) / speed
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        # Late when an earlier capture (or the machine) held the loop up
+        lag.append(max(0.0, time.perf_counter() - due))
+        window[0] = event.get('win', 0) + 1
+        if event.get('chars'):
+            keyboard.selection = synth_text(event.get('h') or event['t'], event['chars'], event.get('lines', 1))
+        app.run_hotkey(event['kind'])
+    app.task_queue.join()
+    wall = time.perf_counter() - t0
+    snap = app.metrics_snapshot()
+    e2e = snap['stages'].get('end_to_end', {})
+    counters = snap['counters']
+    outcomes = {'ok': e2e.get('count', 0), 'failed': counters.get('tasks_failed', 0)}
+    outcomes.update({k[len('tasks_'):]: v for k, v in counters.items() if k.startswith('tasks_cancelled:')})
+    return {
+        'replayed': len(hotkeys),
+        'debounced': debounced,
+        'outcomes': outcomes,
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(e2e.get('count', 0) / wall, 2) if wall else 0.0,
+        'p50_ms': e2e.get('p50_ms', 0.0),
+        'p95_ms': e2e.get('p95_ms', 0.0),
+        'p99_ms': e2e.get('p99_ms', 0.0),
+        'lag_p95_ms': round(percentile(lag, 95) * 1000, 1),
+    }
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for key in ('p95_ms', 'p99_ms'):
+        if baseline.get(key) and result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f'{key} {baseline[key]:.1f} -> {result[key]:.1f} ms')
+    if baseline.get('throughput_per_s') and result['throughput_per_s'] < baseline['throughput_per_s'] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_per_s']:.2f} -> {result['throughput_per_s']:.2f}/s")
+    return regressions
+
+
+def parse_value(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('trace', nargs='?', help='trace.jsonl to replay')
+    ap.add_argument('--speed', type=float, default=1.0, help='replay this many times faster than recorded')
+    ap.add_argument('--latency', type=float, default=0.3, help='stand-in answer time (and time to first token)')
+    ap.add_argument('--per-char', type=float, default=0.0002, help='extra stand-in time per answer character')
+    ap.add_argument('--chunk-delay', type=float, default=0.005)
+    ap.add_argument('--copy-delay', type=float, default=0.02, help='seconds until a fake ctrl+c fills the clipboard')
+    ap.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='override a config value')
+    ap.add_argument('--app-root', default=ROOT, help='tree to import main from (default: this one)')
+    ap.add_argument('--json', help='write the replay results to this file')
+    ap.add_argument('--baseline', help='results file from an earlier replay to compare against')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    ap.add_argument('--synthesize', metavar='PATH', help='write a synthetic trace to PATH and exit')
+    ap.add_argument('--count', type=int, default=120, help='hotkey events in a synthetic trace')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+
+    if args.synthesize:
+        synthesize(args.synthesize, args.count, args.seed)
+        return
+    if not args.trace:
+        ap.error('a trace file (or --synthesize) is required')
+    header, events = load_trace(args.trace)
+
+    app = load_app(root=os.path.abspath(args.app_root))
+    _, keyboard = install_fake_io(app, copy_delay=args.copy_delay)
+    window = [1]
+    app.get_focus_target = lambda: window[0]
+    app._ensure_focus = lambda target: True
+    app.get_latest_screenshot_path = lambda: os.path.join(ROOT, 'ekran.png')
+    app.update_config(header.get('config', {}))
+    app.update_config(dict((k, parse_value(v)) for k, v in (item.split('=', 1) for item in args.set)))
+    # Keep every end-to-end sample of the run, not just the last 512
+    app.METRICS_WINDOW = 1 << 20
+    app.reset_metrics()
+    app.start_workers()
+
+    with StubOpenRouter(
+        latency=args.latency, ttfb=args.latency, per_char_delay=args.per_char, chunk_delay=args.chunk_delay,
+    ) as stub:
+        app.update_config({'api_base_url': stub.base_url})
+        app.close_http_session()
+        result = replay(app, keyboard, events, args.speed, window)
+        result['requests'] = stub.requests
+    result.update(trace=os.path.abspath(args.trace), speed=args.speed, app_root=os.path.abspath(args.app_root))
+
+    recorded = recorded_summary(events)
+    print(f'{"":<10} {"tasks":>6} {"wall s":>8} {"tput/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}  outcomes')
+    print(
+        f'{"recorded":<10} {recorded["tasks"]:>6} {recorded["wall_s"]:>8.2f} {recorded["throughput_per_s"]:>7.2f} '
+        f'{recorded["p50_ms"]:>8.1f} {recorded["p95_ms"]:>8.1f} {recorded["p99_ms"]:>8.1f}  {recorded["outcomes"]}'
+    )
+    if not result['replayed']:
+        print('no hotkey events to replay')
+        return
+    print(
+        f'{"replay":<10} {result["replayed"]:>6} {result["wall_s"]:>8.2f} {result["throughput_per_s"]:>7.2f} '
+        f'{result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f}  {result["outcomes"]}'
+    )
+    print(
+        f'x{args.speed:g}: {result["debounced"]} debounced presses skipped, {result["requests"]} API requests, '
+        f'schedule lag p95 {result["lag_p95_ms"]:.1f} ms'
+    )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s'):
+            print(f'{key:<18} {baseline.get(key, 0.0):>10.2f} -> {result[key]:>10.2f}')
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""Local OpenRouter/OpenAI-compatible stand-in server for offline benchmarks.
+
+Only the endpoints CopyPolish uses are implemented (``/chat/completions`` and
+``/models``). Latency knobs are plain attributes so a benchmark can change them
+between runs without restarting the server; ``model_overrides`` sets them per
+requested model, e.g. ``{'slow/model': {'latency': 2.0, 'error_rate': 0.5}}``.
+"""
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KEEPALIVE_INTERVAL = 0.5
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without NODELAY Nagle +
+        # delayed ACK would add ~40 ms to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections += 1
+        # Stand-in for DNS + TCP + TLS handshake cost of a fresh connection.
+        if stub.connect_delay:
+            time.sleep(stub.connect_delay)
+
+    def _send_json(self, status, obj, extra_headers=None):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        n = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(n) if n else b''
+        try:
+            return json.loads(raw.decode('utf-8')) if raw else {}
+        except Exception:
+            return {}
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_stream(self, payload, text, extra_headers=None):
+        stub = self.server.stub
+        model = payload.get('model', '')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        # OpenRouter sends keep-alive comments while the model is queued.
+        self._write_chunk(b': OPENROUTER PROCESSING\n\n')
+        ttfb = stub.setting(model, 'ttfb')
+        chunk_delay = stub.setting(model, 'chunk_delay')
+        per_char = 0.0
+        if not ttfb and not chunk_delay:
+            # No stream timing given: take as long as the buffered answer would
+            ttfb = stub.setting(model, 'latency')
+            per_char = stub.setting(model, 'per_char_delay')
+        while ttfb > KEEPALIVE_INTERVAL:
+            time.sleep(KEEPALIVE_INTERVAL)
+            ttfb -= KEEPALIVE_INTERVAL
+            self._write_chunk(b': OPENROUTER PROCESSING\n\n')
+        if ttfb:
+            time.sleep(ttfb)
+        for i, piece in enumerate(stub.split_stream(text) if text else []):
+            delay = (chunk_delay if i else 0.0) + per_char * len(piece)
+            if delay:
+                time.sleep(delay)
+            event = {
+                'id': 'stub',
+                'model': payload.get('model', ''),
+                'choices': [{'index': 0, 'delta': {'content': piece}}],
+            }
+            self._write_chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests += 1
+        if self.path.rstrip('/').endswith('/models'):
+            etag = f'"models-{len(stub.models)}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            data = [
+                {'id': m, 'name': m, 'context_length': 32768, 'pricing': {'prompt': '0', 'completion': '0'}}
+                for m in stub.models
+            ]
+            self._send_json(200, {'data': data}, {'ETag': etag})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        stub = self.server.stub
+        payload = self._read_json()
+        model = payload.get('model', '')
+        with stub.lock:
+            stub.requests += 1
+            stub.model_requests[model] = stub.model_requests.get(model, 0) + 1
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        allowed, limit_headers = stub.take_rate_token()
+        if not allowed:
+            self._send_json(429, {'error': {'code': 429, 'message': 'rate limited'}}, limit_headers)
+            return
+        latency = stub.setting(model, 'latency')
+        if stub.should_fail(model):
+            if latency:
+                time.sleep(latency)
+            status = stub.setting(model, 'error_status')
+            self._send_json(status, {'error': {'code': status, 'message': 'injected error'}}, limit_headers)
+            return
+        # Free-tier models sometimes answer 200 with an empty choices list
+        empty = stub.should_fail(model, 'empty_rate')
+        text = '' if empty else stub.reply(payload)
+        if payload.get('stream') and stub.supports_stream:
+            self._send_stream(payload, text, limit_headers)
+            return
+        delay = latency + stub.setting(model, 'per_char_delay') * len(text)
+        if delay:
+            time.sleep(delay)
+        choices = [] if empty else [{'index': 0, 'message': {'role': 'assistant', 'content': text}}]
+        self._send_json(200, {'id': 'stub', 'model': model, 'choices': choices}, limit_headers)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop connections mid-stream on purpose (cancelled hedges)
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class StubOpenRouter:
+    """Threaded stand-in server; use as a context manager.
+
+    ``base_url`` is what CopyPolish should use instead of
+    ``https://openrouter.ai/api/v1``.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        connect_delay: float = 0.0,
+        ttfb: float = 0.0,
+        chunk_delay: float = 0.0,
+        supports_stream: bool = True,
+        per_char_delay: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        empty_rate: float = 0.0,
+        model_overrides: dict = None,
+        rate_limit: int = 0,
+        rate_window: float = 1.0,
+        send_retry_after: bool = True,
+        seed: int = 1,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        # latency: total time for a buffered answer
+        # ttfb / chunk_delay: time to first streamed token / between tokens;
+        # when both are 0, streams are paced like buffered answers
+        # per_char_delay: extra buffered latency per output character (generation speed)
+        # error_rate: share of completions answered with error_status instead
+        # empty_rate: share of completions answered 200 with no choices
+        # rate_limit: completions allowed per rate_window seconds; more get 429
+        # (with Retry-After unless send_retry_after is False) and every answer
+        # carries X-RateLimit-Limit/Remaining/Reset like OpenRouter's
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.ttfb = ttfb
+        self.chunk_delay = chunk_delay
+        self.supports_stream = supports_stream
+        self.per_char_delay = per_char_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.empty_rate = empty_rate
+        self.model_overrides = dict(model_overrides or {})
+        self.model_requests = {}
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.send_retry_after = send_retry_after
+        self.throttled = 0
+        self._admitted = 0
+        self._window_end = 0.0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self.models = ['stub/echo', 'qwen/qwen3-coder:free']
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/api/v1'
+
+    def reply(self, payload) -> str:
+        # Echo the user message back, which is enough for latency measurements.
+        try:
+            return str(payload['messages'][-1]['content'])
+        except Exception:
+            return 'ok'
+
+    def take_rate_token(self):
+        """``(allowed, headers)`` for one completion under the fixed-window limit."""
+        if not self.rate_limit:
+            return True, {}
+        now = time.monotonic()
+        with self.lock:
+            if now >= self._window_end:
+                self._window_end = now + self.rate_window
+                self._admitted = 0
+            allowed = self._admitted < self.rate_limit
+            if allowed:
+                self._admitted += 1
+            else:
+                self.throttled += 1
+            reset_in = self._window_end - now
+            headers = {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(self.rate_limit - self._admitted),
+                'X-RateLimit-Reset': str(int((time.time() + reset_in) * 1000)),
+            }
+        if not allowed and self.send_retry_after:
+            headers['Retry-After'] = f'{reset_in:.3f}'
+        return allowed, headers
+
+    def setting(self, model: str, name: str):
+        return self.model_overrides.get(model, {}).get(name, getattr(self, name))
+
+    def should_fail(self, model: str = '', knob: str = 'error_rate') -> bool:
+        rate = self.setting(model, knob)
+        with self.lock:
+            if rate and self._rng.random() < rate:
+                self.errors += 1
+                return True
+        return False
+
+    def split_stream(self, text: str):
+        # Roughly token-sized pieces: one word (with its trailing space) each.
+        words = text.split(' ')
+        return [w + ' ' for w in words[:-1]] + [words[-1]]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,34 +1,65 @@
+from __future__ import annotations
+
 import os
+import re
 import sys
+import codecs
 import ctypes
 import json
 import time
-import requests
-import pyperclip
 import keyboard
 import threading
 import queue
-import keyring
+import itertools
 import shutil
+import hashlib
+import hmac
+import random
 import logging
-import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageDraw
-import pystray
-from typing import Union, TYPE_CHECKING, Optional
+import unicodedata
+from collections import OrderedDict, deque, namedtuple
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Union, TYPE_CHECKING, Optional, Iterable, Iterator
+
+# Reference point for the 'startup' metric (module import -> hotkeys registered)
+_process_started = time.perf_counter()
+
+# Heavy modules (requests, keyring, tkinter, PIL, pystray, windows_toasts) are
+# imported inside the functions that need them, so the tray app and the hotkey
+# listener come up without paying for the HTTP stack, Tk or the WinRT bindings.
+if TYPE_CHECKING:
+    import requests
+    from PIL import Image
+    from windows_toasts import WindowsToaster
 
 # Windows toast notifications are optional in the packaged exe.
 # If the Windows Runtime bindings are missing at runtime, fall back gracefully
 # so the tray app still starts.
-try:
-    from windows_toasts import Toast, WindowsToaster
-    _toaster: Optional[WindowsToaster] = WindowsToaster('CopyPolish')
-except Exception:
-    Toast = None  # type: ignore
-    # Avoid binding class name to a value in runtime; keep type-only import for checkers
-    if TYPE_CHECKING:
-        from windows_toasts import WindowsToaster as _WindowsToaster
-    _toaster = None
+_toaster: Optional[WindowsToaster] = None
+_toaster_loaded = False
+_toaster_lock = threading.Lock()
+# Toasts are shown by one background thread; producers only enqueue
+NOTIFY_QUEUE_SIZE = 16
+NOTIFY_COALESCE_WINDOW = 0.3
+NOTIFY_MAX_PER_WINDOW = 3
+NOTIFY_PROGRESS_TITLES = ('İşlem Başlatılıyor...',)
+_notify_queue = queue.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+_notify_lock = threading.Lock()
+_notify_thread = None
+
+def _get_toaster() -> Optional[WindowsToaster]:
+    global _toaster, _toaster_loaded
+    with _toaster_lock:
+        if not _toaster_loaded:
+            _toaster_loaded = True
+            try:
+                from windows_toasts import WindowsToaster
+                _toaster = WindowsToaster('CopyPolish')
+            except Exception:
+                _toaster = None
+    return _toaster
 
 def hide_console_window():
     if os.name == 'nt':
@@ -39,22 +70,692 @@ def hide_console_window():
         except Exception:
             pass
 
+class TaskQueue(queue.Queue):
+    """Bounded task queue whose producers can coalesce or drop queued work."""
+
+    def offer(self, task: dict, policy: str) -> tuple:
+        """Add ``task`` without blocking; returns ``(accepted, dropped_tasks)``."""
+        with self.mutex:
+            full = 0 < self.maxsize <= self._qsize()
+            if policy == 'coalesce' and full:
+                # A newer selection from the same window supersedes a queued one
+                for i, old in enumerate(self.queue):
+                    if old['target'] == task['target'] and old['operation'] == task['operation']:
+                        task['seq'] = old['seq']
+                        task['original_clipboard'] = old['original_clipboard']
+                        self.queue[i] = task
+                        return True, [old]
+            dropped = []
+            if full:
+                if policy != 'drop_oldest':
+                    return False, []
+                dropped.append(self._get())
+                self.unfinished_tasks -= 1
+            self._put(task)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return True, dropped
+
+
+class RateLimiter:
+    """Token bucket shared by all API calls, sized from the provider's rate-limit headers.
+
+    ``X-RateLimit-Remaining`` sets the tokens left and ``X-RateLimit-Reset``
+    the time the bucket is full again; without a reset time it refills
+    evenly over ``window`` seconds. Until a response carries these headers
+    the bucket does not throttle. A 429 with ``Retry-After`` pauses every
+    caller until that time, not just the request that hit it.
+    """
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.lock = threading.Condition()
+        self.capacity = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.reset_at = None
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if self.capacity is not None:
+            if self.reset_at is not None:
+                if now >= self.reset_at:
+                    self.tokens = float(self.capacity)
+                    self.reset_at = None
+            else:
+                rate = self.capacity / self.window
+                self.tokens = min(float(self.capacity), self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def acquire(self, deadline: float) -> bool:
+        """Take one token, waiting until ``deadline`` (monotonic) at most; False on timeout."""
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait_for = self.paused_until - now
+                if wait_for <= 0:
+                    if self.capacity is None or self.tokens >= 1:
+                        if self.capacity is not None:
+                            self.tokens -= 1
+                        return True
+                    if self.reset_at is not None:
+                        wait_for = self.reset_at - now
+                    else:
+                        wait_for = (1 - self.tokens) * self.window / self.capacity
+                if now + wait_for > deadline:
+                    return False
+                self.lock.wait(wait_for)
+
+    def update(self, headers) -> bool:
+        """Resize the bucket from a response; True when it now knows when it refills."""
+        try:
+            limit = int(headers.get('X-RateLimit-Limit', ''))
+            remaining = int(headers.get('X-RateLimit-Remaining', ''))
+        except (TypeError, ValueError):
+            return False
+        if limit <= 0:
+            return False
+        reset_in = None
+        try:
+            # OpenRouter sends the reset time in epoch milliseconds
+            reset_in = float(headers.get('X-RateLimit-Reset', '')) / 1000.0 - time.time()
+        except ValueError:
+            pass
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            remaining = float(min(max(0, remaining), limit))
+            # Responses of requests sent earlier report stale counts, so the
+            # server can only lower ours (other clients may share the key)
+            self.tokens = remaining if self.capacity is None else min(self.tokens, remaining)
+            self.capacity = limit
+            if reset_in is not None and 0 < reset_in <= self.window:
+                # A little slack for clock skew and the header's rounding
+                self.reset_at = now + reset_in + RATE_RESET_SLACK
+            self.lock.notify_all()
+            return self.reset_at is not None
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def reset(self):
+        with self.lock:
+            self.capacity = None
+            self.tokens = 0.0
+            self.reset_at = None
+            self.paused_until = 0.0
+            self.lock.notify_all()
+
+
+class Provider:
+    """One OpenAI-compatible chat endpoint: base URL, default model, key and headers.
+
+    Each provider has its own ``RateLimiter``, since throttling on one
+    endpoint says nothing about another. The built-in OpenRouter provider
+    reads its key from the keyring at request time (``api_key`` is None).
+    """
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: Optional[str] = None,
+                 headers: Optional[dict] = None, limiter: Optional[RateLimiter] = None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.headers = dict(headers or {})
+        self.limiter = limiter if limiter is not None else RateLimiter()
+
+    def route_id(self, model: str) -> str:
+        # OpenRouter keeps bare model names, so breaker state and the
+        # served_by counters read as before
+        return model if self.name == DEFAULT_PROVIDER else f'{self.name}:{model}'
+
+
+# One model on one provider; ``id`` keys the breaker, the latency stats and served_by
+Route = namedtuple('Route', 'id provider model api_key')
+
+
+class OperationCancelled(Exception):
+    """Raised on the thread working for a task once that task is cancelled, superseded or expired."""
+
+
+class ClipboardBackend:
+    """Plain-text clipboard access: ``copy``, ``paste`` and an optional change counter.
+
+    ``sequence()`` returns a number that changes whenever the clipboard does,
+    or None where the platform has no cheap way to tell; ``wait_for_clipboard``
+    then reads the contents on every poll.
+    """
+
+    name = 'base'
+
+    def copy(self, text: str):
+        raise NotImplementedError
+
+    def paste(self) -> str:
+        raise NotImplementedError
+
+    def sequence(self) -> Optional[int]:
+        return None
+
+
+class PyperclipClipboard(ClipboardBackend):
+    """pyperclip: a new clipboard window (Windows) or xclip/xsel/wl-copy process (Linux) per call."""
+
+    name = 'pyperclip'
+
+    def __init__(self):
+        import pyperclip
+        self._pyperclip = pyperclip
+
+    def copy(self, text: str):
+        self._pyperclip.copy(text)
+
+    def paste(self) -> str:
+        return self._pyperclip.paste()
+
+    def sequence(self) -> Optional[int]:
+        if os.name != 'nt':
+            return None
+        try:
+            return int(ctypes.windll.user32.GetClipboardSequenceNumber())
+        except Exception:
+            return None
+
+
+class MemoryClipboard(ClipboardBackend):
+    """In-process clipboard for tests and benchmarks: ``set_clipboard_backend(MemoryClipboard())``."""
+
+    name = 'memory'
+
+    def __init__(self, text: str = ''):
+        self.lock = threading.Lock()
+        self.text = text
+        self.changes = 0
+
+    def copy(self, text: str):
+        with self.lock:
+            self.text = str(text)
+            self.changes += 1
+
+    def paste(self) -> str:
+        with self.lock:
+            return self.text
+
+    def sequence(self) -> Optional[int]:
+        return self.changes
+
+
+class _ClipboardThread(ClipboardBackend):
+    """Runs every clipboard operation on one thread that owns the native handles.
+
+    Neither a Win32 window nor an X connection may be used from several
+    threads at once, and both have to keep answering messages while the app
+    waits on other things, so callers hand their work to this thread and wait
+    for the result.
+    """
+
+    call_timeout = 3.0
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        ready = threading.Event()
+        self._error = None
+        threading.Thread(target=self._run, args=(ready,), name=f'clipboard-{self.name}', daemon=True).start()
+        ready.wait(self.call_timeout)
+        if self._error is not None:
+            raise self._error
+        if not ready.is_set():
+            raise OSError(f'{self.name} clipboard did not start')
+
+    def _run(self, ready: threading.Event):
+        try:
+            self._setup()
+        except Exception as e:
+            self._error = e
+            ready.set()
+            return
+        ready.set()
+        self._loop()
+
+    def _call(self, fn, *args):
+        future = Future()
+        self._requests.put((fn, args, future))
+        self._wake()
+        try:
+            return future.result(timeout=self.call_timeout)
+        except FutureTimeout:
+            # A copy that runs after its caller gave up would overwrite a later one
+            future.cancel()
+            raise
+
+    def _drain(self):
+        while True:
+            try:
+                fn, args, future = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def copy(self, text: str):
+        self._call(self._copy, text)
+
+    def paste(self) -> str:
+        return self._call(self._paste)
+
+
+class Win32Clipboard(_ClipboardThread):
+    """The Win32 clipboard through ctypes, opened by one hidden message-only window.
+
+    The window is created once and lives on the clipboard thread, instead of
+    one window per call as with pyperclip. When another program holds the
+    clipboard open, ``OpenClipboard`` is retried with a short backoff for up
+    to ``open_timeout`` seconds before giving up.
+    """
+
+    name = 'win32'
+    open_timeout = 0.5
+    CF_UNICODETEXT = 13
+    GMEM_MOVEABLE = 0x0002
+    HWND_MESSAGE = -3
+    QS_ALLINPUT = 0x04FF
+    PM_REMOVE = 0x0001
+    INFINITE = 0xFFFFFFFF
+
+    def __init__(self):
+        from ctypes import wintypes
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        # Own WinDLL instances, so these prototypes do not leak into other ctypes users
+        user32.OpenClipboard.argtypes = [wintypes.HWND]
+        user32.OpenClipboard.restype = wintypes.BOOL
+        user32.CloseClipboard.restype = wintypes.BOOL
+        user32.EmptyClipboard.restype = wintypes.BOOL
+        user32.GetClipboardData.argtypes = [wintypes.UINT]
+        user32.GetClipboardData.restype = wintypes.HANDLE
+        user32.SetClipboardData.argtypes = [wintypes.UINT, wintypes.HANDLE]
+        user32.SetClipboardData.restype = wintypes.HANDLE
+        user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+        user32.CreateWindowExW.argtypes = [
+            wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD, ctypes.c_int, ctypes.c_int,
+            ctypes.c_int, ctypes.c_int, wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID,
+        ]
+        user32.CreateWindowExW.restype = wintypes.HWND
+        user32.MsgWaitForMultipleObjects.argtypes = [
+            wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD, wintypes.DWORD,
+        ]
+        user32.MsgWaitForMultipleObjects.restype = wintypes.DWORD
+        user32.PeekMessageW.argtypes = [
+            ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT, wintypes.UINT,
+        ]
+        user32.PeekMessageW.restype = wintypes.BOOL
+        user32.TranslateMessage.argtypes = [ctypes.POINTER(wintypes.MSG)]
+        user32.DispatchMessageW.argtypes = [ctypes.POINTER(wintypes.MSG)]
+        user32.DispatchMessageW.restype = ctypes.c_ssize_t
+        kernel32.GlobalAlloc.argtypes = [wintypes.UINT, ctypes.c_size_t]
+        kernel32.GlobalAlloc.restype = wintypes.HGLOBAL
+        kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+        kernel32.GlobalLock.restype = wintypes.LPVOID
+        kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+        kernel32.GlobalUnlock.restype = wintypes.BOOL
+        kernel32.GlobalFree.argtypes = [wintypes.HGLOBAL]
+        kernel32.GlobalFree.restype = wintypes.HGLOBAL
+        kernel32.CreateEventW.argtypes = [wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+        kernel32.CreateEventW.restype = wintypes.HANDLE
+        kernel32.SetEvent.argtypes = [wintypes.HANDLE]
+        kernel32.SetEvent.restype = wintypes.BOOL
+        self._user32, self._kernel32, self._wintypes = user32, kernel32, wintypes
+        self._hwnd = None
+        self._event = kernel32.CreateEventW(None, False, False, None)
+        if not self._event:
+            raise ctypes.WinError(ctypes.get_last_error())
+        super().__init__()
+
+    def _setup(self):
+        self._hwnd = self._user32.CreateWindowExW(
+            0, 'STATIC', 'CopyPolish clipboard', 0, 0, 0, 0, 0, self.HWND_MESSAGE, None, None, None
+        )
+        if not self._hwnd:
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def _loop(self):
+        user32 = self._user32
+        msg = self._wintypes.MSG()
+        event = self._wintypes.HANDLE(self._event)
+        while True:
+            user32.MsgWaitForMultipleObjects(1, ctypes.byref(event), False, self.INFINITE, self.QS_ALLINPUT)
+            while user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, self.PM_REMOVE):
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+            self._drain()
+
+    def _wake(self):
+        self._kernel32.SetEvent(self._event)
+
+    def _open(self):
+        deadline = time.monotonic() + self.open_timeout
+        delay = 0.001
+        while not self._user32.OpenClipboard(self._hwnd):
+            if time.monotonic() >= deadline:
+                raise OSError(f'clipboard is held open by another program (error {ctypes.get_last_error()})')
+            increment_counter('clipboard_busy_retries')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.02)
+
+    def _paste(self) -> str:
+        self._open()
+        try:
+            handle = self._user32.GetClipboardData(self.CF_UNICODETEXT)
+            if not handle:
+                return ''
+            pointer = self._kernel32.GlobalLock(handle)
+            if not pointer:
+                return ''
+            try:
+                return ctypes.wstring_at(pointer)
+            finally:
+                self._kernel32.GlobalUnlock(handle)
+        finally:
+            self._user32.CloseClipboard()
+
+    def _copy(self, text: str):
+        data = text.encode('utf-16-le') + b'\0\0'
+        self._open()
+        try:
+            self._user32.EmptyClipboard()
+            if not text:
+                return
+            handle = self._kernel32.GlobalAlloc(self.GMEM_MOVEABLE, len(data))
+            if not handle:
+                raise MemoryError('GlobalAlloc failed')
+            pointer = self._kernel32.GlobalLock(handle)
+            if not pointer:
+                error = ctypes.get_last_error()
+                self._kernel32.GlobalFree(handle)
+                raise ctypes.WinError(error)
+            ctypes.memmove(pointer, data, len(data))
+            self._kernel32.GlobalUnlock(handle)
+            # On success the clipboard owns the memory
+            if not self._user32.SetClipboardData(self.CF_UNICODETEXT, handle):
+                self._kernel32.GlobalFree(handle)
+                raise ctypes.WinError(ctypes.get_last_error())
+        finally:
+            self._user32.CloseClipboard()
+
+    def sequence(self) -> Optional[int]:
+        return int(self._user32.GetClipboardSequenceNumber())
+
+
+class X11Clipboard(_ClipboardThread):
+    """The X11 CLIPBOARD selection, owned over one persistent X connection.
+
+    Copying makes our hidden window the selection owner and answers other
+    programs' requests for the text from the clipboard thread; pasting
+    converts the selection into a property of that window, following the
+    INCR protocol for large selections. pyperclip instead starts an
+    xclip/xsel process per call, and xclip stays running to own the text.
+    Uses python-xlib, which pystray already pulls in on Linux. Text larger
+    than one X request is still handed to pyperclip.
+    """
+
+    name = 'x11'
+    transfer_timeout = 1.0
+
+    def __init__(self):
+        from Xlib import X, Xatom, display
+        from Xlib.protocol import event
+        self._X, self._Xatom, self._event_types = X, Xatom, event
+        self._display = display.Display()
+        self._wake_r, self._wake_w = os.pipe()
+        self._owned = None
+        self._fallback = None
+        super().__init__()
+
+    def _setup(self):
+        X, d = self._X, self._display
+        self._window = d.screen().root.create_window(
+            0, 0, 1, 1, 0, X.CopyFromParent, event_mask=X.PropertyChangeMask
+        )
+        self._clipboard = d.intern_atom('CLIPBOARD')
+        self._utf8 = d.intern_atom('UTF8_STRING')
+        self._targets = d.intern_atom('TARGETS')
+        self._incr = d.intern_atom('INCR')
+        self._property = d.intern_atom('COPYPOLISH_CLIPBOARD')
+        # Room for the ChangeProperty request header
+        self._max_bytes = d.display.info.max_request_length * 4 - 64
+        d.flush()
+
+    def _loop(self):
+        import select
+        d = self._display
+        while True:
+            while d.pending_events():
+                self._handle(d.next_event())
+            readable, _, _ = select.select([d.fileno(), self._wake_r], [], [])
+            if self._wake_r in readable:
+                os.read(self._wake_r, 512)
+                self._drain()
+
+    def _wake(self):
+        os.write(self._wake_w, b'.')
+
+    def _handle(self, ev):
+        X = self._X
+        if ev.type == X.SelectionRequest:
+            self._serve(ev)
+        elif ev.type == X.SelectionClear and ev.atom == self._clipboard:
+            self._owned = None
+
+    def _serve(self, ev):
+        X, Xatom = self._X, self._Xatom
+        # Clients from before ICCCM 2 leave the property as None
+        target = ev.property or ev.target
+        if ev.selection != self._clipboard or self._owned is None:
+            target = X.NONE
+        elif ev.target == self._targets:
+            ev.requestor.change_property(target, Xatom.ATOM, 32, [self._targets, self._utf8, Xatom.STRING])
+        elif ev.target == self._utf8:
+            ev.requestor.change_property(target, self._utf8, 8, self._owned)
+        elif ev.target == Xatom.STRING:
+            data = self._owned.decode('utf-8').encode('latin-1', 'replace')
+            ev.requestor.change_property(target, Xatom.STRING, 8, data)
+        else:
+            target = X.NONE
+        ev.requestor.send_event(self._event_types.SelectionNotify(
+            time=ev.time, requestor=ev.requestor, selection=ev.selection, target=ev.target, property=target,
+        ))
+        self._display.flush()
+
+    def _wait_event(self, predicate):
+        import select
+        d = self._display
+        deadline = time.monotonic() + self.transfer_timeout
+        while True:
+            while d.pending_events():
+                ev = d.next_event()
+                if predicate(ev):
+                    return ev
+                self._handle(ev)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise OSError('X clipboard owner did not answer')
+            select.select([d.fileno()], [], [], remaining)
+
+    def _copy(self, text: str):
+        X, d = self._X, self._display
+        self._owned = text.encode('utf-8')
+        self._window.set_selection_owner(self._clipboard, X.CurrentTime)
+        owner = d.get_selection_owner(self._clipboard)
+        if getattr(owner, 'id', owner) != self._window.id:
+            self._owned = None
+            raise OSError('could not take ownership of the X clipboard')
+
+    def _paste(self) -> str:
+        X, d, window = self._X, self._display, self._window
+        owner = d.get_selection_owner(self._clipboard)
+        owner = getattr(owner, 'id', owner)
+        if owner == window.id:
+            return (self._owned or b'').decode('utf-8')
+        if owner == X.NONE:
+            return ''
+        window.delete_property(self._property)
+        window.convert_selection(self._clipboard, self._utf8, self._property, X.CurrentTime)
+        d.flush()
+        ev = self._wait_event(lambda e: e.type == X.SelectionNotify and e.requestor.id == window.id)
+        if ev.property == X.NONE:
+            return ''
+        reply = window.get_full_property(self._property, X.AnyPropertyType)
+        window.delete_property(self._property)
+        d.flush()
+        if reply is None:
+            return ''
+        if reply.property_type != self._incr:
+            return bytes(reply.value).decode('utf-8', 'replace')
+        # INCR: the owner writes one chunk per deleted property, ending with an empty one
+        chunks = []
+        while True:
+            self._wait_event(lambda e: (
+                e.type == X.PropertyNotify and e.window.id == window.id
+                and e.atom == self._property and e.state == X.PropertyNewValue
+            ))
+            part = window.get_full_property(self._property, X.AnyPropertyType)
+            window.delete_property(self._property)
+            d.flush()
+            if part is None or not len(part.value):
+                return b''.join(chunks).decode('utf-8', 'replace')
+            chunks.append(bytes(part.value))
+
+    def copy(self, text: str):
+        if len(text.encode('utf-8')) > self._max_bytes:
+            if self._fallback is None:
+                self._fallback = PyperclipClipboard()
+            self._fallback.copy(text)
+            return
+        super().copy(text)
+
+
 APP_NAME = 'CopyPolish'
 OLD_APP_NAME = 'AutoCopyAI'
-task_queue = queue.Queue()
+DEFAULT_WORKER_COUNT = 2
+DEFAULT_QUEUE_SIZE = 8
+QUEUE_POLICIES = ('reject', 'coalesce', 'drop_oldest')
+PASTE_ORDER_TIMEOUT = 120.0
+task_queue = TaskQueue(maxsize=DEFAULT_QUEUE_SIZE)
+worker_threads = []
+# Per focus target: next sequence number to hand out, next one allowed to paste,
+# and finished ones that are still waiting for an earlier request.
+_order_cond = threading.Condition()
+_order_issued = {}
+_order_turn = {}
+_order_done = {}
+_paste_lock = threading.Lock()
+_inflight_lock = threading.Lock()
+_inflight = {}
+# Queued and running tasks by id, so a repeat hotkey or the tray menu can cancel them.
+# Waits on the worker side wake up every CANCEL_POLL_INTERVAL to notice a cancel.
+_active_lock = threading.Lock()
+_active_tasks = {}
+CANCEL_POLL_INTERVAL = 0.1
+# Hook callbacks only timestamp and enqueue; the capture thread does the clipboard work.
+# Presses of the same hotkey closer than hotkey_debounce_ms (auto-repeat included),
+# or while one is still waiting, are dropped.
+DEFAULT_HOTKEY_DEBOUNCE_MS = 300
+_hotkey_events = queue.SimpleQueue()
+_hotkey_last = {}
+_hotkey_pending = set()
+_hotkey_stats = {'debounced': 0}
+_hotkey_debounce_s = DEFAULT_HOTKEY_DEBOUNCE_MS / 1000.0
+_capture_thread = None
+_history_lock = threading.Lock()
+_history = deque()
+_history_chars = 0
+_history_next_id = 1
+_history_db = None
+_history_db_lock = threading.Lock()
+_tm_db = None
+_tm_db_lock = threading.Lock()
+_tm_permutations = None
+# Newest screenshot per directory: base -> {'path', 'mtime', 'dir_mtime', 'exts'}
+_shot_lock = threading.Lock()
+_shot_index = {}
+_shot_watched = set()
+SCREENSHOT_POLL_INTERVAL = 2.0
+# Model catalog shown in Settings, cached in MODELS_CACHE_PATH
+DEFAULT_MODELS_TTL_HOURS = 24
+_models_lock = threading.Lock()
 ui_queue = queue.Queue()
 
 SITE_URL = os.getenv("OPENROUTER_SITE_URL", "https://desktop.app/copypolish")
 SITE_NAME = os.getenv("OPENROUTER_SITE_NAME", "CopyPolish Desktop Tool")
+API_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip('/')
 
 CONFIG_DIR = os.path.join(os.getenv('APPDATA', os.path.expanduser('~')), APP_NAME)
 CONFIG_PATH = os.path.join(CONFIG_DIR, 'config.json')
 LOG_PATH = os.path.join(CONFIG_DIR, 'app.log')
+CACHE_DIR = os.path.join(CONFIG_DIR, 'cache')
+METRICS_PATH = os.path.join(CONFIG_DIR, 'metrics.json')
+TRACE_PATH = os.path.join(CONFIG_DIR, 'trace.jsonl')
+MODELS_CACHE_PATH = os.path.join(CONFIG_DIR, 'models.json')
+HISTORY_PATH = os.path.join(CONFIG_DIR, 'history.sqlite3')
+TM_PATH = os.path.join(CONFIG_DIR, 'tm.sqlite3')
 config_lock = threading.Lock()
-config = {}
+# Read-only snapshot, replaced as a whole by update_config(); request-path code
+# reads it without config_lock and never sees a half-applied change
+config = MappingProxyType({})
+# API key read from the keyring once and swapped on save, so hotkeys do no keyring I/O
+_api_key_snapshot: Optional[str] = None
 is_listening = False
 hotkey_handlers = []
 tray_icon = None
+# Shared HTTP session: keeps the TCP/TLS connection to OpenRouter alive between
+# hotkey presses so only the first call pays for DNS + connect + handshake.
+_http_session: Optional[requests.Session] = None
+_http_lock = threading.Lock()
+_http_last_used = 0.0
+_prewarm_lock = threading.Lock()
+_keepalive_thread: Optional[threading.Thread] = None
+# Seconds without traffic after which the idle connection is refreshed.
+# Kept below the usual ~60 s idle timeout of the CDN in front of OpenRouter.
+KEEPALIVE_INTERVAL = 45.0
+PREWARM_MIN_INTERVAL = 5.0
+# Response cache: small in-memory LRU in front of one JSON file per entry in CACHE_DIR
+CACHE_MEMORY_ENTRIES = 128
+_cache_lock = threading.Lock()
+_cache_memory: 'OrderedDict[str, tuple]' = OrderedDict()
+_cache_disk_index: Optional[dict] = None
+cache_stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+# Per-stage timings: rolling window of recent samples, summarized into METRICS_PATH
+METRICS_WINDOW = 512
+METRICS_DUMP_INTERVAL = 60.0
+_metrics_lock = threading.Lock()
+_metrics = {}
+_metrics_totals = {}
+metric_counters = {}
+_trace_local = threading.local()
+profile_enabled = False
+# Opt-in trace recorder (trace_enabled / --trace): one JSON line per hotkey
+# press, capture and finished task in TRACE_PATH, without any text content
+TRACE_VERSION = 1
+TRACE_FLUSH_INTERVAL = 1.0
+DEFAULT_TRACE_MAX_KB = 10240
+TRACE_CONFIG_KEYS = (
+    'worker_count', 'queue_size', 'queue_policy', 'supersede_on_repeat', 'stream_output',
+    'hedge_delay_ms', 'chunk_threshold_chars', 'tm_enabled',
+)
+_recorder_on = False
+_recorder_buffer = deque()
+_recorder_lock = threading.Lock()
+_recorder_thread = None
+_recorder_t0 = 0.0
+_recorder_salt = b''
+_recorder_windows = {}
+_task_ids = itertools.count(1)
 # New defaults chosen to avoid common Outlook shortcuts
 # Polish/Re-write: Ctrl+Alt+Y (Y = Yaz/yeniden yaz)
 # Translate TR→EN: Ctrl+Alt+T (T = Translation)
@@ -62,6 +763,8 @@ default_hotkey = 'ctrl+alt+y'
 default_translate_hotkey = 'ctrl+alt+t'
 # Paste last screenshot path: Ctrl+Alt+V
 default_screenshot_path_hotkey = 'ctrl+alt+v'
+# Re-paste the latest result from history: Ctrl+Alt+G (G = Geçmiş)
+default_repaste_hotkey = 'ctrl+alt+g'
 
 SYSTEM_PROMPT = """Sen, bir e-postanın ana mesajını ve samimiyet tonunu koruyarak onu daha akıcı ve etkili hale getiren bir iletişim asistanısın. Aşağıdaki kurallara harfiyen uymalısın:
 
@@ -81,12 +784,220 @@ TRANSLATE_PROMPT = """You are a precise translator from Turkish to English. Foll
 3. Keep formatting and line breaks when possible.
 """
 
+# Model control tokens such as '<|im_end|>' that must never reach the user's document
+TECH_TOKEN_RE = re.compile(r'<\|[^<>|]{0,64}\|>')
+# Streaming flush points: sentence punctuation followed by whitespace, or a line break
+SENTENCE_END_RE = re.compile(r'[.!?…]+["\'”’)\]]*(?=\s)|\n')
+STREAM_TOKEN_HOLD_CHARS = 70
+# Clipboard polling: first check after 5 ms, doubling up to 25 ms between checks
+CLIPBOARD_POLL_START = 0.005
+CLIPBOARD_POLL_MAX = 0.025
+DEFAULT_CLIPBOARD_TIMEOUT_MS = 1000
+CLIPBOARD_SET_TIMEOUT = 0.3
+# ctrl+v only queues a keystroke; the target app reads the clipboard when it
+# gets to it, so the clipboard is left alone for this long after each paste
+DEFAULT_PASTE_SETTLE_MS = 150
+_last_paste = 0.0
+# 'native' keeps one Win32 window / X connection open; 'pyperclip' starts over on every call
+CLIPBOARD_BACKENDS = ('native', 'pyperclip')
+_clipboard_lock = threading.Lock()
+_clipboard = None
+# Long selections are split into paragraph chunks that are processed concurrently
+DEFAULT_CHUNK_THRESHOLD = 6000
+DEFAULT_CHUNK_SIZE = 3000
+DEFAULT_CHUNK_CONCURRENCY = 4
+# Shared by every chunked request; each one keeps at most chunk_concurrency of
+# its pieces running, and idle threads cost nothing until they are needed
+CHUNK_POOL_SIZE = 32
+PARAGRAPH_SEP_RE = re.compile(r'(\r?\n[ \t]*\r?\n\s*)')
+SENTENCE_SEP_RE = re.compile(r'(?<=[.!?…])(\s+)')
+# Input trimming (strip_quoted): quoted replies, signatures and legal footers
+# are set aside before the API call and put back around the answer unchanged
+QUOTE_LINE_RE = re.compile(r'[ \t]*>')
+QUOTE_SEPARATOR_RE = re.compile(
+    r'\s*(?:-{2,}\s*(?:original message|özgün ileti|orijinal ileti|özgün mesaj|orijinal mesaj|'
+    r'forwarded message|iletilen ileti)\s*-{2,}|_{10,}\s*$)',
+    re.IGNORECASE,
+)
+QUOTE_FROM_RE = re.compile(r'\s*\*?(?:from|gönderen|kimden)\s*:', re.IGNORECASE)
+QUOTE_FIELD_RE = re.compile(
+    r'\s*\*?(?:sent|date|to|cc|subject|gönderildi|gönderilme tarihi|tarih|kime|bilgi|konu)\s*:', re.IGNORECASE
+)
+QUOTE_ATTRIBUTION_RE = re.compile(r'\s*(?:on\b.{0,240}\bwrote|.{0,240}\bşunu yazdı)\s*:\s*$', re.IGNORECASE)
+SIGNATURE_MARK_RE = re.compile(
+    r"(?:--[ \t]*$|\s*(?:sent from my|get outlook for|iphone'umdan gönderildi|android için outlook))", re.IGNORECASE
+)
+VALEDICTION_RE = re.compile(
+    r'\s*(?:(?:saygılarımla|saygılarımızla|iyi çalışmalar(?: dilerim)?|best regards|kind regards|warm regards|'
+    r'sincerely|yours sincerely)[ \t]*[,.!]?'
+    # Words that also start ordinary lines only count with the comma of a closing
+    r'|(?:saygılar|sevgiler|sevgilerimle|teşekkürler|teşekkür ederim|regards|best|thanks|thank you|cheers)[ \t]*,)\s*$',
+    re.IGNORECASE,
+)
+FOOTER_START_RE = re.compile(
+    r'\s*\**\s*(?:bu (?:e-?posta|e-?mail|ileti|mesaj)|this (?:e-?mail|email|message|communication)|'
+    r'confidentiality|disclaimer|yasal uyarı|gizlilik)',
+    re.IGNORECASE,
+)
+FOOTER_WORDS_RE = re.compile(
+    r'gizli|confidential|privileged|intended (?:solely |only )?for|intended recipient|yetkisiz|muhatab|'
+    r'sorumluluk|liability|disclos|ifşa|notify the sender|gönderene bildir',
+    re.IGNORECASE,
+)
+SIGNATURE_MAX_LINES = 6
+SIGNATURE_MAX_WORDS = 6
+# A legal footer is the last block of the text, after a blank or rule line
+FOOTER_RULE_RE = re.compile(r'\s*(?:[-_*=]{3,}\s*)?$')
+FOOTER_MAX_LINES = 12
+# Rough input size for reporting; close enough for English, low for Turkish
+CHARS_PER_TOKEN = 4
+# Model fallback: after the hedge delay the next model in the chain is asked too
+DEFAULT_HEDGE_DELAY_MS = 4000
+HEDGE_POOL_SIZE = 16
+# Circuit breaker: a model is skipped for BREAKER_COOLDOWN seconds once at least
+# BREAKER_MIN_SAMPLES of its last BREAKER_WINDOW calls show a high error rate or
+# a median latency above breaker_slow_ms
+BREAKER_WINDOW = 20
+BREAKER_MIN_SAMPLES = 4
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN = 60.0
+DEFAULT_BREAKER_SLOW_MS = 20000
+# --batch mode
+DEFAULT_BATCH_CONCURRENCY = 4
+BATCH_EXTENSIONS = ('.txt', '.md', '.eml')
+# Local API server (server_enabled): rewrite/translate over HTTP on 127.0.0.1 only
+DEFAULT_SERVER_PORT = 8765
+DEFAULT_SERVER_CONCURRENCY = 4
+SERVER_MAX_BODY = 1024 * 1024
+SERVER_BUSY_WAIT = 2.0
+SERVER_ROUTES = {'/v1/rewrite': 'rewrite', '/v1/translate': 'translate'}
+SERVER_HOSTS = ('127.0.0.1', 'localhost')
+# Recent results for instant re-paste: at most history_size entries and
+# history_max_kb of text (originals + results), in memory and in HISTORY_PATH
+DEFAULT_HISTORY_SIZE = 20
+DEFAULT_HISTORY_MAX_KB = 512
+HISTORY_MENU_ITEMS = 10
+HISTORY_PREVIEW_CHARS = 40
+# Translation memory (tm_enabled): Turkish->English sentence pairs in TM_PATH
+# (at most tm_max_kb on disk). Exact matches are reused; near matches found by
+# MinHash over character shingles only go to the model as hints
+DEFAULT_TM_MAX_KB = 4096
+DEFAULT_TM_FUZZY = 0.9
+TM_SHINGLE = 3
+TM_PERMUTATIONS = 64
+TM_BANDS = 16
+TM_PRIME = (1 << 61) - 1
+TM_MAX_SENTENCE = 2000
+TM_SPLIT_RE = re.compile(r'((?<=[.!?…])\s+|[ \t]*\n\s*)')
+TM_DIGITS_RE = re.compile(r'\d+')
+TM_MARKER_RE = re.compile(r'^[ \t]*\[\[(\d+)\]\][ \t]*$', re.MULTILINE)
+# Sentence alignment: expected English/Turkish length ratio, the largest
+# ratio still stored, and the extra cost of a split or merged sentence
+TM_LENGTH_RATIO = 1.1
+TM_MAX_RATIO = 2.0
+TM_MERGE_PENALTY = 0.3
+# Retries: exponential backoff with full jitter, bounded by the request deadline
+DEFAULT_REQUEST_DEADLINE = 45.0
+DEFAULT_MAX_RETRIES = 3
+CONNECT_TIMEOUT = 10.0
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 8.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_RESET_SLACK = 0.05
+rate_limiter = RateLimiter()
+
+DEFAULT_PROVIDER = 'openrouter'
+ROUTING_MODES = ('latency', 'order')
+DEFAULT_ROUTE_PROBE_S = 300.0
+ROUTE_TTFB_WINDOW = 20
+_providers_lock = threading.Lock()
+# Rebuilt whenever ``config`` is replaced; limiters are carried over by name
+_providers = {}
+_providers_config = None
+
 def show_notification(title, body=""):
+    """Queue a toast for the notification thread; never waits for the UI.
+
+    With ``notifications_async`` set to false the toast is shown inline, as
+    before (kept for comparison). Either way the caller's time is recorded
+    as the ``notify_caller`` metric.
+    """
+    t0 = time.perf_counter()
     try:
-        if _toaster is not None and Toast is not None:
+        if not config.get('notifications_async', True):
+            _deliver_notification(title, body)
+            increment_counter('notifications_shown')
+            return
+        _ensure_notification_thread()
+        try:
+            _notify_queue.put_nowait((title, body))
+        except queue.Full:
+            # Keep the newest: drop the oldest waiting toast to make room
+            try:
+                _notify_queue.get_nowait()
+            except queue.Empty:
+                pass
+            increment_counter('notifications_dropped')
+            try:
+                _notify_queue.put_nowait((title, body))
+            except queue.Full:
+                pass
+    finally:
+        record_metric('notify_caller', time.perf_counter() - t0)
+
+def _ensure_notification_thread():
+    global _notify_thread
+    if _notify_thread is not None:
+        return
+    with _notify_lock:
+        if _notify_thread is None:
+            _notify_thread = threading.Thread(target=_notification_loop, name='notify', daemon=True)
+            _notify_thread.start()
+
+def coalesce_notifications(batch: list) -> list:
+    """Collapse toasts that arrived within one window.
+
+    A progress toast ("İşlem Başlatılıyor...") is superseded by anything that
+    follows it, identical toasts are shown once with a count, and at most
+    NOTIFY_MAX_PER_WINDOW of the newest remain.
+    """
+    if len(batch) > 1:
+        batch = [n for n in batch if n[0] not in NOTIFY_PROGRESS_TITLES] or batch[-1:]
+    counts = OrderedDict()
+    for item in batch:
+        counts[item] = counts.get(item, 0) + 1
+    out = [(f'{title} (x{n})' if n > 1 else title, body) for (title, body), n in counts.items()]
+    return out[-NOTIFY_MAX_PER_WINDOW:]
+
+def _notification_loop():
+    while True:
+        batch = [_notify_queue.get()]
+        deadline = time.monotonic() + NOTIFY_COALESCE_WINDOW
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_notify_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        shown = coalesce_notifications(batch)
+        if len(shown) < len(batch):
+            increment_counter('notifications_coalesced', len(batch) - len(shown))
+        for title, body in shown:
+            t0 = time.perf_counter()
+            _deliver_notification(title, body)
+            record_metric('notify_deliver', time.perf_counter() - t0)
+            increment_counter('notifications_shown')
+
+def _deliver_notification(title, body=""):
+    try:
+        toaster = _get_toaster()
+        if toaster is not None:
+            from windows_toasts import Toast
             new_toast = Toast()
             new_toast.text_fields = [title, body]
-            _toaster.show_toast(new_toast)
+            toaster.show_toast(new_toast)
         else:
             # Fallback: best-effort message box only for critical messages.
             # Keep silent for normal info to avoid bothering users.
@@ -135,7 +1046,167 @@ def has_flag(name: str) -> bool:
     except Exception:
         return False
 
+# Per-model health for the circuit breaker: recent (ok, seconds) results and
+# the monotonic time until which an open breaker skips the model
+_model_lock = threading.Lock()
+_model_results = {}
+_model_open_until = {}
+# Per-route latency for endpoint routing: recent response-header times, and
+# the monotonic time of the last outcome (success or failure) per route
+_route_ttfb = {}
+_route_checked = {}
+_hedge_pool = None
+_chunk_pool = None
+
+def record_metric(stage: str, seconds: float):
+    """Add one timing sample to ``stage``'s rolling window (and trace it with --profile)."""
+    with _metrics_lock:
+        samples = _metrics.get(stage)
+        if samples is None:
+            samples = _metrics[stage] = deque(maxlen=METRICS_WINDOW)
+        samples.append(seconds)
+        _metrics_totals[stage] = _metrics_totals.get(stage, 0) + 1
+    stages = getattr(_trace_local, 'stages', None)
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+    if profile_enabled:
+        logging.info('[trace] task=%s stage=%s %.1f ms', getattr(_trace_local, 'task_id', '-'), stage, seconds * 1000)
+
+def increment_counter(name: str, amount: int = 1):
+    with _metrics_lock:
+        metric_counters[name] = metric_counters.get(name, 0) + amount
+
+def _percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def metrics_snapshot() -> dict:
+    with _metrics_lock:
+        windows = {stage: sorted(samples) for stage, samples in _metrics.items()}
+        totals = dict(_metrics_totals)
+        counters = dict(metric_counters)
+    stages = {}
+    for stage, ordered in windows.items():
+        stages[stage] = {
+            'count': totals.get(stage, 0),
+            'window': len(ordered),
+            'p50_ms': round(_percentile(ordered, 50) * 1000, 2),
+            'p95_ms': round(_percentile(ordered, 95) * 1000, 2),
+            'p99_ms': round(_percentile(ordered, 99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        }
+    counters.update({f'cache_{k}': v for k, v in cache_stats.items()})
+    counters['hotkeys_debounced'] = _hotkey_stats['debounced']
+    return {
+        'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': stages,
+        'counters': counters,
+        'models': model_health_snapshot(),
+    }
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+        _metrics_totals.clear()
+        metric_counters.clear()
+    _hotkey_stats['debounced'] = 0
+
+def dump_metrics():
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp = METRICS_PATH + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(metrics_snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, METRICS_PATH)
+    except Exception as e:
+        logging.debug('Metrics dump failed: %s', e)
+
+def _metrics_loop():
+    while True:
+        time.sleep(METRICS_DUMP_INTERVAL)
+        dump_metrics()
+
+def start_metrics():
+    threading.Thread(target=_metrics_loop, daemon=True).start()
+
+def start_trace_recorder(path: Optional[str] = None):
+    """Start appending trace events to ``path`` (TRACE_PATH by default).
+
+    Events carry times relative to the start, selection sizes, an anonymous
+    window number and a salted hash of the text (equal selections within one
+    recording have equal hashes; the salt is never written), but no content.
+    """
+    global _recorder_on, _recorder_thread, _recorder_t0, _recorder_salt
+    with _recorder_lock:
+        if _recorder_on:
+            return
+        _recorder_t0 = time.perf_counter()
+        _recorder_salt = os.urandom(16)
+        _recorder_windows.clear()
+        _recorder_buffer.append({
+            'ev': 'start', 'v': TRACE_VERSION, 'at': round(time.time(), 3),
+            'config': {k: config[k] for k in TRACE_CONFIG_KEYS if k in config},
+        })
+        _recorder_on = True
+        _recorder_thread = threading.Thread(target=_recorder_loop, args=(path or TRACE_PATH,), name='trace', daemon=True)
+        _recorder_thread.start()
+    logging.info('Trace recorder writing to %s', path or TRACE_PATH)
+
+def stop_trace_recorder():
+    """Stop recording and write out what is still buffered."""
+    global _recorder_on
+    with _recorder_lock:
+        thread, _recorder_on = _recorder_thread, False
+    if thread is not None:
+        thread.join(TRACE_FLUSH_INTERVAL * 3)
+
+def _trace_time(t: float) -> float:
+    return round(t - _recorder_t0, 4)
+
+def _trace_window(target: Optional[int]) -> int:
+    # Window handles mean nothing outside this session; keep only which presses shared a window
+    return _recorder_windows.setdefault(target, len(_recorder_windows))
+
+def _trace_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=6, key=_recorder_salt).hexdigest()
+
+def record_trace_event(ev: str, **fields):
+    """Buffer one trace event; a no-op unless the recorder runs. Safe on the keyboard hook thread."""
+    if _recorder_on:
+        _recorder_buffer.append({'ev': ev, **fields})
+
+def _trace_stages() -> dict:
+    stages = getattr(_trace_local, 'stages', None) or {}
+    _trace_local.stages = None
+    return {k: round(v * 1000, 2) for k, v in stages.items()}
+
+def _recorder_loop(path: str):
+    budget = _config_int('trace_max_kb', DEFAULT_TRACE_MAX_KB, 1) * 1024
+    while True:
+        running = _recorder_on
+        if not running or _recorder_buffer:
+            lines = []
+            while _recorder_buffer:
+                lines.append(json.dumps(_recorder_buffer.popleft(), ensure_ascii=False, separators=(',', ':')))
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                if lines and os.path.exists(path) and os.path.getsize(path) > budget:
+                    # Keep one previous file; the new one starts with a header of its own
+                    os.replace(path, path + '.1')
+                    lines.insert(0, json.dumps({'ev': 'start', 'v': TRACE_VERSION, 'at': round(time.time(), 3),
+                                                'rotated': True}, separators=(',', ':')))
+                if lines:
+                    with open(path, 'a', encoding='utf-8') as f:
+                        f.write('\n'.join(lines) + '\n')
+            except OSError as e:
+                logging.warning('Trace write failed: %s', e)
+        if not running:
+            return
+        time.sleep(TRACE_FLUSH_INTERVAL)
+
 def get_api_key() -> Union[str, None]:
+    import keyring
     v = keyring.get_password(APP_NAME, 'OPENROUTER_API_KEY')
     if v:
         return v
@@ -152,6 +1223,29 @@ def get_api_key() -> Union[str, None]:
         return old
     return None
 
+
+def refresh_api_key() -> Union[str, None]:
+    """Re-read the API key from the keyring into the in-memory snapshot."""
+    global _api_key_snapshot
+    try:
+        key = get_api_key()
+    except Exception as e:
+        logging.warning('Keyring read failed: %s', e)
+        key = None
+    _api_key_snapshot = key
+    return key
+
+def set_api_key_snapshot(key: Optional[str]):
+    global _api_key_snapshot
+    _api_key_snapshot = key or None
+
+def cached_api_key() -> Union[str, None]:
+    key = _api_key_snapshot
+    if key is None:
+        # Not loaded yet, or no key saved: only then go to the keyring
+        key = refresh_api_key()
+    return key
+
 def load_config():
     os.makedirs(CONFIG_DIR, exist_ok=True)
     try:
@@ -180,6 +1274,8 @@ def load_config():
         data['hotkey_translate'] = default_translate_hotkey
     if 'hotkey_screenshot_path' not in data:
         data['hotkey_screenshot_path'] = default_screenshot_path_hotkey
+    if 'hotkey_repaste' not in data:
+        data['hotkey_repaste'] = default_repaste_hotkey
 
     # Targeted migration: if existing shortcuts are known to conflict with Outlook,
     # switch to the new safer defaults. Only migrate if they match the old pairs.
@@ -198,128 +1294,2632 @@ def load_config():
             data['hotkey_screenshot_path'] = default_screenshot_path_hotkey
     except Exception:
         pass
+    update_config(data)
+
+def update_config(changes: dict):
+    """Publish a new config snapshot with ``changes`` applied."""
+    global config
     with config_lock:
-        config.update(data)
+        fresh = dict(config)
+        fresh.update(changes)
+        config = MappingProxyType(fresh)
+
+def save_config():
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    with config_lock:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+            json.dump(dict(config), f, ensure_ascii=False, indent=2)
+
+_timed_adapter_cls = None
+
+def _timed_adapter_class():
+    """HTTPAdapter subclass whose new connections report their connect time (built on first use)."""
+    global _timed_adapter_cls
+    if _timed_adapter_cls is not None:
+        return _timed_adapter_cls
+    import requests
+    import urllib3
+
+    class _TimedHTTPConnection(urllib3.connection.HTTPConnection):
+        def connect(self):
+            t0 = time.perf_counter()
+            super().connect()
+            record_metric('http_connect', time.perf_counter() - t0)
+
+    class _TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+        def connect(self):
+            # Includes the TLS handshake
+            t0 = time.perf_counter()
+            super().connect()
+            record_metric('http_connect', time.perf_counter() - t0)
+
+    class _TimedHTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+        ConnectionCls = _TimedHTTPConnection
+
+    class _TimedHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+        ConnectionCls = _TimedHTTPSConnection
+
+    class _TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _TimedHTTPConnectionPool,
+                'https': _TimedHTTPSConnectionPool,
+            }
+
+    _timed_adapter_cls = _TimedHTTPAdapter
+    return _timed_adapter_cls
+
+def get_api_base_url() -> str:
+    """OpenAI-compatible API root: ``api_base_url`` from config, else OPENROUTER_BASE_URL/OpenRouter."""
+    url = str(config.get('api_base_url') or '').strip()
+    return (url or API_BASE_URL).rstrip('/')
+
+def get_providers() -> list:
+    """The configured endpoints: OpenRouter first, then the entries of ``providers``.
+
+    A ``providers`` entry is a dict with ``base_url`` and ``model`` and
+    optionally ``name``, ``api_key`` (or ``api_key_env``, the name of an
+    environment variable holding it) and extra ``headers``. Invalid entries
+    are skipped with a warning.
+    """
+    global _providers_config
+    snapshot = config
+    with _providers_lock:
+        if _providers_config is snapshot:
+            return list(_providers.values())
+        specs = [(
+            DEFAULT_PROVIDER, get_api_base_url(), snapshot.get('model', 'qwen/qwen3-coder:free'), None,
+            {"HTTP-Referer": SITE_URL, "X-Title": SITE_NAME},
+        )]
+        extra = snapshot.get('providers') or []
+        for item in extra if isinstance(extra, list) else []:
+            if not isinstance(item, dict) or not item.get('base_url') or not item.get('model'):
+                logging.warning('Ignoring provider without base_url/model: %r', item)
+                continue
+            name = str(item.get('name') or item['base_url'])
+            key = item.get('api_key') or os.getenv(str(item.get('api_key_env') or '')) or None
+            headers = item.get('headers') if isinstance(item.get('headers'), dict) else None
+            specs.append((name, str(item['base_url']), str(item['model']), key, headers))
+        fresh = {}
+        for name, base_url, model, key, headers in specs:
+            if name in fresh:
+                logging.warning('Ignoring duplicate provider %s', name)
+                continue
+            old = _providers.get(name)
+            limiter = old.limiter if old is not None else (rate_limiter if name == DEFAULT_PROVIDER else None)
+            fresh[name] = Provider(name, base_url, model, key, headers, limiter)
+        _providers.clear()
+        _providers.update(fresh)
+        _providers_config = snapshot
+        return list(fresh.values())
+
+def get_http_session() -> requests.Session:
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            import requests
+            sess = requests.Session()
+            adapter = _timed_adapter_class()(pool_connections=2, pool_maxsize=8, max_retries=0)
+            sess.mount('https://', adapter)
+            sess.mount('http://', adapter)
+            sess.headers.update({"HTTP-Referer": SITE_URL, "X-Title": SITE_NAME})
+            _http_session = sess
+        return _http_session
+
+def _mark_http_used():
+    global _http_last_used
+    _http_last_used = time.monotonic()
+
+def close_http_session():
+    global _http_session
+    with _http_lock:
+        sess, _http_session = _http_session, None
+    if sess is not None:
+        try:
+            sess.close()
+        except Exception:
+            pass
+
+def _prewarm():
+    # Non-blocking acquire: a warm-up already in flight is good enough.
+    if not _prewarm_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _http_last_used < PREWARM_MIN_INTERVAL:
+            return
+        # Any cheap request opens (or refreshes) the pooled connection; the
+        # status code does not matter, so errors are ignored.
+        for provider in get_providers():
+            try:
+                get_http_session().head(provider.base_url, timeout=5)
+            except Exception:
+                continue
+            _mark_http_used()
+    finally:
+        _prewarm_lock.release()
+
+def prewarm_connection():
+    """Open the pooled API connection in the background so the next call is warm."""
+    threading.Thread(target=_prewarm, daemon=True).start()
+
+def _keepalive_loop():
+    while True:
+        time.sleep(KEEPALIVE_INTERVAL / 3)
+        if is_listening and time.monotonic() - _http_last_used >= KEEPALIVE_INTERVAL:
+            _prewarm()
+
+def start_keepalive():
+    global _keepalive_thread
+    if _keepalive_thread is not None and _keepalive_thread.is_alive():
+        return
+    _keepalive_thread = threading.Thread(target=_keepalive_loop, daemon=True)
+    _keepalive_thread.start()
+
+def _normalize_cache_input(text: str) -> str:
+    text = unicodedata.normalize('NFC', text.replace('\r\n', '\n').replace('\r', '\n'))
+    return '\n'.join(line.rstrip() for line in text.split('\n')).strip()
+
+def response_cache_key(operation: str, system_prompt: str, text: str, route: Optional[Route] = None) -> str:
+    """Key of one answer: the route's provider (name and URL) and model, the prompt and the text.
+
+    Without ``route`` the configured model stands in, which is enough to
+    match identical requests that are in flight.
+    """
+    if route is None:
+        where = [config.get('model', 'qwen/qwen3-coder:free')]
+    else:
+        where = [route.provider.name, route.provider.base_url, route.model]
+    raw = json.dumps([*where, system_prompt, operation, _normalize_cache_input(text)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _cache_enabled() -> bool:
+    return bool(config.get('cache_enabled', True))
+
+def _cache_ttl() -> float:
+    try:
+        return float(config.get('cache_ttl_hours', 168)) * 3600.0
+    except (TypeError, ValueError):
+        return 168 * 3600.0
+
+def _cache_file(key: str) -> str:
+    return os.path.join(CACHE_DIR, f'{key}.json')
+
+def _cache_disk_index_locked() -> dict:
+    # key -> [last_used, size]; built once from the directory, then maintained in place
+    global _cache_disk_index
+    if _cache_disk_index is None:
+        index = {}
+        try:
+            with os.scandir(CACHE_DIR) as it:
+                for entry in it:
+                    if entry.name.endswith('.json') and entry.is_file():
+                        st = entry.stat()
+                        index[entry.name[:-5]] = [st.st_mtime, st.st_size]
+        except OSError:
+            pass
+        _cache_disk_index = index
+    return _cache_disk_index
+
+def _cache_remember_locked(key: str, created: float, text: str):
+    _cache_memory[key] = (created, text)
+    _cache_memory.move_to_end(key)
+    while len(_cache_memory) > CACHE_MEMORY_ENTRIES:
+        _cache_memory.popitem(last=False)
+
+def _cache_drop_locked(key: str):
+    _cache_memory.pop(key, None)
+    _cache_disk_index_locked().pop(key, None)
+    try:
+        os.remove(_cache_file(key))
+    except OSError:
+        pass
+
+def _cache_evict_locked():
+    index = _cache_disk_index_locked()
+    try:
+        max_bytes = int(float(config.get('cache_max_mb', 20)) * 1024 * 1024)
+        max_entries = int(config.get('cache_max_entries', 2000))
+    except (TypeError, ValueError):
+        max_bytes, max_entries = 20 * 1024 * 1024, 2000
+    total = sum(size for _, size in index.values())
+    if total <= max_bytes and len(index) <= max_entries:
+        return
+    for key, (_, size) in sorted(index.items(), key=lambda kv: kv[1][0]):
+        if total <= max_bytes and len(index) <= max_entries:
+            break
+        _cache_drop_locked(key)
+        total -= size
+
+def cache_get(key: str, count_miss: bool = True) -> Union[str, None]:
+    if not _cache_enabled():
+        return None
+    now = time.time()
+    with _cache_lock:
+        hit = _cache_memory.get(key)
+        if hit is not None:
+            created, text = hit
+            if now - created <= _cache_ttl():
+                _cache_memory.move_to_end(key)
+                cache_stats['memory_hits'] += 1
+                return text
+            _cache_drop_locked(key)
+        if key in _cache_disk_index_locked():
+            try:
+                with open(_cache_file(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                created, text = float(entry['created']), entry['text']
+            except (OSError, ValueError, KeyError, TypeError):
+                created, text = 0.0, None
+            if isinstance(text, str) and now - created <= _cache_ttl():
+                try:
+                    os.utime(_cache_file(key))  # mtime doubles as the LRU timestamp
+                except OSError:
+                    pass
+                _cache_disk_index_locked()[key][0] = now
+                _cache_remember_locked(key, created, text)
+                cache_stats['disk_hits'] += 1
+                return text
+            _cache_drop_locked(key)
+        if count_miss:
+            cache_stats['misses'] += 1
+    return None
+
+def cache_put(key: str, text: str):
+    if not _cache_enabled() or not text:
+        return
+    created = time.time()
+    with _cache_lock:
+        _cache_remember_locked(key, created, text)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = _cache_file(key)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'created': created, 'text': text}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            _cache_disk_index_locked()[key] = [created, os.path.getsize(path)]
+            _cache_evict_locked()
+        except OSError as e:
+            logging.warning('Response cache write failed: %s', e)
+
+def clear_response_cache():
+    global _cache_disk_index
+    with _cache_lock:
+        _cache_memory.clear()
+        _cache_disk_index = {}
+        try:
+            shutil.rmtree(CACHE_DIR)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning('Response cache clear failed: %s', e)
+        for k in cache_stats:
+            cache_stats[k] = 0
+
+def _cache_lookup(operation: str, system_prompt: str, selected_data: str) -> tuple:
+    """``(text, routes)``: a cached answer from any route of the chain, best route first.
+
+    Answers are stored under the route that produced them, so one from a
+    fallback model or another provider is never served as another's and
+    stops matching once that route leaves the configuration.
+    """
+    if not _cache_enabled():
+        return None, []
+    routes = _candidate_routes(_timed_api_key(), healthy_only=False)
+    for route in routes:
+        text = cache_get(response_cache_key(operation, system_prompt, selected_data, route), count_miss=False)
+        if text is not None:
+            return text, routes
+    with _cache_lock:
+        cache_stats['misses'] += 1
+    return None, routes
+
+def _cache_store(operation: str, system_prompt: str, selected_data: str, routes: list, text: str):
+    # served_by holds the id of the route that just answered on this thread
+    route = next((r for r in routes if r.id == getattr(_trace_local, 'served_by', None)), None)
+    if route is not None:
+        cache_put(response_cache_key(operation, system_prompt, selected_data, route), text)
+
+def _cached_completion(operation: str, system_prompt: str, selected_data: str, user_prompt: str) -> Union[str, None]:
+    text, routes = _cache_lookup(operation, system_prompt, selected_data)
+    if text is not None:
+        logging.debug('Response cache hit (%s)', operation)
+        _trace_local.served_by = 'cache'
+        return text
+    text = _chat_completion(system_prompt, user_prompt)
+    if text:
+        _cache_store(operation, system_prompt, selected_data, routes, text)
+    return text
+
+def _cached_stream(operation: str, system_prompt: str, selected_data: str, user_prompt: str) -> Iterator[str]:
+    text, routes = _cache_lookup(operation, system_prompt, selected_data)
+    if text is not None:
+        logging.debug('Response cache hit (%s, stream)', operation)
+        _trace_local.served_by = 'cache'
+        yield text
+        return
+    parts = []
+    for delta in stream_chat_completion(system_prompt, user_prompt):
+        parts.append(delta)
+        yield delta
+    # Only reached when the stream finished cleanly
+    if parts:
+        _cache_store(operation, system_prompt, selected_data, routes, ''.join(parts))
+
+def _rewrite_user_prompt(selected_data: str) -> str:
+    return f"Aşağıdaki metni, sistem talimatlarına uyarak yeniden yaz.\n\nYENİDEN YAZILACAK KISIM:\n{selected_data}"
+
+def _translate_user_prompt(selected_data: str) -> str:
+    return f"Translate the following Turkish text into fluent, natural English. Keep tone and meaning.\n\nTEXT:\n{selected_data}"
+
+def request_deadline() -> float:
+    """Monotonic time by which one rewrite/translate call must have its answer.
+
+    Never later than the deadline of the task the calling thread works for.
+    """
+    try:
+        seconds = float(config.get('request_deadline_s', DEFAULT_REQUEST_DEADLINE))
+    except (TypeError, ValueError):
+        seconds = DEFAULT_REQUEST_DEADLINE
+    deadline = time.monotonic() + max(1.0, seconds)
+    task_deadline = getattr(_trace_local, 'deadline', None)
+    return deadline if task_deadline is None else min(deadline, task_deadline)
+
+def _raise_if_cancelled(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled()
+
+def _retry_after(headers) -> Union[float, None]:
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+def _post_chat(
+    api_key: str, system_prompt: str, user_prompt: str, stream: bool = False, model: Optional[str] = None,
+    deadline: Optional[float] = None, retries: Optional[int] = None, cancel: Optional[threading.Event] = None,
+    provider: Optional[Provider] = None,
+) -> requests.Response:
+    """POST a chat completion to ``provider`` (OpenRouter by default), retrying until ``deadline``.
+
+    Every try waits for a token from the provider's limiter. 429/5xx answers and
+    connection errors are retried up to ``retries`` times (``max_retries``
+    by default) after ``Retry-After`` or an exponential backoff with jitter,
+    as long as the wait still ends before the deadline; otherwise the last
+    error is raised. For streams the deadline covers the wait for the
+    response, not the reading of the stream.
+    """
+    import requests
+    if provider is None:
+        provider = get_providers()[0]
+    limiter = provider.limiter
+    headers = {**provider.headers, "Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    body = {
+        "model": model or provider.model,
+        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+    }
+    if stream:
+        body["stream"] = True
+    if deadline is None:
+        deadline = request_deadline()
+    if retries is None:
+        retries = _config_int('max_retries', DEFAULT_MAX_RETRIES, 0)
+    attempt = 0
+    while True:
+        if not limiter.acquire(deadline):
+            increment_counter('rate_limited')
+            raise requests.exceptions.Timeout('rate limit wait exceeds the request deadline')
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout('request deadline exceeded')
+        retry_after = None
+        try:
+            response = get_http_session().post(
+                f"{provider.base_url}/chat/completions",
+                headers=headers,
+                json=body,
+                timeout=(min(CONNECT_TIMEOUT, remaining), remaining),
+                stream=stream,
+            )
+        except requests.exceptions.ConnectionError as e:
+            error = e
+        else:
+            _mark_http_used()
+            # requests stops the clock once the response headers are in: connect + TTFB
+            record_metric('http_ttfb', response.elapsed.total_seconds())
+            knows_reset = limiter.update(response.headers)
+            if response.ok:
+                record_route_ttfb(provider.route_id(body['model']), response.elapsed.total_seconds())
+                return response
+            # Read the short error body so the connection can go back to the pool
+            response.content
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                error = e
+            if response.status_code not in RETRY_STATUSES:
+                raise error
+            retry_after = _retry_after(response.headers)
+            if response.status_code == 429:
+                increment_counter('http_429')
+                if retry_after is not None:
+                    limiter.pause(retry_after)
+                elif knows_reset:
+                    # The bucket is empty until the reset time; acquire() does the waiting
+                    retry_after = 0.0
+        attempt += 1
+        delay = retry_after if retry_after is not None else _backoff(attempt)
+        if attempt > retries or time.monotonic() + delay >= deadline or (cancel is not None and cancel.is_set()):
+            raise error
+        increment_counter('http_retries')
+        logging.info('Retrying %s in %.2f s (attempt %d/%d): %s', body['model'], delay, attempt, retries, error)
+        time.sleep(delay)
+
+def _message_content(data) -> Union[str, None]:
+    text = data.get("choices", [{}])[0].get("message", {}).get("content")
+    return text if text and isinstance(text, str) else None
+
+def _timed_api_key() -> Union[str, None]:
+    t0 = time.perf_counter()
+    try:
+        return cached_api_key()
+    finally:
+        record_metric('keyring', time.perf_counter() - t0)
+
+def model_chain() -> list:
+    """The configured model followed by ``fallback_models``, without duplicates."""
+    chain = [config.get('model', 'qwen/qwen3-coder:free')]
+    extra = config.get('fallback_models') or []
+    if isinstance(extra, str):
+        extra = extra.split(',')
+    for m in extra:
+        m = str(m).strip()
+        if m and m not in chain:
+            chain.append(m)
+    return chain
+
+def _hedge_delay() -> Union[float, None]:
+    try:
+        ms = float(config.get('hedge_delay_ms', DEFAULT_HEDGE_DELAY_MS))
+    except (TypeError, ValueError):
+        ms = DEFAULT_HEDGE_DELAY_MS
+    # 0 disables hedging; the next model is then only tried after a failure
+    return ms / 1000.0 if ms > 0 else None
+
+def record_model_result(model: str, ok: bool, seconds: float):
+    """Feed one call outcome into ``model``'s circuit breaker."""
+    try:
+        slow = float(config.get('breaker_slow_ms', DEFAULT_BREAKER_SLOW_MS)) / 1000.0
+    except (TypeError, ValueError):
+        slow = DEFAULT_BREAKER_SLOW_MS / 1000.0
+    with _model_lock:
+        results = _model_results.get(model)
+        if results is None:
+            results = _model_results[model] = deque(maxlen=BREAKER_WINDOW)
+        if ok and model in _model_open_until:
+            # A successful trial call closes the breaker again
+            del _model_open_until[model]
+            results.clear()
+        results.append((ok, seconds))
+        _route_checked[model] = time.monotonic()
+        if model in _model_open_until or len(results) < BREAKER_MIN_SAMPLES:
+            return
+        errors = sum(1 for r_ok, _ in results if not r_ok)
+        latencies = sorted(sec for r_ok, sec in results if r_ok)
+        too_slow = bool(latencies) and slow > 0 and latencies[len(latencies) // 2] > slow
+        if errors / len(results) < BREAKER_ERROR_RATE and not too_slow:
+            return
+        _model_open_until[model] = time.monotonic() + BREAKER_COOLDOWN
+    increment_counter('breaker_opened')
+    logging.warning('Circuit breaker open for %s (%d/%d errors, slow=%s)', model, errors, len(results), too_slow)
+
+def model_available(model: str) -> bool:
+    """False while ``model``'s breaker is open; after the cooldown one trial call is let through."""
+    with _model_lock:
+        until = _model_open_until.get(model)
+        if until is None:
+            return True
+        now = time.monotonic()
+        if now < until:
+            return False
+        # Half-open: allow this call, keep the others away for another cooldown
+        _model_open_until[model] = now + BREAKER_COOLDOWN
+        return True
+
+def record_route_ttfb(route_id: str, seconds: float):
+    """Add one response-header time to ``route_id``'s latency window."""
+    with _model_lock:
+        samples = _route_ttfb.get(route_id)
+        if samples is None:
+            samples = _route_ttfb[route_id] = deque(maxlen=ROUTE_TTFB_WINDOW)
+        samples.append(seconds)
+
+def _route_score(route_id: str, probe: float) -> tuple:
+    """Sort key for routing: lower is better.
+
+    Routes without a recent outcome come first, so a new or long-unused
+    endpoint gets measured again. Otherwise the median TTFB, inflated by the
+    recent error rate (an endpoint failing half the time costs twice as much).
+    """
+    with _model_lock:
+        checked = _route_checked.get(route_id)
+        samples = sorted(_route_ttfb.get(route_id, ()))
+        results = list(_model_results.get(route_id, ()))
+    if checked is None or time.monotonic() - checked > probe:
+        return (0, 0.0)
+    if not samples:
+        return (1, float('inf'))
+    errors = sum(1 for ok, _ in results if not ok) / len(results) if results else 0.0
+    return (1, _percentile(samples, 50) / max(0.05, 1.0 - errors))
+
+def _routing_mode() -> str:
+    mode = str(config.get('routing', ROUTING_MODES[0])).strip().lower()
+    return mode if mode in ROUTING_MODES else ROUTING_MODES[0]
+
+def _candidate_routes(api_key: Optional[str], healthy_only: bool = True) -> list:
+    """Routes to try in order: each provider's model, fastest healthy first, then ``fallback_models``.
+
+    OpenRouter (and with it the fallback models) is left out without
+    ``api_key``. With ``routing`` set to ``order`` the providers are tried in
+    configuration order instead. ``healthy_only=False`` keeps routes whose
+    circuit breaker is open.
+    """
+    primary, openrouter = [], None
+    for provider in get_providers():
+        if provider.name == DEFAULT_PROVIDER:
+            if not api_key:
+                continue
+            openrouter = provider
+        key = api_key if provider.name == DEFAULT_PROVIDER else provider.api_key
+        primary.append(Route(provider.route_id(provider.model), provider, provider.model, key))
+    if len(primary) > 1 and _routing_mode() == 'latency':
+        try:
+            probe = max(0.0, float(config.get('route_probe_s', DEFAULT_ROUTE_PROBE_S)))
+        except (TypeError, ValueError):
+            probe = DEFAULT_ROUTE_PROBE_S
+        primary.sort(key=lambda route: _route_score(route.id, probe))
+    chain = primary
+    if openrouter is not None:
+        seen = {route.id for route in chain}
+        chain += [Route(m, openrouter, m, api_key) for m in model_chain()[1:] if m not in seen]
+    if not healthy_only:
+        return chain
+    routes = [route for route in chain if model_available(route.id)]
+    # With every breaker open, still try the best route rather than fail outright
+    return routes or chain[:1]
+
+def model_health_snapshot() -> dict:
+    now = time.monotonic()
+    with _model_lock:
+        items = [
+            (m, list(r), _model_open_until.get(m), sorted(_route_ttfb.get(m, ()))) for m, r in _model_results.items()
+        ]
+    health = {}
+    for model, results, until, ttfb in items:
+        latencies = sorted(sec for ok, sec in results if ok)
+        health[model] = {
+            'state': 'closed' if until is None else ('open' if now < until else 'half-open'),
+            'window': len(results),
+            'error_rate': round(sum(1 for ok, _ in results if not ok) / len(results), 3) if results else 0.0,
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+            'ttfb_p50_ms': round(_percentile(ttfb, 50) * 1000, 2),
+        }
+    return health
+
+def reset_model_health():
+    with _model_lock:
+        _model_results.clear()
+        _model_open_until.clear()
+        _route_ttfb.clear()
+        _route_checked.clear()
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _model_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix='hedge')
+        return _hedge_pool
+
+def _get_chunk_pool() -> ThreadPoolExecutor:
+    global _chunk_pool
+    with _model_lock:
+        if _chunk_pool is None:
+            _chunk_pool = ThreadPoolExecutor(max_workers=CHUNK_POOL_SIZE, thread_name_prefix='chunk')
+        return _chunk_pool
+
+def _chunk_call(fn, item):
+    _trace_local.in_chunk_pool = True
+    return fn(item)
+
+def _map_ordered(fn, items: list, concurrency: int) -> Iterator:
+    """Yield ``fn(item)`` for each item in order, at most ``concurrency`` at a time on the chunk pool.
+
+    A free slot goes to the next item as soon as any call finishes, not only
+    the one that is yielded next. Closing the iterator cancels the calls that
+    have not started. Called from a chunk pool thread (a long inline reply
+    that is chunked in turn), the items run one by one on that thread, so
+    nested calls never wait for pool threads held by their own callers.
+    """
+    if getattr(_trace_local, 'in_chunk_pool', False):
+        for item in items:
+            yield fn(item)
+        return
+    pool = _get_chunk_pool()
+    running, finished = {}, {}
+    launched = 0
+    try:
+        for i in range(len(items)):
+            while i not in finished:
+                while launched < len(items) and len(running) < concurrency:
+                    running[pool.submit(_chunk_call, fn, items[launched])] = launched
+                    launched += 1
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    finished[running.pop(fut)] = fut
+            yield finished.pop(i).result()
+    finally:
+        for fut in running:
+            fut.cancel()
+
+def _chain_retries(routes: list, index: int) -> Union[int, None]:
+    # Rather than retrying a throttled route, move on to the next one; only the
+    # last route in the chain retries (``None`` = the configured max_retries)
+    return None if index == len(routes) - 1 else 0
+
+def _note_served(model: str, attempt: int, seconds: float):
+    _trace_local.served_by = model
+    increment_counter(f'served_by:{model}')
+    if attempt:
+        increment_counter('served_by_fallback')
+    record_metric('http_total', seconds)
+    if profile_enabled:
+        logging.info('[trace] task=%s served_by=%s attempt=%d', getattr(_trace_local, 'task_id', '-'), model, attempt + 1)
+
+def _completion_attempt(
+    route: Route, system_prompt: str, user_prompt: str, cancel: threading.Event,
+    deadline: float, retries: Optional[int], task_id=None,
+) -> Union[str, None]:
+    import requests
+    if cancel.is_set():
+        return None
+    _trace_local.task_id = task_id
+    t0 = time.perf_counter()
+    parts = []
+    try:
+        # Streamed so that a lost race or a cancelled task drops the connection
+        # (and the model's generation) instead of waiting for the whole answer
+        gen = _stream_model(route, system_prompt, user_prompt, deadline, retries, cancel)
+        try:
+            for delta in gen:
+                if cancel.is_set():
+                    return None
+                parts.append(delta)
+        finally:
+            gen.close()
+        text = ''.join(parts)
+    except (requests.exceptions.RequestException, ValueError, IndexError, KeyError, AttributeError) as e:
+        if cancel.is_set():
+            return None
+        increment_counter('http_errors')
+        record_model_result(route.id, False, time.perf_counter() - t0)
+        logging.info('Model %s failed: %s', route.id, e)
+        return None
+    elapsed = time.perf_counter() - t0
+    # An empty ``choices`` list or blank content counts against the model too
+    record_model_result(route.id, bool(text), elapsed)
+    if not text:
+        increment_counter('empty_responses')
+        return None
+    record_metric(f'model:{route.id}', elapsed)
+    return text
+
+def _chat_completion(system_prompt: str, user_prompt: str) -> Union[str, None]:
+    """Ask the route chain (see ``_candidate_routes``) for an answer; the first valid one wins.
+
+    The first available route is asked right away. If it fails, the next one
+    is asked at once; if it is merely slow, the next one is asked in parallel
+    after ``hedge_delay_ms``. Once a winner is found, attempts that have not
+    started are cancelled and the others close their connection at the next
+    streamed delta (only the wait for the response headers cannot be
+    interrupted). The same happens, with ``OperationCancelled`` raised, when
+    the task the calling thread works for is cancelled.
+    """
+    routes = _candidate_routes(_timed_api_key())
+    if not routes:
+        return None
+    # Without hedging (None) the next route only starts after a failure
+    hedge = _hedge_delay() or float('inf')
+    cancel = threading.Event()
+    outer = getattr(_trace_local, 'cancel', None)
+    pool = _get_hedge_pool()
+    task_id = getattr(_trace_local, 'task_id', None)
+    deadline = request_deadline()
+    pending = {}
+    launched = 0
+    t0 = time.perf_counter()
+
+    def launch():
+        nonlocal launched
+        route = routes[launched]
+        fut = pool.submit(
+            _completion_attempt, route, system_prompt, user_prompt, cancel,
+            deadline, _chain_retries(routes, launched), task_id,
+        )
+        pending[fut] = (launched, route.id)
+        launched += 1
+
+    launch()
+    hedge_at = time.monotonic() + hedge
+    try:
+        while pending:
+            _raise_if_cancelled(outer)
+            wake = min(deadline, hedge_at) if launched < len(routes) else deadline
+            timeout = max(0.0, wake - time.monotonic())
+            if outer is not None:
+                timeout = min(timeout, CANCEL_POLL_INTERVAL)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                now = time.monotonic()
+                if now >= deadline:
+                    logging.warning('Request deadline exceeded')
+                    increment_counter('deadline_exceeded')
+                    return None
+                if launched < len(routes) and now >= hedge_at:
+                    increment_counter('hedged_requests')
+                    logging.info('Hedging: %s is slow, also asking %s', pending[next(iter(pending))][1], routes[launched].id)
+                    launch()
+                    hedge_at = now + hedge
+                continue
+            for fut in done:
+                attempt, model = pending.pop(fut)
+                text = fut.result()
+                if text:
+                    _note_served(model, attempt, time.perf_counter() - t0)
+                    return text
+                if launched < len(routes):
+                    increment_counter('model_fallbacks')
+                    launch()
+                    hedge_at = time.monotonic() + hedge
+        return None
+    finally:
+        cancel.set()
+        for fut in pending:
+            fut.cancel()
+
+def _config_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(config.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+def split_into_chunks(text: str, budget: int) -> list:
+    """Split ``text`` on paragraph boundaries into ``(lead, body, sep)`` pieces of at most ~``budget`` chars.
+
+    ``lead`` + ``body`` + ``sep`` over all pieces reproduces ``text`` exactly,
+    so translated bodies can be put back between the original line breaks.
+    Paragraphs longer than the budget are split at sentence ends, and as a
+    last resort at the budget itself.
+    """
+    body_start = len(text) - len(text.lstrip())
+    lead, text = text[:body_start], text[body_start:]
+    segments = []
+    parts = PARAGRAPH_SEP_RE.split(text)
+    for para, sep in zip(parts[0::2], parts[1::2] + ['']):
+        if len(para) <= budget:
+            segments.append((para, sep))
+            continue
+        sparts = SENTENCE_SEP_RE.split(para)
+        sentences = list(zip(sparts[0::2], sparts[1::2] + [sep]))
+        for sentence, ssep in sentences:
+            while len(sentence) > budget:
+                segments.append((sentence[:budget], ''))
+                sentence = sentence[budget:]
+            segments.append((sentence, ssep))
+
+    chunks = []
+    current, size = [], 0
+    for seg in segments:
+        if current and size + len(seg[0]) > budget:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(seg)
+        size += len(seg[0]) + len(seg[1])
+    if current:
+        chunks.append(current)
+    result = []
+    for i, segs in enumerate(chunks):
+        body = ''.join(b + s for b, s in segs[:-1]) + segs[-1][0]
+        result.append((lead if i == 0 else '', body, segs[-1][1]))
+    return result
+
+def _should_chunk(selected_data: str) -> bool:
+    threshold = _config_int('chunk_threshold_chars', DEFAULT_CHUNK_THRESHOLD, 0)
+    return bool(threshold) and len(selected_data) > threshold
+
+def _iter_chunked(operation: str, system_prompt: str, make_user_prompt, selected_data: str) -> Iterator[str]:
+    """Send paragraph chunks concurrently and yield their results in document order.
+
+    A failed chunk is retried on its own (``chunk_retries`` times) while later
+    chunks keep running; if it still fails, ``ValueError`` is raised.
+    """
+    chunks = split_into_chunks(selected_data, _config_int('chunk_size_chars', DEFAULT_CHUNK_SIZE, 200))
+    retries = _config_int('chunk_retries', 1, 0)
+    logging.info('Chunked %s: %d chars in %d chunks', operation, len(selected_data), len(chunks))
+    task = tuple(getattr(_trace_local, name, None) for name in ('task_id', 'cancel', 'deadline'))
+
+    def run(body: str) -> Union[str, None]:
+        # Chunk threads work for the caller's task: same trace id, cancel event and deadline
+        _trace_local.task_id, _trace_local.cancel, _trace_local.deadline = task
+        return _cached_completion(operation, system_prompt, body, make_user_prompt(body))
+
+    results = _map_ordered(
+        run, [body for _, body, _ in chunks], _config_int('chunk_concurrency', DEFAULT_CHUNK_CONCURRENCY, 1)
+    )
+    try:
+        for i, ((lead, body, sep), out) in enumerate(zip(chunks, results)):
+            attempt = 0
+            while not (out and out.strip()) and attempt < retries:
+                attempt += 1
+                logging.info('Retrying chunk %d/%d (attempt %d)', i + 1, len(chunks), attempt)
+                out = run(body)
+            if not (out and out.strip()):
+                raise ValueError(f'chunk {i + 1}/{len(chunks)} failed')
+            yield lead + out.strip() + sep
+    finally:
+        results.close()
+
+def _complete(operation: str, system_prompt: str, make_user_prompt, selected_data: str) -> Union[str, None]:
+    if _should_chunk(selected_data):
+        try:
+            return ''.join(_iter_chunked(operation, system_prompt, make_user_prompt, selected_data))
+        except ValueError as e:
+            logging.warning('Chunked %s failed: %s', operation, e)
+            return None
+    return _cached_completion(operation, system_prompt, selected_data, make_user_prompt(selected_data))
+
+def _stream(operation: str, system_prompt: str, make_user_prompt, selected_data: str) -> Iterator[str]:
+    if _should_chunk(selected_data):
+        # Each chunk is pasted as soon as it and everything before it are done
+        return _iter_chunked(operation, system_prompt, make_user_prompt, selected_data)
+    return _cached_stream(operation, system_prompt, selected_data, make_user_prompt(selected_data))
+
+def rewrite_text(selected_data: str) -> Union[str, None]:
+    return _complete('rewrite', SYSTEM_PROMPT, _rewrite_user_prompt, selected_data)
+
+def translate_text_tr_en(selected_data: str) -> Union[str, None]:
+    if not _tm_enabled():
+        return _complete('translate', TRANSLATE_PROMPT, _translate_user_prompt, selected_data)
+    try:
+        return ''.join(_iter_translation_memory(selected_data, stream=False)) or None
+    except ValueError as e:
+        logging.warning('Translation failed: %s', e)
+        return None
+
+def _iter_sse_data(response: requests.Response, cancel: Optional[threading.Event] = None) -> Iterator[str]:
+    # chunk_size=None yields each chunk as the server flushes it
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buf = ''
+    for chunk in response.iter_content(chunk_size=None):
+        # Checked on keep-alive comments too, so a queued request is dropped as well
+        if cancel is not None and cancel.is_set():
+            return
+        buf += decoder.decode(chunk)
+        while '\n' in buf:
+            line, buf = buf.split('\n', 1)
+            line = line.rstrip('\r')
+            # Comments (": OPENROUTER PROCESSING"), event names and blank separators are ignored
+            if line.startswith('data:'):
+                yield line[5:].lstrip()
+
+def _stream_model(
+    route: Route, system_prompt: str, user_prompt: str,
+    deadline: Optional[float] = None, retries: Optional[int] = None, cancel: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """Yield ``route``'s content deltas as its model produces them.
+
+    If the server ignores ``stream`` and answers with plain JSON, the whole
+    message is yielded at once, so callers need no separate buffered path.
+    Raises ``requests.exceptions.RequestException`` or ``ValueError`` on errors.
+    """
+    t0 = time.perf_counter()
+    response = _post_chat(
+        route.api_key, system_prompt, user_prompt, stream=True, model=route.model, deadline=deadline,
+        retries=retries, cancel=cancel, provider=route.provider,
+    )
+    first = True
+    with response:
+        if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+            try:
+                text = _message_content(response.json())
+            except (IndexError, KeyError, AttributeError):
+                text = None
+            if text:
+                yield text
+            return
+        done = False
+        for data in _iter_sse_data(response, cancel):
+            if done or data == '[DONE]':
+                # Read the body to its end, so the connection goes back to the pool
+                # (leaving early, only on cancel, drops it)
+                done = True
+                continue
+            event = json.loads(data)
+            if event.get('error'):
+                raise ValueError(str(event['error']))
+            try:
+                delta = event["choices"][0].get("delta", {}).get("content")
+            except (IndexError, KeyError, AttributeError):
+                delta = None
+            if delta and isinstance(delta, str):
+                if first:
+                    record_metric('stream_first_delta', time.perf_counter() - t0)
+                    first = False
+                yield delta
+
+def _stream_attempt(
+    route: Route, index: int, system_prompt: str, user_prompt: str,
+    events: queue.Queue, cancel: threading.Event, deadline: float, retries: Optional[int], task_id=None,
+):
+    # Runs on the hedge pool; forwards deltas as (index, kind, value) events
+    _trace_local.task_id = task_id
+    t0 = time.perf_counter()
+    got_any = False
+    try:
+        gen = _stream_model(route, system_prompt, user_prompt, deadline, retries, cancel)
+        try:
+            for delta in gen:
+                if cancel.is_set():
+                    # Lost the race (or the caller gave up): drop the connection
+                    return
+                got_any = True
+                events.put((index, 'delta', delta))
+        finally:
+            gen.close()
+    except Exception as e:
+        if not cancel.is_set():
+            increment_counter('http_errors')
+            record_model_result(route.id, False, time.perf_counter() - t0)
+            logging.info('Model %s failed (stream): %s', route.id, e)
+        events.put((index, 'error', e))
+        return
+    if not cancel.is_set():
+        record_model_result(route.id, got_any, time.perf_counter() - t0)
+        if got_any:
+            record_metric(f'model:{route.id}', time.perf_counter() - t0)
+        else:
+            increment_counter('empty_responses')
+    events.put((index, 'end', None))
+
+def stream_chat_completion(system_prompt: str, user_prompt: str) -> Iterator[str]:
+    """Yield content deltas from the first route in the chain that starts answering.
+
+    Hedging works as in ``_chat_completion``, except that the race is decided
+    by the first delta: from then on only the winner's stream is passed
+    through and the other streams are closed. Errors from the winner after
+    its first delta propagate (``requests.exceptions.RequestException`` or
+    ``ValueError``); if every model fails before answering, the last error is
+    raised, and an empty answer from all of them yields nothing. If the
+    caller's task is cancelled, every stream is dropped and
+    ``OperationCancelled`` is raised.
+    """
+    routes = _candidate_routes(_timed_api_key())
+    if not routes:
+        return
+    # Without hedging (None) the next route only starts after a failure
+    hedge = _hedge_delay() or float('inf')
+    outer = getattr(_trace_local, 'cancel', None)
+    pool = _get_hedge_pool()
+    task_id = getattr(_trace_local, 'task_id', None)
+    deadline = request_deadline()
+    events = queue.Queue()
+    cancels = []
+    running = 0
+    winner = None
+    last_error = None
+    t0 = time.perf_counter()
+
+    def launch():
+        nonlocal running
+        cancel = threading.Event()
+        index = len(cancels)
+        cancels.append(cancel)
+        pool.submit(
+            _stream_attempt, routes[index], index, system_prompt, user_prompt, events, cancel,
+            deadline, _chain_retries(routes, index), task_id,
+        )
+        running += 1
+
+    launch()
+    hedge_at = time.monotonic() + hedge
+    try:
+        while True:
+            _raise_if_cancelled(outer)
+            timeout = None
+            if winner is None:
+                wake = min(deadline, hedge_at) if len(cancels) < len(routes) else deadline
+                timeout = max(0.0, wake - time.monotonic())
+            if outer is not None:
+                timeout = CANCEL_POLL_INTERVAL if timeout is None else min(timeout, CANCEL_POLL_INTERVAL)
+            try:
+                index, kind, value = events.get(timeout=timeout)
+            except queue.Empty:
+                now = time.monotonic()
+                if winner is not None:
+                    continue
+                if now >= deadline:
+                    import requests
+                    increment_counter('deadline_exceeded')
+                    raise requests.exceptions.Timeout('request deadline exceeded')
+                if len(cancels) < len(routes) and now >= hedge_at:
+                    increment_counter('hedged_requests')
+                    logging.info('Hedging stream: also asking %s', routes[len(cancels)].id)
+                    launch()
+                    hedge_at = now + hedge
+                continue
+            if winner is not None and index != winner:
+                continue
+            if kind == 'delta':
+                if winner is None:
+                    winner = index
+                    for i, cancel in enumerate(cancels):
+                        if i != index:
+                            cancel.set()
+                    _trace_local.served_by = routes[index].id
+                    increment_counter(f'served_by:{routes[index].id}')
+                    if index:
+                        increment_counter('served_by_fallback')
+                yield value
+                continue
+            if winner is not None:
+                if kind == 'error':
+                    raise value
+                break
+            running -= 1
+            if kind == 'error':
+                last_error = value
+            if len(cancels) < len(routes):
+                increment_counter('model_fallbacks')
+                launch()
+                hedge_at = time.monotonic() + hedge
+            elif not running:
+                if last_error is not None:
+                    raise last_error
+                return
+    finally:
+        for cancel in cancels:
+            cancel.set()
+    record_metric('http_total', time.perf_counter() - t0)
+
+def stream_rewrite_text(selected_data: str) -> Iterator[str]:
+    return _stream('rewrite', SYSTEM_PROMPT, _rewrite_user_prompt, selected_data)
+
+def stream_translate_text_tr_en(selected_data: str) -> Iterator[str]:
+    if _tm_enabled():
+        return _iter_translation_memory(selected_data, stream=True)
+    return _stream('translate', TRANSLATE_PROMPT, _translate_user_prompt, selected_data)
+
+def _tm_enabled() -> bool:
+    # Off by default: the memory keeps users' text on disk
+    return bool(config.get('tm_enabled', False))
+
+def split_sentences(text: str) -> tuple:
+    """Split ``text`` into ``(lead, [(sentence, sep), ...])`` at sentence ends and line breaks.
+
+    ``lead`` followed by every sentence and its separator reproduces ``text``.
+    """
+    body_start = len(text) - len(text.lstrip())
+    lead, text = text[:body_start], text[body_start:]
+    parts = TM_SPLIT_RE.split(text)
+    return lead, list(zip(parts[0::2], parts[1::2] + ['']))
+
+def _tm_translatable(sentence: str) -> bool:
+    # Numbers, dates, rules and blank pieces are copied as they are
+    return any(ch.isalpha() for ch in sentence)
+
+def _tm_key(sentence: str) -> str:
+    text = ' '.join(unicodedata.normalize('NFC', sentence).split())
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _tm_shingles(sentence: str) -> set:
+    text = ' '.join(unicodedata.normalize('NFC', sentence).casefold().split())
+    if len(text) <= TM_SHINGLE:
+        return {text}
+    return {text[i:i + TM_SHINGLE] for i in range(len(text) - TM_SHINGLE + 1)}
+
+def _tm_buckets(shingles: set) -> list:
+    """LSH buckets of the shingles' MinHash signature, one per band.
+
+    Two sentences whose shingle sets have Jaccard similarity 0.9 share at
+    least one bucket with near certainty; at 0.5 only about half the time.
+    """
+    global _tm_permutations
+    if _tm_permutations is None:
+        rng = random.Random(TM_PRIME)
+        _tm_permutations = [(rng.randrange(1, TM_PRIME), rng.randrange(TM_PRIME)) for _ in range(TM_PERMUTATIONS)]
+    # blake2b rather than hash(): buckets are stored and must not change between runs
+    hashes = [int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest(), 'little') for sh in shingles]
+    signature = [min((a * h + b) % TM_PRIME for h in hashes) for a, b in _tm_permutations]
+    rows = TM_PERMUTATIONS // TM_BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(repr((band, signature[band * rows:(band + 1) * rows])).encode(), digest_size=7).digest(), 'little')
+        for band in range(TM_BANDS)
+    ]
+
+def _tm_connection():
+    global _tm_db
+    if _tm_db is None:
+        import sqlite3
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        db = sqlite3.connect(TM_PATH, check_same_thread=False)
+        # Must precede table creation; evicted pairs then give their pages back to the disk
+        db.execute('PRAGMA auto_vacuum = FULL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        db.execute('CREATE TABLE IF NOT EXISTS pairs (id INTEGER PRIMARY KEY, key TEXT UNIQUE, source TEXT, target TEXT, used REAL)')
+        # One B-tree keyed for lookups; deleting a pair's buckets scans it, which only eviction does often
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, pair INTEGER, PRIMARY KEY (bucket, pair)) WITHOUT ROWID'
+        )
+        _tm_db = db
+    return _tm_db
+
+def _tm_fuzzy_threshold() -> float:
+    try:
+        return min(1.0, max(0.5, float(config.get('tm_fuzzy_threshold', DEFAULT_TM_FUZZY))))
+    except (TypeError, ValueError):
+        return DEFAULT_TM_FUZZY
+
+def _tm_find(db, sentence: str, threshold: float) -> tuple:
+    # Caller holds _tm_db_lock; returns (pair id, source, target, 'exact' | 'fuzzy') or (None,) * 4
+    row = db.execute('SELECT id, source, target FROM pairs WHERE key = ?', (_tm_key(sentence),)).fetchone()
+    if row:
+        return row[0], row[1], row[2], 'exact'
+    if threshold >= 1.0:
+        return None, None, None, None
+    shingles = _tm_shingles(sentence)
+    buckets = _tm_buckets(shingles)
+    candidates = db.execute(
+        f'SELECT id, source, target FROM pairs WHERE id IN '
+        f'(SELECT pair FROM buckets WHERE bucket IN ({",".join("?" * len(buckets))}))',
+        buckets,
+    ).fetchall()
+    digits = TM_DIGITS_RE.findall(sentence)
+    best, best_score = (None, None, None, None), threshold
+    for pair_id, source, target in candidates:
+        # A near miss that differs in a number (amount, date, invoice no.) is no help
+        if TM_DIGITS_RE.findall(source) != digits:
+            continue
+        other = _tm_shingles(source)
+        score = len(shingles & other) / len(shingles | other)
+        if score >= best_score:
+            best, best_score = (pair_id, source, target, 'fuzzy'), score
+    return best
+
+def translation_memory_lookup(sentences: list) -> list:
+    """Stored translations for ``sentences``: one ``(target, kind, source)`` or None per sentence.
+
+    ``kind`` is 'exact' or 'fuzzy'. Only exact matches may be used as they
+    are: a fuzzy match (shingle similarity of at least ``tm_fuzzy_threshold``,
+    0.9; 1 turns them off; same numbers) can be a different sentence, e.g.
+    a negation or another name, and is only shown to the model as a hint.
+    """
+    import sqlite3
+    if not os.path.exists(TM_PATH):
+        return [None] * len(sentences)
+    threshold = _tm_fuzzy_threshold()
+    found, used = [], []
+    try:
+        with _tm_db_lock:
+            db = _tm_connection()
+            for sentence in sentences:
+                pair_id, source, target, kind = _tm_find(db, sentence, threshold)
+                found.append((target, kind, source) if pair_id is not None else None)
+                if pair_id is not None:
+                    used.append((time.time(), pair_id))
+            if used:
+                with db:
+                    db.executemany('UPDATE pairs SET used = ? WHERE id = ?', used)
+    except (sqlite3.Error, OSError) as e:
+        logging.warning('Translation memory lookup failed: %s', e)
+        return [None] * len(sentences)
+    return found
+
+def _tm_evict(db, budget: int):
+    # Caller holds _tm_db_lock; drops the least recently used tenth until the file fits
+    while True:
+        pages, page_size = db.execute('PRAGMA page_count').fetchone()[0], db.execute('PRAGMA page_size').fetchone()[0]
+        count = db.execute('SELECT count(*) FROM pairs').fetchone()[0]
+        if pages * page_size <= budget or not count:
+            return
+        with db:
+            ids = [(r[0],) for r in db.execute('SELECT id FROM pairs ORDER BY used LIMIT ?', (max(1, count // 10),))]
+            db.executemany('DELETE FROM buckets WHERE pair = ?', ids)
+            db.executemany('DELETE FROM pairs WHERE id = ?', ids)
+        increment_counter('tm_evicted', len(ids))
+
+def _tm_ratio_ok(source: str, target: str) -> bool:
+    ratio = (len(target) + 1) / (len(source) + 1) / TM_LENGTH_RATIO
+    return 1 / TM_MAX_RATIO <= ratio <= TM_MAX_RATIO
+
+def align_sentences(sources: list, targets: list) -> list:
+    """One-to-one ``(source, target)`` sentence pairs of a translation, matched by length.
+
+    A dynamic program over both sentence lists (Gale-Church style) allows a
+    sentence to be split in two or two to be merged; those pieces, and 1-1
+    pairs whose lengths do not fit, are left out rather than stored wrong.
+    """
+    import math
+    n, m = len(sources), len(targets)
+    inf = float('inf')
+    cost = [[inf] * (m + 1) for _ in range(n + 1)]
+    move = [[None] * (m + 1) for _ in range(n + 1)]
+    cost[0][0] = 0.0
+
+    def distance(s: str, t: str) -> float:
+        return abs(math.log((len(t) + 1) / (len(s) + 1) / TM_LENGTH_RATIO))
+
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if cost[i][j] == inf:
+                continue
+            for di, dj in ((1, 1), (1, 2), (2, 1)):
+                if i + di > n or j + dj > m:
+                    continue
+                c = cost[i][j] + distance(' '.join(sources[i:i + di]), ' '.join(targets[j:j + dj]))
+                if (di, dj) != (1, 1):
+                    c += TM_MERGE_PENALTY
+                if c < cost[i + di][j + dj]:
+                    cost[i + di][j + dj] = c
+                    move[i + di][j + dj] = (di, dj)
+    if cost[n][m] == inf:
+        return []
+    pairs, i, j = [], n, m
+    while i or j:
+        di, dj = move[i][j]
+        i, j = i - di, j - dj
+        if (di, dj) == (1, 1) and _tm_ratio_ok(sources[i], targets[j]):
+            pairs.append((sources[i], targets[j]))
+    pairs.reverse()
+    return pairs
+
+def learn_translation(source: str, target: str) -> int:
+    """Store the sentence pairs of a finished translation; returns how many were stored.
+
+    Sentences are paired by ``align_sentences``; a single source sentence is
+    paired with the whole translation when the lengths fit.
+    """
+    import sqlite3
+    sources = [s.strip() for s, _ in split_sentences(source)[1] if _tm_translatable(s)]
+    targets = [s.strip() for s, _ in split_sentences(target)[1] if _tm_translatable(s)]
+    if len(sources) == 1 and targets:
+        aligned = [(sources[0], target.strip())] if _tm_ratio_ok(sources[0], target.strip()) else []
+    else:
+        aligned = align_sentences(sources, targets)
+    if len(aligned) < len(sources):
+        increment_counter('tm_unaligned', len(sources) - len(aligned))
+    pairs = [(s, t) for s, t in aligned if len(s) <= TM_MAX_SENTENCE and len(t) <= TM_MAX_SENTENCE]
+    budget = _config_int('tm_max_kb', DEFAULT_TM_MAX_KB, 0) * 1024
+    if not pairs or not budget:
+        return 0
+    try:
+        with _tm_db_lock:
+            db = _tm_connection()
+            with db:
+                for s, t in pairs:
+                    key = _tm_key(s)
+                    db.execute(
+                        'INSERT INTO pairs (key, source, target, used) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(key) DO UPDATE SET target = excluded.target, used = excluded.used',
+                        (key, s, t, time.time()),
+                    )
+                    pair_id = db.execute('SELECT id FROM pairs WHERE key = ?', (key,)).fetchone()[0]
+                    # A known sentence already has these buckets
+                    db.executemany(
+                        'INSERT OR IGNORE INTO buckets VALUES (?, ?)', [(b, pair_id) for b in _tm_buckets(_tm_shingles(s))]
+                    )
+            _tm_evict(db, budget)
+    except (sqlite3.Error, OSError) as e:
+        logging.warning('Translation memory store failed: %s', e)
+        return 0
+    increment_counter('tm_learned', len(pairs))
+    return len(pairs)
+
+def clear_translation_memory():
+    if not os.path.exists(TM_PATH):
+        return
+    import sqlite3
+    try:
+        with _tm_db_lock:
+            db = _tm_connection()
+            with db:
+                db.execute('DELETE FROM buckets')
+                db.execute('DELETE FROM pairs')
+    except (sqlite3.Error, OSError) as e:
+        logging.warning('Translation memory clear failed: %s', e)
+
+def _tm_saved_estimate(local_chars: int, total_chars: int) -> float:
+    # The model time these sentences would have cost: the recent median call,
+    # scaled by their share of the text
+    with _metrics_lock:
+        ordered = sorted(_metrics.get('http_total', ()))
+    return _percentile(ordered, 50) * local_chars / max(1, total_chars)
+
+def _tm_user_prompt(body: str, hints: list, segments: int = 0) -> str:
+    lines = ['Translate the following Turkish text into fluent, natural English. Keep tone and meaning.']
+    if segments:
+        lines.append(
+            f'The text is {segments} segments of one document, each under a [[n]] marker line. '
+            'Keep every marker line exactly as it is and put the translation of each segment under its marker.'
+        )
+    if hints:
+        lines.append(
+            'Similar sentences translated earlier, for consistent wording only. They may differ in meaning '
+            '(a negation, a name, a tense), so never copy one that does not match:'
+        )
+        lines.extend(f'- {source} => {target}' for source, target in hints)
+    return '\n'.join(lines) + f'\n\nTEXT:\n{body}'
+
+def _tm_split_segments(answer: str, count: int) -> Optional[list]:
+    parts = TM_MARKER_RE.split(answer)
+    numbers, bodies = parts[1::2], [p.strip() for p in parts[2::2]]
+    if numbers != [str(n) for n in range(1, count + 1)] or not all(bodies):
+        return None
+    return bodies
+
+def _iter_translation_memory(selected_data: str, stream: bool) -> Iterator[str]:
+    """Translate ``selected_data`` using the translation memory and yield the result in document order.
+
+    Only exact matches are taken from the memory. Everything else goes to the
+    model in one request: the runs of unknown sentences as marked segments,
+    with fuzzy matches attached as hints, and each run is learned from
+    afterwards. If the answer does not keep the segment markers the whole
+    text is translated instead. Without any exact hit the whole text is
+    translated as before and then learned from. A failure raises
+    ``ValueError``.
+    """
+    t0 = time.perf_counter()
+    lead, units = split_sentences(selected_data)
+    translatable = [i for i, (sentence, _) in enumerate(units) if _tm_translatable(sentence)]
+    found = translation_memory_lookup([units[i][0].strip() for i in translatable])
+    record_metric('tm_lookup', time.perf_counter() - t0)
+    matches = {i: match for i, match in zip(translatable, found) if match is not None}
+    hits = {i: match[0] for i, match in matches.items() if match[1] == 'exact'}
+    hints = [(match[2], match[0]) for i, match in sorted(matches.items()) if match[1] == 'fuzzy']
+    increment_counter('tm_sentences', len(translatable))
+    increment_counter('tm_hits_exact', len(hits))
+    increment_counter('tm_hits_fuzzy', len(hints))
+
+    def prompt(segments: int = 0):
+        return lambda body: _tm_user_prompt(body, hints, segments)
+
+    if not hits:
+        parts = []
+        if stream:
+            source = _stream('translate', TRANSLATE_PROMPT, prompt(), selected_data)
+        else:
+            text = _complete('translate', TRANSLATE_PROMPT, prompt(), selected_data)
+            if not text:
+                raise ValueError('translation failed')
+            source = [text]
+        for part in source:
+            parts.append(part)
+            yield part
+        if translatable:
+            learn_translation(selected_data, ''.join(parts))
+        return
+
+    # Runs of unknown sentences: [start, end) unit ranges
+    runs, start = [], None
+    for i, (sentence, _) in enumerate(units):
+        missing = _tm_translatable(sentence) and i not in hits
+        if missing and start is None:
+            start = i
+        elif not missing and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(units)))
+    local_chars = sum(len(units[i][0]) for i in hits)
+    saved = _tm_saved_estimate(local_chars, len(selected_data))
+    increment_counter('tm_saved_ms', round(saved * 1000))
+    if not runs:
+        increment_counter('tm_requests_saved')
+        _trace_local.served_by = 'tm'
+    bodies = [''.join(s + sep for s, sep in units[begin:end - 1]) + units[end - 1][0] for begin, end in runs]
+    outputs = {}
+
+    def translate_runs():
+        # One request for all runs, so each is translated with the others as context
+        if len(bodies) == 1:
+            out = _complete('translate', TRANSLATE_PROMPT, prompt(), bodies[0])
+            translated = [out.strip()] if out and out.strip() else None
+        else:
+            marked = '\n\n'.join(f'[[{n}]]\n{body}' for n, body in enumerate(bodies, 1))
+            out = _complete('translate', TRANSLATE_PROMPT, prompt(len(bodies)), marked)
+            if not out:
+                raise ValueError('translation failed')
+            translated = _tm_split_segments(out, len(bodies))
+            if translated is None:
+                increment_counter('tm_segments_lost')
+                return None
+        if translated is None:
+            raise ValueError('translation failed')
+        for (begin, _), body, text in zip(runs, bodies, translated):
+            learn_translation(body, text)
+            outputs[begin] = text
+        return outputs
+
+    # Exact hits before the first unknown sentence go out before the request
+    if lead:
+        yield lead
+    i = 0
+    while i < len(units):
+        sentence, sep = units[i]
+        run = next((r for r in runs if r[0] == i), None)
+        if run is not None:
+            if not outputs and translate_runs() is None:
+                # The markers were lost: translate the rest of the text as a whole
+                rest = ''.join(s + p for s, p in units[i:])
+                text = _complete('translate', TRANSLATE_PROMPT, prompt(), rest)
+                if not text:
+                    raise ValueError('translation failed')
+                yield text
+                return
+            yield outputs[i] + units[run[1] - 1][1]
+            i = run[1]
+            continue
+        yield hits.get(i, sentence) + sep
+        i += 1
+
+def strip_technical_tokens(text: str) -> str:
+    return TECH_TOKEN_RE.sub('', text)
+
+def _partial_token_start(text: str) -> int:
+    # Index where a '<|...|>' token may have started but not yet closed, else -1
+    lt = text.rfind('<', max(0, len(text) - STREAM_TOKEN_HOLD_CHARS))
+    if lt == -1:
+        return -1
+    tail = text[lt:]
+    if tail == '<' or (tail.startswith('<|') and '|>' not in tail):
+        return lt
+    return -1
+
+def iter_stream_flushes(deltas: Iterable[str]) -> Iterator[str]:
+    """Regroup streamed deltas into sentence-sized pieces ready to paste.
+
+    Technical tokens are stripped even when split across deltas. Trailing
+    whitespace is held back so the final piece ends with the same
+    '\\r\\n\\r\\n' the buffered path appends.
+    """
+    pending = ''
+    produced = False
+    for delta in deltas:
+        pending = strip_technical_tokens(pending + delta)
+        hold = _partial_token_start(pending)
+        ready = pending if hold == -1 else pending[:hold]
+        end = 0
+        for m in SENTENCE_END_RE.finditer(ready):
+            end = m.end()
+        if not end:
+            continue
+        piece = ready[:end].rstrip()
+        if piece:
+            produced = True
+            yield piece
+        pending = pending[len(piece):]
+    tail = strip_technical_tokens(pending).rstrip()
+    if tail or produced:
+        yield tail + '\r\n\r\n'
+
+def _create_clipboard() -> ClipboardBackend:
+    choice = str(config.get('clipboard_backend', CLIPBOARD_BACKENDS[0])).strip().lower()
+    if choice != 'pyperclip':
+        try:
+            if os.name == 'nt':
+                return Win32Clipboard()
+            # Wayland sessions without XWayland have no DISPLAY; pyperclip uses wl-copy there
+            if os.getenv('DISPLAY'):
+                return X11Clipboard()
+        except Exception as e:
+            logging.warning('Native clipboard unavailable, using pyperclip: %s', e)
+    return PyperclipClipboard()
+
+def get_clipboard() -> ClipboardBackend:
+    """The clipboard backend, created on first use from ``clipboard_backend``."""
+    global _clipboard
+    backend = _clipboard
+    if backend is not None:
+        return backend
+    with _clipboard_lock:
+        if _clipboard is None:
+            _clipboard = _create_clipboard()
+            logging.info('Clipboard backend: %s', _clipboard.name)
+        return _clipboard
+
+def set_clipboard_backend(backend: Optional[ClipboardBackend]):
+    """Use ``backend`` for all clipboard access (e.g. a ``MemoryClipboard`` in tests); None picks one again."""
+    global _clipboard
+    with _clipboard_lock:
+        _clipboard = backend
+
+def clipboard_copy(text: str):
+    _wait_paste_settled()
+    get_clipboard().copy(text)
+
+def clipboard_paste() -> str:
+    return get_clipboard().paste()
+
+def _clipboard_sequence() -> Optional[int]:
+    # Win32 bumps this counter on every clipboard change; reading it is far
+    # cheaper than opening the clipboard, so polling it costs almost nothing.
+    # Backends without one return None and are read on every poll.
+    try:
+        return get_clipboard().sequence()
+    except Exception:
+        return None
+
+def wait_for_clipboard(predicate, timeout: float, since_seq: Optional[int] = None) -> tuple:
+    """Poll the clipboard with a short backoff until ``predicate(text)`` holds.
+
+    Returns ``(text, seconds_waited)``; ``text`` is None when ``timeout`` passed
+    first. Where the clipboard sequence number is available, the contents are
+    only read after it changed from ``since_seq``.
+    """
+    start = time.perf_counter()
+    delay = CLIPBOARD_POLL_START
+    while True:
+        seq = _clipboard_sequence()
+        if seq is None or seq != since_seq:
+            try:
+                value = clipboard_paste()
+            except Exception:
+                value = None
+            if value is not None and predicate(value):
+                return value, time.perf_counter() - start
+            since_seq = seq
+        waited = time.perf_counter() - start
+        if waited >= timeout:
+            return None, waited
+        time.sleep(min(delay, timeout - waited))
+        delay = min(delay * 2, CLIPBOARD_POLL_MAX)
+
+def get_focus_app_name() -> str:
+    """Executable name of the foreground window's process, e.g. 'outlook.exe' (Windows only)."""
+    if os.name != 'nt':
+        return ''
+    try:
+        from ctypes import wintypes
+        user32, kernel32 = ctypes.windll.user32, ctypes.windll.kernel32
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), ctypes.byref(pid))
+        handle = kernel32.OpenProcess(0x1000, False, pid.value)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ''
+        try:
+            buf = ctypes.create_unicode_buffer(260)
+            size = wintypes.DWORD(len(buf))
+            if not kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+                return ''
+            return os.path.basename(buf.value).lower()
+        finally:
+            kernel32.CloseHandle(handle)
+    except Exception:
+        return ''
+
+def _clipboard_timeout(app_name: str) -> float:
+    per_app = config.get('clipboard_app_timeouts_ms') or {}
+    value = per_app.get(app_name) if isinstance(per_app, dict) and app_name else None
+    if value is None:
+        value = config.get('clipboard_timeout_ms', DEFAULT_CLIPBOARD_TIMEOUT_MS)
+    try:
+        return max(50.0, float(value)) / 1000.0
+    except (TypeError, ValueError):
+        return DEFAULT_CLIPBOARD_TIMEOUT_MS / 1000.0
+
+def capture_selection() -> tuple:
+    """Copy the current selection; returns ``(original_clipboard, selected_text, seconds_waited)``."""
+    t0 = time.perf_counter()
+    original_clipboard_content = clipboard_paste()
+    clipboard_copy('')
+    seq = _clipboard_sequence()
+    keyboard.send('ctrl+c')
+    # Warm the API connection while waiting for the target app to fill the clipboard
+    prewarm_connection()
+    app_name = get_focus_app_name()
+    selected_text, waited = wait_for_clipboard(bool, _clipboard_timeout(app_name), seq)
+    logging.info(
+        'Clipboard capture %s in %.0f ms (%s)', 'ok' if selected_text else 'timed out', waited * 1000, app_name or '?'
+    )
+    record_metric('clipboard_capture', time.perf_counter() - t0)
+    return original_clipboard_content, selected_text or '', waited
+
+def set_clipboard(text: str) -> float:
+    """Put ``text`` on the clipboard and wait until it is readable; returns seconds waited."""
+    clipboard_copy(text)
+    _, waited = wait_for_clipboard(lambda v: v == text, CLIPBOARD_SET_TIMEOUT)
+    logging.debug('Clipboard set in %.0f ms', waited * 1000)
+    return waited
+
+def get_focus_target() -> Optional[int]:
+    """Handle of the window that had focus when the text was captured (Windows only)."""
+    if os.name != 'nt':
+        return None
+    try:
+        return int(ctypes.windll.user32.GetForegroundWindow()) or None
+    except Exception:
+        return None
+
+def _ensure_focus(target: Optional[int]) -> bool:
+    if target is None:
+        return True
+    try:
+        user32 = ctypes.windll.user32
+        if int(user32.GetForegroundWindow()) == target:
+            return True
+        if not user32.IsWindow(target):
+            return False
+        user32.SetForegroundWindow(target)
+        time.sleep(0.05)
+        return int(user32.GetForegroundWindow()) == target
+    except Exception:
+        return False
+
+def send_paste():
+    """Press ctrl+v; the next clipboard write waits until the target app had time to read it."""
+    global _last_paste
+    keyboard.send('ctrl+v')
+    _last_paste = time.monotonic()
+
+def _wait_paste_settled():
+    try:
+        settle = max(0.0, float(config.get('paste_settle_ms', DEFAULT_PASTE_SETTLE_MS))) / 1000.0
+    except (TypeError, ValueError):
+        settle = DEFAULT_PASTE_SETTLE_MS / 1000.0
+    remaining = _last_paste + settle - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+        record_metric('paste_settle', remaining)
+
+def paste_text(text: str, target: Optional[int] = None, cancel: Optional[threading.Event] = None) -> bool:
+    """Paste into the window the request came from; False if it can no longer be focused.
+
+    Raises ``OperationCancelled`` instead of pasting once ``cancel`` is set.
+    """
+    # Clipboard and synthetic keystrokes are global, so pastes never overlap
+    with _paste_lock:
+        # Checked under the lock: nothing from a cancelled task is pasted after cancel_task() returns
+        _raise_if_cancelled(cancel)
+        t0 = time.perf_counter()
+        if not _ensure_focus(target):
+            return False
+        set_clipboard(text)
+        send_paste()
+        record_metric('paste', time.perf_counter() - t0)
+        return True
+
+def paste_streamed(
+    deltas: Iterable[str], target: Optional[int] = None, cancel: Optional[threading.Event] = None
+) -> tuple:
+    """Paste pieces as they arrive.
+
+    Returns ``(status, pasted_text)``: status is True when the whole answer was
+    pasted, False when the stream broke after something was already pasted and
+    None when nothing was pasted. If the window loses focus before the first
+    piece, the stream is still read to the end and its whole answer comes back
+    with status None, so the caller need not ask the API again. Once
+    ``cancel`` is set ``OperationCancelled`` is raised; pieces pasted before
+    that stay in the document.
+    """
+    import requests
+    parts = []
+    buffered = None
+    try:
+        for piece in iter_stream_flushes(deltas):
+            if buffered is not None:
+                _raise_if_cancelled(cancel)
+                buffered.append(piece)
+            elif paste_text(piece, target, cancel):
+                parts.append(piece)
+            elif parts:
+                logging.warning('Streaming stopped: target window lost focus')
+                return False, ''.join(parts)
+            else:
+                logging.warning('Target window lost focus before the first piece; reading the rest of the stream')
+                increment_counter('stream_buffered')
+                buffered = [piece]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logging.warning('Streaming failed: %s', e)
+        return (False if parts else None), ''.join(parts)
+    if buffered is not None:
+        return None, ''.join(buffered)
+    return (True if parts else None), ''.join(parts)
+
+def _queue_policy() -> str:
+    policy = str(config.get('queue_policy', 'coalesce')).lower()
+    return policy if policy in QUEUE_POLICIES else 'coalesce'
+
+def submit_task(
+    original_clipboard_content: str, text: str, operation: str = 'rewrite', started: Optional[float] = None
+) -> bool:
+    """Queue a captured selection, applying the configured backpressure policy.
+
+    ``started`` is the ``time.perf_counter()`` of the hotkey press, used for
+    the end-to-end latency metric. Unless ``supersede_on_repeat`` is off, an
+    accepted task cancels the running ones of the same operation for the
+    same window, so only the newest selection gets pasted. A repeat with the
+    same text as one of them is not queued at all: that task's answer is
+    the one wanted, and its call is already on its way.
+    """
+    target = get_focus_target()
+    now = time.perf_counter()
+    task = {
+        'id': next(_task_ids),
+        'started': started if started is not None else now,
+        'enqueued': now,
+        'deadline': request_deadline(),
+        'cancel': threading.Event(),
+        'cancel_reason': None,
+        'operation': operation,
+        'text': text,
+        'original_clipboard': original_clipboard_content,
+        'target': target,
+        'seq': None,
+        'key': _operation_key(operation, text),
+    }
+    supersede = config.get('supersede_on_repeat', True)
+    with _active_lock:
+        previous = [t for t in _active_tasks.values() if t['target'] == target and t['operation'] == operation]
+        if supersede and any(t['key'] == task['key'] and not t['cancel'].is_set() for t in previous):
+            repeat = True
+        else:
+            repeat = False
+            # Registered before it is queued, so a fast worker cannot finish it first
+            _active_tasks[task['id']] = task
+    if repeat:
+        logging.info('Same selection already in progress for this window; not queued again')
+        increment_counter('tasks_repeated')
+        clipboard_copy(original_clipboard_content)
+        return True
+    with _order_cond:
+        task['seq'] = _order_issued.get(target, 0)
+        accepted, dropped = task_queue.offer(task, _queue_policy())
+        if accepted and task['seq'] == _order_issued.get(target, 0):
+            _order_issued[target] = task['seq'] + 1
+    for old in dropped:
+        with _active_lock:
+            _active_tasks.pop(old['id'], None)
+        # A coalesced task hands its paste turn to the new one; a dropped one gives it up
+        cancel_task(old, 'superseded' if old['seq'] == task['seq'] else 'dropped')
+        _count_cancelled(old)
+        if old['seq'] != task['seq']:
+            _finish_turn(old)
+            show_notification('Eski İstek Atlandı', 'Kuyruk dolu olduğu için en eski istek iptal edildi.')
+    if accepted and supersede:
+        for old in previous:
+            cancel_task(old, 'superseded')
+    if not accepted:
+        with _active_lock:
+            _active_tasks.pop(task['id'], None)
+        logging.info('Task rejected: queue full (%d)', task_queue.maxsize)
+        show_notification('Kuyruk Dolu', 'Önceki istekler bitmeden yeni istek alınamıyor.')
+        clipboard_copy(original_clipboard_content)
+    # The "İptal Et (n)" item is only re-read when the menu is updated
+    _refresh_tray_menu()
+    return accepted
+
+def cancel_task(task: dict, reason: str) -> bool:
+    """Cancel a queued or running task; False if it was already cancelled.
+
+    The worker stops waiting for the API and never pastes the task's result.
+    ``reason`` ('user', 'superseded', 'expired', 'dropped') ends up in the
+    ``tasks_cancelled:<reason>`` counter.
+    """
+    with _active_lock:
+        if task['cancel'].is_set():
+            return False
+        task['cancel_reason'] = reason
+        task['cancel'].set()
+    # Wake the task if it is waiting for its paste turn
+    with _order_cond:
+        _order_cond.notify_all()
+    logging.info('Task %s cancelled (%s)', task['id'], reason)
+    return True
+
+def cancel_all_tasks(reason: str = 'user') -> int:
+    """Cancel every queued and running task; returns how many were cancelled."""
+    with _active_lock:
+        tasks = list(_active_tasks.values())
+    return sum(cancel_task(task, reason) for task in tasks)
+
+def active_task_count() -> int:
+    with _active_lock:
+        return sum(1 for task in _active_tasks.values() if not task['cancel'].is_set())
 
-def save_config():
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    with config_lock:
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+def _count_cancelled(task: dict):
+    # Kept apart from tasks_failed: cancelled work is not an API error
+    increment_counter('tasks_cancelled')
+    increment_counter(f"tasks_cancelled:{task['cancel_reason']}")
 
-def rewrite_text(selected_data: str) -> Union[str, None]:
-    api_key = get_api_key()
-    if not api_key:
-        return None
-    user_prompt = f"Aşağıdaki metni, sistem talimatlarına uyarak yeniden yaz.\n\nYENİDEN YAZILACAK KISIM:\n{selected_data}"
-    try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "HTTP-Referer": SITE_URL, "X-Title": SITE_NAME, "Content-Type": "application/json",
-            },
-            json={
-                "model": config.get('model', 'qwen/qwen3-coder:free'),
-                "messages": [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}],
-            },
-            timeout=30
+def _wait_paste_turn(task: dict):
+    # Results for the same window are pasted in the order the hotkeys were pressed
+    with _order_cond:
+        ok = _order_cond.wait_for(
+            lambda: _order_turn.get(task['target'], 0) >= task['seq'] or task['cancel'].is_set(),
+            timeout=PASTE_ORDER_TIMEOUT,
         )
-        response.raise_for_status()
-        data = response.json()
-        text = data.get("choices", [{}])[0].get("message", {}).get("content")
-        return text if text and isinstance(text, str) else None
-    except (requests.exceptions.RequestException, IndexError, KeyError):
+    _raise_if_cancelled(task['cancel'])
+    if not ok:
+        logging.warning('Paste order wait timed out (seq=%s)', task['seq'])
+
+def _finish_turn(task: dict):
+    target = task['target']
+    with _order_cond:
+        done = _order_done.setdefault(target, set())
+        done.add(task['seq'])
+        turn = _order_turn.get(target, 0)
+        while turn in done:
+            done.discard(turn)
+            turn += 1
+        _order_turn[target] = turn
+        _order_cond.notify_all()
+
+def _inflight_join(key: str) -> tuple:
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        if entry is not None:
+            return entry, False
+        entry = {'event': threading.Event(), 'result': None}
+        _inflight[key] = entry
+        return entry, True
+
+def _inflight_leave(key: str, entry: dict, result: Union[str, None], cancelled: bool = False):
+    entry['result'] = result
+    entry['cancelled'] = cancelled
+    with _inflight_lock:
+        if _inflight.get(key) is entry:
+            del _inflight[key]
+    entry['event'].set()
+
+def _await_inflight(entry: dict, cancel: Optional[threading.Event]) -> bool:
+    """Wait for an identical call started by another task; True if that task was cancelled."""
+    while not entry['event'].wait(CANCEL_POLL_INTERVAL):
+        _raise_if_cancelled(cancel)
+    return entry['cancelled']
+
+def _operation_key(operation: str, text: str) -> str:
+    return response_cache_key(operation, TRANSLATE_PROMPT if operation == 'translate' else SYSTEM_PROMPT, text)
+
+def _quote_attribution(lines: list, i: int) -> int:
+    """Number of lines (1 or 2) of an "On ... wrote:" line starting at ``i``, or 0."""
+    if QUOTE_ATTRIBUTION_RE.match(lines[i]):
+        return 1
+    if i + 1 < len(lines) and QUOTE_ATTRIBUTION_RE.match(lines[i] + ' ' + lines[i + 1].strip()):
+        return 2
+    return 0
+
+def _thread_start(lines: list) -> int:
+    """Index of the line where the quoted thread, a signature marker or a legal footer begins."""
+    end = len(lines)
+    for i, line in enumerate(lines):
+        if SIGNATURE_MARK_RE.match(line) or QUOTE_SEPARATOR_RE.match(line):
+            end = i
+            break
+        if QUOTE_FROM_RE.match(line) and sum(1 for l in lines[i + 1:i + 6] if QUOTE_FIELD_RE.match(l)) >= 2:
+            end = i
+            break
+        span = _quote_attribution(lines, i)
+        # Followed by '>' lines it is an inline quote; those are handled line by line
+        if span and not any(QUOTE_LINE_RE.match(l) for l in lines[i + span:i + span + 2] if l.strip()):
+            end = i
+            break
+    # Footers only count when nothing but the footer follows, up to the thread
+    for i in range(max(1, end - FOOTER_MAX_LINES), end):
+        if FOOTER_START_RE.match(lines[i]) and FOOTER_RULE_RE.match(lines[i - 1]):
+            # Two different legal phrases; one alone is easily part of a normal sentence
+            if len({m.lower() for m in FOOTER_WORDS_RE.findall(' '.join(lines[i:end]))}) >= 2:
+                return i - 1 if lines[i - 1].strip() else i
+    return end
+
+def _signature_line(line: str) -> bool:
+    # Names, titles, phone numbers and addresses; not sentences
+    line = line.strip()
+    if len(line) > 80:
+        return False
+    if re.search(r'[\d@|]|www\.', line):
+        return True
+    words = line.split()
+    # "A.Ş." and "Ltd. Şti." end with a dot too; a sentence ends with a word and one dot
+    sentence_end = line[-1:] in '!?' or (line.endswith('.') and words[-1].count('.') == 1 and len(words[-1]) > 4)
+    return len(words) <= SIGNATURE_MAX_WORDS and not sentence_end and not line.endswith(',')
+
+def split_authored(text: str) -> Optional[list]:
+    """Split an email into ``[(piece, authored), ...]``; joining the pieces gives back ``text``.
+
+    Quoted replies (Outlook/Gmail headers, "On ... wrote:", ``>`` lines), the
+    signature after a ``--`` line or a closing such as "Saygılarımla," and
+    legal footers are not authored. Authored pieces carry no leading or
+    trailing whitespace. Returns None when there is nothing to set aside, or
+    nothing authored is left.
+    """
+    lines = text.splitlines(keepends=True)
+    bare = [line.rstrip('\r\n') for line in lines]
+    cut = _thread_start(bare)
+    authored = [i < cut for i in range(len(lines))]
+    i = 0
+    quoting = False
+    while i < cut:
+        if not QUOTE_LINE_RE.match(bare[i]):
+            i += 1
+            continue
+        # The attribution line above the quote and blank lines in between go with it
+        k = i - 1
+        while k >= 0 and authored[k] and not bare[k].strip():
+            k -= 1
+        for span in (1, 2):
+            if k - span + 1 >= 0 and authored[k - span + 1] and _quote_attribution(bare, k - span + 1) == span:
+                for j in range(k - span + 1, i):
+                    authored[j] = False
+                quoting = True
+                break
+        if not quoting:
+            # Without an "On ... wrote:" above, '>' lines may be a Markdown quote the user wrote
+            while i < cut and QUOTE_LINE_RE.match(bare[i]):
+                i += 1
+            continue
+        # Blank lines inside a quote belong to it
+        while i < cut and (QUOTE_LINE_RE.match(bare[i]) or (
+                not bare[i].strip() and i + 1 < cut and QUOTE_LINE_RE.match(bare[i + 1]))):
+            authored[i] = False
+            i += 1
+    # A closing among the last few authored lines, followed only by name-like lines
+    written = [i for i in range(len(lines)) if authored[i] and bare[i].strip()]
+    for n, v in enumerate(reversed(written[-SIGNATURE_MAX_LINES - 1:-1])):
+        if not all(authored[v:written[-1] + 1]):
+            break
+        if VALEDICTION_RE.match(bare[v]):
+            if all(_signature_line(bare[j]) for j in written[len(written) - 1 - n:]):
+                for j in range(v + 1, written[-1] + 1):
+                    authored[j] = False
+            break
+
+    pieces = []
+    for line, mine in zip(lines, authored):
+        if pieces and pieces[-1][1] == mine:
+            pieces[-1][0] += line
+        else:
+            pieces.append([line, mine])
+    result = []
+    for piece, mine in pieces:
+        body = piece.strip()
+        if mine and body:
+            start = len(piece) - len(piece.lstrip())
+            parts = [(piece[:start], False), (body, True), (piece[start + len(body):], False)]
+        else:
+            parts = [(piece, False)]
+        for part, kind in parts:
+            if not part:
+                continue
+            if result and result[-1][1] == kind:
+                result[-1] = (result[-1][0] + part, kind)
+            else:
+                result.append((part, kind))
+    if not any(kind for _, kind in result) or not any(part.strip() for part, kind in result if not kind):
         return None
+    return result
 
-def translate_text_tr_en(selected_data: str) -> Union[str, None]:
-    api_key = get_api_key()
-    if not api_key:
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _set_aside(operation: str, text: str) -> Optional[list]:
+    """``split_authored`` for an API call, when ``strip_quoted`` is on; counts what was saved.
+
+    Translations keep the whole text unless ``strip_quoted_translate`` is on:
+    set-aside Turkish quotes would otherwise stay Turkish in the English result.
+    """
+    _trace_local.tokens_saved = 0
+    if not config.get('strip_quoted', True):
         return None
-    user_prompt = f"Translate the following Turkish text into fluent, natural English. Keep tone and meaning.\n\nTEXT:\n{selected_data}"
-    try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "HTTP-Referer": SITE_URL, "X-Title": SITE_NAME, "Content-Type": "application/json",
-            },
-            json={
-                "model": config.get('model', 'qwen/qwen3-coder:free'),
-                "messages": [{"role": "system", "content": TRANSLATE_PROMPT}, {"role": "user", "content": user_prompt}],
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        data = response.json()
-        text = data.get("choices", [{}])[0].get("message", {}).get("content")
-        return text if text and isinstance(text, str) else None
-    except (requests.exceptions.RequestException, IndexError, KeyError):
+    if operation == 'translate' and not config.get('strip_quoted_translate', False):
         return None
+    t0 = time.perf_counter()
+    pieces = split_authored(text)
+    record_metric('input_trim', time.perf_counter() - t0)
+    if pieces is None:
+        return None
+    kept = sum(len(piece) for piece, authored in pieces if not authored)
+    saved = estimate_tokens(text) - estimate_tokens(''.join(piece for piece, authored in pieces if authored))
+    _trace_local.tokens_saved = saved
+    increment_counter('input_trimmed')
+    increment_counter('input_chars_saved', kept)
+    increment_counter('input_tokens_saved', saved)
+    logging.info('Set aside %d of %d chars (~%d input tokens saved)', kept, len(text), saved)
+    return pieces
 
-def processing_worker():
-    while True:
-        original_clipboard_content, selected_text = task_queue.get()
-        show_notification('İşlem Başlatılıyor...')
-        
-        if isinstance(selected_text, str) and selected_text.startswith('__TRANSLATE__::'):
-            payload = selected_text.split('::', 1)[1]
-            corrected_text = translate_text_tr_en(payload)
-        else:
-            corrected_text = rewrite_text(selected_text)
-
-        if corrected_text:
-            # AI'dan gelen yanıtın sonundaki tüm boşlukları/satır sonlarını temizle.
-            final_text = corrected_text.rstrip()
-            
-            # Her koşulda, sonuna bir Windows "Enter" karakteri ekle.
-            final_text += '\r\n\r\n'
-
-            pyperclip.copy(final_text)
-            time.sleep(0.1)
-            keyboard.send('ctrl+v')
+def _call_operation(operation: str, text: str) -> Union[str, None]:
+    return translate_text_tr_en(text) if operation == 'translate' else rewrite_text(text)
+
+def _stream_call(operation: str, text: str) -> Iterator[str]:
+    return stream_translate_text_tr_en(text) if operation == 'translate' else stream_rewrite_text(text)
+
+def _run_operation(operation: str, text: str) -> Union[str, None]:
+    pieces = _set_aside(operation, text)
+    if pieces is None:
+        return _call_operation(operation, text)
+    written = [piece for piece, authored in pieces if authored]
+    if len(written) == 1:
+        outputs = [_call_operation(operation, written[0])]
+    else:
+        # Inline replies between quotes: one call per reply, side by side
+        task = tuple(getattr(_trace_local, name, None) for name in ('task_id', 'cancel', 'deadline'))
+
+        def run(body: str) -> Union[str, None]:
+            _trace_local.task_id, _trace_local.cancel, _trace_local.deadline = task
+            return _call_operation(operation, body)
+
+        outputs = list(_map_ordered(run, written, _config_int('chunk_concurrency', DEFAULT_CHUNK_CONCURRENCY, 1)))
+    if not all(out and out.strip() for out in outputs):
+        return None
+    answers = iter(outputs)
+    return ''.join(next(answers).strip() if authored else piece for piece, authored in pieces)
+
+def _iter_set_aside(operation: str, pieces: list) -> Iterator[str]:
+    # Set-aside text goes out with the first delta of the answer after it, so
+    # nothing is pasted before the model has produced something
+    pending = ''
+    for piece, authored in pieces:
+        if not authored:
+            pending += piece
+            continue
+        produced = False
+        held = ''
+        for delta in _stream_call(operation, piece):
+            text = held + delta
+            if not produced:
+                text = text.lstrip()
+            body = text.rstrip()
+            held = text[len(body):]
+            if body:
+                yield pending + body
+                pending = ''
+                produced = True
+        if not produced:
+            raise ValueError('empty answer for an authored part')
+    if pending:
+        yield pending
+
+def _stream_operation(operation: str, text: str) -> Iterator[str]:
+    pieces = _set_aside(operation, text)
+    if pieces is None:
+        return _stream_call(operation, text)
+    return _iter_set_aside(operation, pieces)
+
+def _join_operation(key: str, cancel: Optional[threading.Event]) -> tuple:
+    # Identical texts already on their way to the API share that one call
+    entry, leader = _inflight_join(key)
+    while not leader and _await_inflight(entry, cancel):
+        # The shared call went away with the task that started it; make our own
+        entry, leader = _inflight_join(key)
+    return entry, leader
+
+def _lead_operation(key: str, entry: dict, operation: str, text: str) -> Union[str, None]:
+    try:
+        result = _run_operation(operation, text)
+    except OperationCancelled:
+        _inflight_leave(key, entry, None, cancelled=True)
+        raise
+    except BaseException:
+        _inflight_leave(key, entry, None)
+        raise
+    _inflight_leave(key, entry, result)
+    return result
+
+def complete_operation(operation: str, text: str, cancel: Optional[threading.Event] = None) -> Union[str, None]:
+    """Rewrite or translate ``text`` the way the hotkey workers do, without pasting.
+
+    Shares the call with an identical request already in flight, whether it
+    came from a hotkey or the local server. The raw model answer is returned
+    (technical tokens not yet stripped), or None on failure.
+    """
+    key = _operation_key(operation, text)
+    entry, leader = _join_operation(key, cancel)
+    if not leader:
+        return entry['result']
+    return _lead_operation(key, entry, operation, text)
+
+def _process_task(task: dict):
+    show_notification('İşlem Başlatılıyor...')
+    operation = task['operation']
+    cancel = task['cancel']
+    payload = task['text']
+    original_clipboard_content = task['original_clipboard']
+    target = task['target']
+
+    streaming = bool(config.get('stream_output', False))
+    if streaming:
+        # Streamed pieces go straight into the document, so take the paste turn
+        # before the request starts (and before joining an identical one).
+        _wait_paste_turn(task)
+
+    key = task['key']
+    entry, leader = _join_operation(key, cancel)
+    corrected_text = None
+    if not leader:
+        corrected_text = entry['result']
+    elif streaming:
+        try:
+            streamed, streamed_text = paste_streamed(_stream_operation(operation, payload), target, cancel)
+        except OperationCancelled:
+            _inflight_leave(key, entry, None, cancelled=True)
+            raise
+        except BaseException:
+            _inflight_leave(key, entry, None)
+            raise
+        if streamed is True:
+            _inflight_leave(key, entry, streamed_text)
+            task['outcome'] = 'ok'
+            record_metric('end_to_end', time.perf_counter() - task['started'])
+            record_history(task, streamed_text)
+            show_notification('İşlem Başarılı!', 'Metin düzeltildi ve yapıştırıldı.')
+            return
+        if streamed is False:
+            _inflight_leave(key, entry, None)
+            task['outcome'] = 'partial'
+            # Part of the answer is already in the document; do not paste it twice
+            show_notification('İşlem Yarıda Kaldı', 'Yanıtın bir kısmı yapıştırıldı. API hatası olabilir.')
+            clipboard_copy(original_clipboard_content)
+            return
+        if streamed_text:
+            # The window lost focus before the first piece; the answer was read from the same stream
+            _inflight_leave(key, entry, streamed_text)
+            corrected_text = streamed_text
+            leader = False
+        # Otherwise nothing came back: fall back to the buffered request below
+    if leader:
+        corrected_text = _lead_operation(key, entry, operation, payload)
+    # An answer that arrives after the task was cancelled is stale; drop it
+    _raise_if_cancelled(cancel)
+
+    t0 = time.perf_counter()
+    if corrected_text:
+        corrected_text = strip_technical_tokens(corrected_text)
+    if corrected_text and corrected_text.strip():
+        # AI'dan gelen yanıtın sonundaki tüm boşlukları/satır sonlarını temizle.
+        final_text = corrected_text.rstrip()
+
+        # Her koşulda, sonuna bir Windows "Enter" karakteri ekle.
+        final_text += '\r\n\r\n'
+        record_metric('post_process', time.perf_counter() - t0)
+
+        _wait_paste_turn(task)
+        if paste_text(final_text, target, cancel):
+            task['outcome'] = 'ok'
+            record_metric('end_to_end', time.perf_counter() - task['started'])
+            record_history(task, final_text)
             show_notification('İşlem Başarılı!', 'Metin düzeltildi ve yapıştırıldı.')
         else:
-            show_notification('İşlem Başarısız Oldu', 'Metin düzeltilemedi. API hatası olabilir.')
-            pyperclip.copy(original_clipboard_content)
-        task_queue.task_done()
+            # The source window is gone; never paste into whatever has focus now
+            task['outcome'] = 'clipboard'
+            clipboard_copy(final_text)
+            show_notification('Sonuç Panoya Kopyalandı', 'Hedef pencere bulunamadı. CTRL+V ile yapıştırabilirsiniz.')
+    else:
+        increment_counter('tasks_failed')
+        task['outcome'] = 'failed'
+        _wait_paste_turn(task)
+        show_notification('İşlem Başarısız Oldu', 'Metin düzeltilemedi. API hatası olabilir.')
+        clipboard_copy(original_clipboard_content)
 
-def get_latest_screenshot_path() -> Union[str, None]:
+def processing_worker():
+    while True:
+        task = task_queue.get()
+        _trace_local.task_id = task['id']
+        _trace_local.cancel = task['cancel']
+        _trace_local.deadline = task['deadline']
+        _trace_local.served_by = None
+        _trace_local.tokens_saved = 0
+        recording = _recorder_on
+        if recording:
+            _trace_local.stages = {}
+        record_metric('queue_wait', time.perf_counter() - task['enqueued'])
+        try:
+            if time.monotonic() >= task['deadline']:
+                cancel_task(task, 'expired')
+            _raise_if_cancelled(task['cancel'])
+            _process_task(task)
+        except OperationCancelled:
+            _count_cancelled(task)
+            task['outcome'] = f"cancelled:{task['cancel_reason']}"
+            logging.info('Task %s discarded (%s)', task['id'], task['cancel_reason'])
+            if task['cancel_reason'] == 'expired':
+                show_notification('İstek Zaman Aşımına Uğradı', 'Sonuç süresinde gelmediği için yapıştırılmadı.')
+            if task['cancel_reason'] != 'superseded':
+                # The newer task owns the clipboard when superseded; otherwise give it back
+                with _paste_lock:
+                    clipboard_copy(task['original_clipboard'])
+        except Exception:
+            task['outcome'] = 'error'
+            logging.exception('Processing task failed')
+        finally:
+            if recording:
+                record_trace_event(
+                    'task', t=_trace_time(task['started']), id=task['id'], op=task['operation'],
+                    chars=len(task['text']), win=_trace_window(task['target']), h=_trace_digest(task['text']),
+                    model=getattr(_trace_local, 'served_by', None), outcome=task.get('outcome', 'failed'),
+                    saved=getattr(_trace_local, 'tokens_saved', 0),
+                    done=_trace_time(time.perf_counter()), ms=_trace_stages(),
+                )
+            _trace_local.task_id = '-'
+            _trace_local.cancel = None
+            _trace_local.deadline = None
+            with _active_lock:
+                _active_tasks.pop(task['id'], None)
+            _finish_turn(task)
+            task_queue.task_done()
+            _refresh_tray_menu()
+
+def start_workers():
+    global worker_threads
+    count = min(8, _config_int('worker_count', DEFAULT_WORKER_COUNT, 1))
+    task_queue.maxsize = _config_int('queue_size', DEFAULT_QUEUE_SIZE, 1)
+    worker_threads = [threading.Thread(target=processing_worker, daemon=True) for _ in range(count)]
+    for t in worker_threads:
+        t.start()
+    logging.info('Started %d worker(s), queue size %d, policy %s', count, task_queue.maxsize, _queue_policy())
+
+def _history_limits() -> tuple:
+    return (
+        _config_int('history_size', DEFAULT_HISTORY_SIZE, 0),
+        _config_int('history_max_kb', DEFAULT_HISTORY_MAX_KB, 0) * 1024,
+    )
+
+def _history_cost(entry: dict) -> int:
+    return len(entry['original']) + len(entry['result'])
+
+def _trim_history(size: int, budget: int):
+    # Caller holds _history_lock
+    global _history_chars
+    while _history and (len(_history) > size or _history_chars > budget):
+        _history_chars -= _history_cost(_history.popleft())
+
+def _history_connection():
+    global _history_db
+    if _history_db is None:
+        import sqlite3
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        db = sqlite3.connect(HISTORY_PATH, check_same_thread=False)
+        # Must precede table creation; deleted rows then give their pages back to the disk
+        db.execute('PRAGMA auto_vacuum = FULL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY, created REAL, operation TEXT, '
+            'model TEXT, seconds REAL, original TEXT, result TEXT, target INTEGER)'
+        )
+        _history_db = db
+    return _history_db
+
+def _persist_history(entry: dict, size: int, budget: int):
+    import sqlite3
+    try:
+        with _history_db_lock:
+            db = _history_connection()
+            with db:
+                # Window handles are reused after a restart, so the target is never stored
+                db.execute(
+                    'INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, NULL)',
+                    tuple(entry[k] for k in ('id', 'created', 'operation', 'model', 'seconds', 'original', 'result')),
+                )
+                # Same caps as the ring: the newest rows that fit both limits
+                total, cut = 0, None
+                rows = db.execute(
+                    'SELECT id, length(original) + length(result) FROM history ORDER BY id DESC'
+                ).fetchall()
+                for i, (row_id, chars) in enumerate(rows):
+                    total += chars
+                    if i >= size or total > budget:
+                        cut = row_id
+                        break
+                if cut is not None:
+                    db.execute('DELETE FROM history WHERE id <= ?', (cut,))
+    except (sqlite3.Error, OSError) as e:
+        logging.warning('History store failed: %s', e)
+
+def load_history():
+    """Fill the history ring from HISTORY_PATH when ``history_persist`` is on."""
+    global _history_chars, _history_next_id
+    if not config.get('history_persist', False) or not os.path.exists(HISTORY_PATH):
+        return
+    import sqlite3
+    size, budget = _history_limits()
+    columns = ('id', 'created', 'operation', 'model', 'seconds', 'original', 'result')
+    try:
+        with _history_db_lock:
+            rows = _history_connection().execute(
+                f'SELECT {", ".join(columns)} FROM history ORDER BY id DESC LIMIT ?', (size,)
+            ).fetchall()
+    except (sqlite3.Error, OSError) as e:
+        logging.warning('History load failed: %s', e)
+        return
+    with _history_lock:
+        for row in rows:
+            # Loaded entries go to the focused window; the old handle may belong to another one now
+            entry = dict(zip(columns, row), target=None)
+            _history.appendleft(entry)
+            _history_chars += _history_cost(entry)
+            _history_next_id = max(_history_next_id, entry['id'] + 1)
+        _trim_history(size, budget)
+    logging.info('History: %d entries loaded', len(rows))
+
+def record_history(task: dict, result: str) -> Optional[dict]:
+    """Remember a pasted result so it can be pasted again without an API call."""
+    global _history_chars, _history_next_id
+    size, budget = _history_limits()
+    entry = {
+        'created': time.time(),
+        'operation': task['operation'],
+        'model': getattr(_trace_local, 'served_by', None) or config.get('model', 'qwen/qwen3-coder:free'),
+        'seconds': round(time.perf_counter() - task['started'], 3),
+        'original': task['text'],
+        'result': result,
+        'target': task['target'],
+    }
+    if not size or _history_cost(entry) > budget:
+        return None
+    with _history_lock:
+        entry['id'] = _history_next_id
+        _history_next_id += 1
+        _history.append(entry)
+        _history_chars += _history_cost(entry)
+        _trim_history(size, budget)
+    if config.get('history_persist', False):
+        _persist_history(entry, size, budget)
+    _refresh_tray_menu()
+    return entry
+
+def history_entries() -> list:
+    """History entries, newest first."""
+    with _history_lock:
+        return list(reversed(_history))
+
+def clear_history():
+    global _history_chars
+    with _history_lock:
+        _history.clear()
+        _history_chars = 0
+    if os.path.exists(HISTORY_PATH):
+        import sqlite3
+        try:
+            with _history_db_lock:
+                db = _history_connection()
+                with db:
+                    db.execute('DELETE FROM history')
+        except (sqlite3.Error, OSError) as e:
+            logging.warning('History clear failed: %s', e)
+    _refresh_tray_menu()
+
+def repaste_history(entry_id: Optional[int] = None, original: bool = False, to_source: bool = False) -> bool:
+    """Paste a history entry's result (or its original text) again; no network call.
+
+    ``entry_id`` None means the newest entry. The text goes to the focused
+    window, or with ``to_source`` to the window the entry was pasted into,
+    falling back to the clipboard when that window is gone. Entries loaded
+    from HISTORY_PATH do not know their window and go to the focused one.
+    The original text is pasted at the cursor; the pasted result is not
+    replaced.
+    """
+    with _history_lock:
+        entry = next((e for e in reversed(_history) if entry_id is None or e['id'] == entry_id), None)
+    if entry is None:
+        show_notification('Geçmiş Boş', 'Yeniden yapıştırılacak sonuç yok.')
+        return False
+    text = entry['original'] if original else entry['result']
+    _release_modifiers()
+    t0 = time.perf_counter()
+    if paste_text(text, entry['target'] if to_source else None):
+        record_metric('repaste', time.perf_counter() - t0)
+        increment_counter('history_repastes')
+        show_notification('Orijinal Yapıştırıldı' if original else 'Yeniden Yapıştırıldı')
+        return True
+    clipboard_copy(text)
+    show_notification('Sonuç Panoya Kopyalandı', 'Hedef pencere bulunamadı. CTRL+V ile yapıştırabilirsiniz.')
+    return False
+
+def get_screenshot_dirs() -> list:
+    dirs = config.get('screenshot_dirs')
+    if isinstance(dirs, list) and dirs:
+        return [os.path.expandvars(os.path.expanduser(str(d))) for d in dirs if str(d).strip()]
     # Common screenshot directories (EN & TR)
     home = os.path.expanduser('~')
     onedrive = os.getenv('ONEDRIVE') or os.path.join(home, 'OneDrive')
-    candidates = [
+    return [
         os.path.join(home, 'Pictures', 'Screenshots'),
         os.path.join(onedrive, 'Pictures', 'Screenshots'),
         os.path.join(home, 'Resimler', 'Ekran görüntüleri'),
         os.path.join(home, 'Resimler', 'Ekran Görüntüleri'),
     ]
-    exts = {'.png', '.jpg', '.jpeg', '.bmp'}
+
+def get_screenshot_extensions() -> set:
+    exts = config.get('screenshot_extensions')
+    if isinstance(exts, list) and exts:
+        return {('.' + str(e).lower().lstrip('.')) for e in exts}
+    return {'.png', '.jpg', '.jpeg', '.bmp'}
+
+def _scan_screenshot_dir(base: str, exts: set) -> dict:
+    # scandir gets type and (on Windows) mtime from the directory listing itself,
+    # instead of isfile + getmtime system calls per entry.
+    newest_path, newest_mtime = None, -1.0
+    with os.scandir(base) as it:
+        for entry in it:
+            if os.path.splitext(entry.name)[1].lower() not in exts:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                mt = entry.stat().st_mtime
+            except OSError:
+                continue
+            if mt > newest_mtime:
+                newest_path, newest_mtime = entry.path, mt
+    return {'path': newest_path, 'mtime': newest_mtime}
+
+def _refresh_screenshot_dir(base: str, exts: set, force: bool = False) -> Optional[dict]:
+    """Index entry for ``base``; rescans only when the directory itself changed."""
+    try:
+        dir_mtime = os.stat(base).st_mtime_ns
+    except OSError:
+        with _shot_lock:
+            _shot_index.pop(base, None)
+        return None
+    with _shot_lock:
+        entry = _shot_index.get(base)
+        if entry is not None and not force and entry['dir_mtime'] == dir_mtime and entry['exts'] == exts:
+            return entry
+    try:
+        found = _scan_screenshot_dir(base, exts)
+    except OSError:
+        return None
+    entry = {'dir_mtime': dir_mtime, 'exts': exts, **found}
+    with _shot_lock:
+        _shot_index[base] = entry
+    return entry
+
+def _note_screenshot_file(base: str, path: str):
+    """Watcher hook: a file in ``base`` was created or written; update the index in O(1)."""
+    try:
+        mt = os.stat(path).st_mtime
+        dir_mtime = os.stat(base).st_mtime_ns
+    except OSError:
+        return
+    with _shot_lock:
+        entry = _shot_index.get(base)
+        if entry is None or os.path.splitext(path)[1].lower() not in entry['exts']:
+            return
+        if mt >= entry['mtime']:
+            entry['path'], entry['mtime'] = path, mt
+        entry['dir_mtime'] = dir_mtime
+
+def get_latest_screenshot_path() -> Union[str, None]:
+    exts = get_screenshot_extensions()
     newest_file = None
     newest_mtime = -1.0
-    for base in candidates:
-        if not os.path.isdir(base):
+    for base in get_screenshot_dirs():
+        entry = _refresh_screenshot_dir(base, exts)
+        if entry is None:
             continue
+        if entry['path'] and not os.path.isfile(entry['path']):
+            # Newest file was removed without the directory mtime changing yet
+            entry = _refresh_screenshot_dir(base, exts, force=True) or entry
+        if entry['path'] and entry['mtime'] > newest_mtime:
+            newest_mtime = entry['mtime']
+            newest_file = entry['path']
+    return newest_file
+
+def _watch_screenshot_dir_win32(base: str):
+    # ReadDirectoryChangesW through ctypes, like Win32Clipboard, so no pywin32 is needed
+    import struct
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.CreateFileW.argtypes = [
+        wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID, wintypes.DWORD, wintypes.DWORD,
+        wintypes.HANDLE,
+    ]
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    kernel32.ReadDirectoryChangesW.argtypes = [
+        wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD, wintypes.BOOL, wintypes.DWORD,
+        ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID, wintypes.LPVOID,
+    ]
+    kernel32.ReadDirectoryChangesW.restype = wintypes.BOOL
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    kernel32.CloseHandle.restype = wintypes.BOOL
+    handle = kernel32.CreateFileW(
+        base, 0x0001,  # FILE_LIST_DIRECTORY
+        0x0007,  # FILE_SHARE_READ | FILE_SHARE_WRITE | FILE_SHARE_DELETE
+        None, 3,  # OPEN_EXISTING
+        0x02000000,  # FILE_FLAG_BACKUP_SEMANTICS, required to open a directory
+        None,
+    )
+    if not handle or handle == wintypes.HANDLE(-1).value:
+        raise ctypes.WinError(ctypes.get_last_error())
+    # FILE_NOTIFY_INFORMATION records must be DWORD-aligned
+    buf = (wintypes.DWORD * 2048)()
+    returned = wintypes.DWORD()
+    try:
+        while base in _shot_watched:
+            if not kernel32.ReadDirectoryChangesW(
+                handle, buf, ctypes.sizeof(buf), False,
+                0x0001 | 0x0010,  # FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_LAST_WRITE
+                ctypes.byref(returned), None, None,
+            ):
+                raise ctypes.WinError(ctypes.get_last_error())
+            data = ctypes.string_at(buf, returned.value)
+            # Zero bytes means the buffer overflowed and the changes were lost
+            rescan = not data
+            offset = 0
+            while data:
+                next_offset, action, length = struct.unpack_from('<III', data, offset)
+                name = data[offset + 12:offset + 12 + length].decode('utf-16-le')
+                if action in (1, 3, 5):  # added, modified, renamed to
+                    _note_screenshot_file(base, os.path.join(base, name))
+                else:  # removed or renamed away: cheap enough to rescan lazily
+                    rescan = True
+                if not next_offset:
+                    break
+                offset += next_offset
+            if rescan:
+                with _shot_lock:
+                    entry = _shot_index.get(base)
+                    if entry is not None:
+                        entry['dir_mtime'] = None
+    finally:
+        kernel32.CloseHandle(handle)
+
+def _screenshot_watch_thread(base: str):
+    _refresh_screenshot_dir(base, get_screenshot_extensions())
+    if os.name == 'nt':
         try:
-            for name in os.listdir(base):
-                p = os.path.join(base, name)
-                if not os.path.isfile(p):
-                    continue
-                _, ext = os.path.splitext(name)
-                if ext.lower() not in exts:
-                    continue
-                try:
-                    mt = os.path.getmtime(p)
-                    if mt > newest_mtime:
-                        newest_mtime = mt
-                        newest_file = p
-                except Exception:
-                    continue
-        except Exception:
+            _watch_screenshot_dir_win32(base)
+            return
+        except Exception as e:
+            logging.info('Screenshot watcher unavailable for %s (%s); polling instead', base, e)
+    # Fallback: a directory stat every few seconds keeps the index warm
+    while base in _shot_watched:
+        time.sleep(SCREENSHOT_POLL_INTERVAL)
+        _refresh_screenshot_dir(base, get_screenshot_extensions())
+
+def start_screenshot_index():
+    """Build the newest-screenshot index in the background and keep it up to date."""
+    for base in get_screenshot_dirs():
+        if base in _shot_watched or not os.path.isdir(base):
             continue
-    return newest_file
+        _shot_watched.add(base)
+        threading.Thread(target=_screenshot_watch_thread, args=(base,), daemon=True).start()
 
-def on_hotkey_paste_last_screenshot_path():
+def _release_modifiers():
+    # Ensure modifier keys are not held by the user
+    try:
+        keyboard.release('alt')
+        keyboard.release('left alt')
+        keyboard.release('right alt')
+        keyboard.release('ctrl')
+        keyboard.release('shift')
+        keyboard.release('left shift')
+        keyboard.release('right shift')
+        keyboard.release('windows')
+    except Exception:
+        pass
+
+def _paste_last_screenshot_path():
     p = get_latest_screenshot_path()
     if not p:
         show_notification('Ekran görüntüsü bulunamadı')
@@ -328,43 +3928,101 @@ def on_hotkey_paste_last_screenshot_path():
     def _paste():
         try:
             # Put path to clipboard
-            pyperclip.copy(p)
-            time.sleep(0.12)
-            # Ensure modifier keys are not held by the user
-            try:
-                keyboard.release('alt')
-                keyboard.release('left alt')
-                keyboard.release('right alt')
-                keyboard.release('ctrl')
-                keyboard.release('shift')
-                keyboard.release('left shift')
-                keyboard.release('right shift')
-                keyboard.release('windows')
-            except Exception:
-                pass
+            set_clipboard(p)
+            _release_modifiers()
             if bool(config.get('screenshot_path_auto_paste', True)):
                 # Paste into the focused field
-                keyboard.send('ctrl+v')
+                send_paste()
                 show_notification('Yol Yapıştırıldı', p)
             else:
                 show_notification('Yol panoya kopyalandı', p)
         except Exception:
             show_notification('Yapıştırılamadı')
 
-    threading.Thread(target=_paste, daemon=True).start()
+    _paste()
 
  
 
-def on_hotkey_translate():
-    original_clipboard_content = pyperclip.paste()
-    pyperclip.copy('')
-    keyboard.send('ctrl+c')
-    time.sleep(0.2)
-    selected_text = pyperclip.paste()
+def _capture_and_submit(operation: str, started: float) -> Optional[str]:
+    original_clipboard_content, selected_text, _ = capture_selection()
     if selected_text:
-        task_queue.put((original_clipboard_content, f"__TRANSLATE__::{selected_text}"))
+        submit_task(original_clipboard_content, selected_text, operation, started)
     else:
-        pyperclip.copy(original_clipboard_content)
+        clipboard_copy(original_clipboard_content)
+    return selected_text
+
+def run_hotkey(kind: str, started: Optional[float] = None):
+    """Do the work behind a hotkey (clipboard capture, submit, screenshot paste) on the calling thread."""
+    if started is None:
+        started = time.perf_counter()
+    recording = _recorder_on
+    if recording:
+        _trace_local.stages = {}
+    selected = None
+    if kind == 'screenshot_path':
+        _paste_last_screenshot_path()
+    elif kind == 'repaste':
+        repaste_history()
+    else:
+        selected = _capture_and_submit(kind, started)
+    if recording:
+        event = {'t': _trace_time(started), 'kind': kind, 'win': _trace_window(get_focus_target())}
+        if selected is not None:
+            event.update(chars=len(selected), lines=selected.count('\n') + 1, h=_trace_digest(selected))
+        event['ms'] = _trace_stages()
+        record_trace_event('hotkey', **event)
+
+def _hotkey_debounce() -> float:
+    try:
+        return max(0.0, float(config.get('hotkey_debounce_ms', DEFAULT_HOTKEY_DEBOUNCE_MS))) / 1000.0
+    except (TypeError, ValueError):
+        return DEFAULT_HOTKEY_DEBOUNCE_MS / 1000.0
+
+def _post_hotkey(kind: str):
+    # Runs on the keyboard hook thread: no I/O, no locks, no sleeping.
+    now = time.perf_counter()
+    last = _hotkey_last.get(kind, 0.0)
+    _hotkey_last[kind] = now
+    if now - last < _hotkey_debounce_s or kind in _hotkey_pending:
+        # Auto-repeat of a held key, a double press, or one already waiting
+        _hotkey_stats['debounced'] += 1
+        if _recorder_on:
+            record_trace_event('press', t=_trace_time(now), kind=kind, debounced=True)
+        return
+    if _recorder_on:
+        record_trace_event('press', t=_trace_time(now), kind=kind)
+    _hotkey_pending.add(kind)
+    _hotkey_events.put((kind, now))
+
+def _capture_loop():
+    global _hotkey_debounce_s
+    while True:
+        kind, pressed = _hotkey_events.get()
+        _hotkey_pending.discard(kind)
+        record_metric('hotkey_dispatch', time.perf_counter() - pressed)
+        try:
+            run_hotkey(kind, pressed)
+        except Exception as e:
+            logging.exception('Hotkey %s failed: %s', kind, e)
+        # Picked up here rather than read from config on the hook thread
+        _hotkey_debounce_s = _hotkey_debounce()
+
+def start_capture_thread():
+    global _capture_thread, _hotkey_debounce_s
+    _hotkey_debounce_s = _hotkey_debounce()
+    if _capture_thread is not None and _capture_thread.is_alive():
+        return
+    _capture_thread = threading.Thread(target=_capture_loop, name='capture', daemon=True)
+    _capture_thread.start()
+
+def on_hotkey_paste_last_screenshot_path():
+    _post_hotkey('screenshot_path')
+
+def on_hotkey_translate():
+    _post_hotkey('translate')
+
+def on_hotkey_repaste():
+    _post_hotkey('repaste')
 
 def start_listener():
     global is_listening, hotkey_handlers
@@ -373,6 +4031,8 @@ def start_listener():
     hk = config.get('hotkey', default_hotkey)
     hk_tr = config.get('hotkey_translate', default_translate_hotkey)
     hk_ss = config.get('hotkey_screenshot_path', default_screenshot_path_hotkey)
+    hk_rp = config.get('hotkey_repaste', default_repaste_hotkey)
+    start_capture_thread()
     hotkey_handlers = [
         keyboard.add_hotkey(hk, on_hotkey_activate, suppress=True),
         keyboard.add_hotkey(hk_tr, on_hotkey_translate, suppress=True),
@@ -381,7 +4041,11 @@ def start_listener():
         hotkey_handlers.append(
             keyboard.add_hotkey(hk_ss, on_hotkey_paste_last_screenshot_path, suppress=True)
         )
+    if hk_rp:
+        hotkey_handlers.append(keyboard.add_hotkey(hk_rp, on_hotkey_repaste, suppress=True))
     is_listening = True
+    prewarm_connection()
+    start_keepalive()
     try:
         hk_ss_disp = hk_ss.upper() if hk_ss else 'YOK'
     except Exception:
@@ -404,29 +4068,119 @@ def stop_listener():
     is_listening = False
     show_notification('Dinleyici Kapalı')
 
-def fetch_models(api_key: str) -> list[str]:
+def _model_entry(item) -> Optional[dict]:
+    if not isinstance(item, dict) or not item.get('id'):
+        return None
+    pricing = item.get('pricing') if isinstance(item.get('pricing'), dict) else {}
+    return {
+        'id': str(item['id']),
+        'name': str(item.get('name') or ''),
+        'context_length': item.get('context_length'),
+        'pricing': {'prompt': pricing.get('prompt'), 'completion': pricing.get('completion')},
+    }
+
+def load_model_catalog() -> dict:
+    """Model catalog persisted by the last refresh for the current API base URL ({} if none)."""
     try:
-        r = requests.get(
-            "https://openrouter.ai/api/v1/models",
-            headers={"Authorization": f"Bearer {api_key}", "HTTP-Referer": SITE_URL, "X-Title": SITE_NAME},
-            timeout=20,
-        )
-        r.raise_for_status()
-        data = r.json()
-        arr = data.get('data', [])
-        ids = [x.get('id') for x in arr if isinstance(x, dict) and x.get('id')]
-        return ids if ids else []
-    except Exception:
-        return []
+        with open(MODELS_CACHE_PATH, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(catalog, dict) or catalog.get('base_url') != get_api_base_url():
+        return {}
+    return catalog
+
+def _save_model_catalog(catalog: dict):
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp = MODELS_CACHE_PATH + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False)
+        os.replace(tmp, MODELS_CACHE_PATH)
+    except OSError as e:
+        logging.warning('Model catalog save failed: %s', e)
+
+def model_catalog_is_fresh(catalog: dict) -> bool:
+    try:
+        ttl = float(config.get('models_ttl_hours', DEFAULT_MODELS_TTL_HOURS)) * 3600.0
+    except (TypeError, ValueError):
+        ttl = DEFAULT_MODELS_TTL_HOURS * 3600.0
+    return bool(catalog.get('models')) and time.time() - float(catalog.get('fetched', 0)) < ttl
+
+def refresh_model_catalog(api_key: str, catalog: Optional[dict] = None) -> Union[dict, None]:
+    """Revalidate ``catalog`` against the API (ETag / Last-Modified); None on failure."""
+    catalog = catalog if catalog is not None else load_model_catalog()
+    headers = {"Authorization": f"Bearer {api_key}", "HTTP-Referer": SITE_URL, "X-Title": SITE_NAME}
+    if catalog.get('models'):
+        if catalog.get('etag'):
+            headers['If-None-Match'] = catalog['etag']
+        if catalog.get('last_modified'):
+            headers['If-Modified-Since'] = catalog['last_modified']
+    try:
+        r = get_http_session().get(f"{get_api_base_url()}/models", headers=headers, timeout=20)
+        _mark_http_used()
+        if r.status_code == 304:
+            catalog = dict(catalog, fetched=time.time())
+        else:
+            r.raise_for_status()
+            arr = r.json().get('data', [])
+            models = [m for m in (_model_entry(x) for x in arr) if m]
+            if not models:
+                return None
+            catalog = {
+                'base_url': get_api_base_url(),
+                'fetched': time.time(),
+                'etag': r.headers.get('ETag'),
+                'last_modified': r.headers.get('Last-Modified'),
+                'models': models,
+            }
+    except Exception as e:
+        logging.info('Model catalog refresh failed: %s', e)
+        return None
+    with _models_lock:
+        _save_model_catalog(catalog)
+    return catalog
+
+def fetch_models(api_key: str) -> list[str]:
+    catalog = load_model_catalog()
+    if not model_catalog_is_fresh(catalog):
+        catalog = refresh_model_catalog(api_key, catalog) or catalog
+    return [m['id'] for m in catalog.get('models', [])]
+
+def describe_model(entry: Optional[dict]) -> str:
+    if not entry:
+        return ''
+    parts = []
+    ctx = entry.get('context_length')
+    if ctx:
+        parts.append(f'Bağlam: {int(ctx):,} token'.replace(',', '.'))
+    for label, key in (('Girdi', 'prompt'), ('Çıktı', 'completion')):
+        try:
+            per_token = float((entry.get('pricing') or {}).get(key))
+        except (TypeError, ValueError):
+            continue
+        parts.append(f'{label}: ${per_token * 1_000_000:.2f}/M' if per_token else f'{label}: ücretsiz')
+    return ' · '.join(parts)
 
 def open_settings():
+    import keyring
+    import tkinter as tk
+    from tkinter import ttk, messagebox
     api_key_existing = get_api_key() or ''
-    mlist = fetch_models(api_key_existing) if api_key_existing else []
+    # Show the cached catalog at once; a stale one is revalidated in the background
+    catalog = load_model_catalog()
+    models_by_id = {m['id']: m for m in catalog.get('models', [])}
+    refreshed = queue.Queue()
+    refreshing = bool(api_key_existing) and not model_catalog_is_fresh(catalog)
+    if refreshing:
+        threading.Thread(
+            target=lambda: refreshed.put(refresh_model_catalog(api_key_existing, catalog)), daemon=True
+        ).start()
     root = tk.Tk()
     root.title('Ayarlar')
     # Wider window; allow horizontal resize for flexible width
-    root.geometry('720x240')
-    root.minsize(640, 240)
+    root.geometry('720x390')
+    root.minsize(640, 360)
     root.resizable(True, False)
     frm = ttk.Frame(root, padding=12)
     frm.pack(fill='both', expand=True)
@@ -451,34 +4205,77 @@ def open_settings():
     # Model selection
     ttk.Label(frm, text='Model').grid(row=1, column=0, sticky='w')
     model_var = tk.StringVar(value=config.get('model', 'qwen/qwen3-coder:free'))
-    if mlist:
-        model_input = ttk.Combobox(frm, textvariable=model_var, values=mlist)
-    else:
-        model_input = ttk.Entry(frm, textvariable=model_var)
+    model_input = ttk.Combobox(frm, textvariable=model_var, values=sorted(models_by_id))
     model_input.grid(row=1, column=1, columnspan=2, sticky='we')
+    model_info_var = tk.StringVar()
+    ttk.Label(frm, textvariable=model_info_var, foreground='gray').grid(row=2, column=1, columnspan=2, sticky='w')
+
+    def update_model_info(*_):
+        model_info_var.set(describe_model(models_by_id.get(model_var.get().strip())))
+
+    def filter_models(event=None):
+        # Typing narrows the dropdown to matching ids/names, using the cached metadata
+        needle = model_var.get().strip().lower()
+        ids = sorted(models_by_id)
+        if needle and needle not in models_by_id:
+            ids = [i for i in ids if needle in i.lower() or needle in models_by_id[i]['name'].lower()]
+        model_input.configure(values=ids)
+
+    def poll_refresh():
+        try:
+            fresh = refreshed.get_nowait()
+        except queue.Empty:
+            root.after(200, poll_refresh)
+            return
+        if fresh:
+            models_by_id.clear()
+            models_by_id.update({m['id']: m for m in fresh.get('models', [])})
+            filter_models()
+            update_model_info()
+
+    model_var.trace_add('write', update_model_info)
+    model_input.bind('<KeyRelease>', filter_models)
+    update_model_info()
+    if refreshing:
+        root.after(200, poll_refresh)
 
     # Hotkeys
-    ttk.Label(frm, text='Kısayol (Düzeltme)').grid(row=2, column=0, sticky='w')
+    ttk.Label(frm, text='Kısayol (Düzeltme)').grid(row=3, column=0, sticky='w')
     hotkey_var = tk.StringVar(value=config.get('hotkey', default_hotkey))
     hotkey_entry = ttk.Entry(frm, textvariable=hotkey_var)
-    hotkey_entry.grid(row=2, column=1, columnspan=2, sticky='we')
+    hotkey_entry.grid(row=3, column=1, columnspan=2, sticky='we')
 
-    ttk.Label(frm, text='Kısayol (Çeviri TR→EN)').grid(row=3, column=0, sticky='w')
+    ttk.Label(frm, text='Kısayol (Çeviri TR→EN)').grid(row=4, column=0, sticky='w')
     hotkey_tr_var = tk.StringVar(value=config.get('hotkey_translate', default_translate_hotkey))
     hotkey_tr_entry = ttk.Entry(frm, textvariable=hotkey_tr_var)
-    hotkey_tr_entry.grid(row=3, column=1, columnspan=2, sticky='we')
+    hotkey_tr_entry.grid(row=4, column=1, columnspan=2, sticky='we')
 
-    ttk.Label(frm, text='Kısayol (Son ekran görüntüsü yolu)').grid(row=4, column=0, sticky='w')
+    ttk.Label(frm, text='Kısayol (Son ekran görüntüsü yolu)').grid(row=5, column=0, sticky='w')
     hotkey_ss_var = tk.StringVar(value=config.get('hotkey_screenshot_path', default_screenshot_path_hotkey))
     hotkey_ss_entry = ttk.Entry(frm, textvariable=hotkey_ss_var)
-    hotkey_ss_entry.grid(row=4, column=1, columnspan=2, sticky='we')
+    hotkey_ss_entry.grid(row=5, column=1, columnspan=2, sticky='we')
 
     auto_paste_var = tk.BooleanVar(value=bool(config.get('screenshot_path_auto_paste', True)))
-    ttk.Checkbutton(frm, text='Otomatik yapıştır', variable=auto_paste_var).grid(row=5, column=1, sticky='w')
+    ttk.Checkbutton(frm, text='Otomatik yapıştır', variable=auto_paste_var).grid(row=6, column=1, sticky='w')
+
+    stream_var = tk.BooleanVar(value=bool(config.get('stream_output', False)))
+    ttk.Checkbutton(frm, text='Akışlı yanıt (cümle cümle yapıştır)', variable=stream_var).grid(row=7, column=1, sticky='w')
+
+    cache_var = tk.BooleanVar(value=bool(config.get('cache_enabled', True)))
+    ttk.Checkbutton(frm, text='Yanıt önbelleği (aynı metin için API çağrısı yapma)', variable=cache_var).grid(row=8, column=1, sticky='w')
+
+    # Fallback models, tried in order when the main model fails or is slow
+    ttk.Label(frm, text='Yedek modeller (virgülle)').grid(row=9, column=0, sticky='w')
+    fallback_var = tk.StringVar(value=', '.join(model_chain()[1:]))
+    ttk.Entry(frm, textvariable=fallback_var).grid(row=9, column=1, columnspan=2, sticky='we')
+
+    ttk.Label(frm, text='Kısayol (Son sonucu yeniden yapıştır)').grid(row=10, column=0, sticky='w')
+    hotkey_rp_var = tk.StringVar(value=config.get('hotkey_repaste', default_repaste_hotkey))
+    ttk.Entry(frm, textvariable=hotkey_rp_var).grid(row=10, column=1, columnspan=2, sticky='we')
 
     # Buttons
     btns = ttk.Frame(frm)
-    btns.grid(row=6, column=0, columnspan=3, pady=10)
+    btns.grid(row=11, column=0, columnspan=3, pady=10)
 
     def save_and_close():
         k = api_var.get().strip()
@@ -493,16 +4290,24 @@ def open_settings():
         except Exception:
             messagebox.showerror('Hata', 'API key kaydedilemedi/silinemedi')
             return
-        with config_lock:
-            config['model'] = model_var.get().strip() or config.get('model', 'qwen/qwen3-coder:free')
-            hk = hotkey_var.get().strip() or default_hotkey
-            hk_tr = hotkey_tr_var.get().strip() or default_translate_hotkey
-            # Allow disabling screenshot-path hotkey by leaving it blank
-            hk_ss = hotkey_ss_var.get().strip()
-            config['hotkey'] = hk
-            config['hotkey_translate'] = hk_tr
-            config['hotkey_screenshot_path'] = hk_ss
-            config['screenshot_path_auto_paste'] = bool(auto_paste_var.get())
+        hk = hotkey_var.get().strip() or default_hotkey
+        hk_tr = hotkey_tr_var.get().strip() or default_translate_hotkey
+        # Allow disabling screenshot-path and re-paste hotkeys by leaving them blank
+        hk_ss = hotkey_ss_var.get().strip()
+        hk_rp = hotkey_rp_var.get().strip()
+        # Both snapshots are swapped in one go; requests in flight keep the old ones
+        update_config({
+            'model': model_var.get().strip() or config.get('model', 'qwen/qwen3-coder:free'),
+            'hotkey': hk,
+            'hotkey_translate': hk_tr,
+            'hotkey_screenshot_path': hk_ss,
+            'hotkey_repaste': hk_rp,
+            'screenshot_path_auto_paste': bool(auto_paste_var.get()),
+            'stream_output': bool(stream_var.get()),
+            'cache_enabled': bool(cache_var.get()),
+            'fallback_models': [m.strip() for m in fallback_var.get().split(',') if m.strip()],
+        })
+        set_api_key_snapshot(k)
         save_config()
         if is_listening:
             stop_listener()
@@ -522,6 +4327,7 @@ def open_settings():
     root.mainloop()
 
 def create_tray_image() -> Image.Image:
+    from PIL import Image, ImageDraw
     try:
         # icon.ico dosyasını yükle
         img = Image.open('icon.ico')
@@ -561,6 +4367,62 @@ def menu_settings(icon, item):
     except Exception:
         pass
 
+def menu_clear_cache(icon, item):
+    clear_response_cache()
+    _refresh_tray_menu()
+    show_notification('Önbellek Temizlendi')
+
+def menu_cancel(icon, item):
+    count = cancel_all_tasks()
+    _refresh_tray_menu()
+    if count:
+        show_notification('İstekler İptal Edildi', f'{count} istek iptal edildi; sonuçları yapıştırılmayacak.')
+
+def _cancel_menu_text(item) -> str:
+    return f'İptal Et ({active_task_count()})'
+
+def _has_active_tasks(item) -> bool:
+    return active_task_count() > 0
+
+def _refresh_tray_menu():
+    # Dynamic items (history, task and cache counts) are re-read when the menu is rebuilt
+    if tray_icon is not None:
+        try:
+            tray_icon.update_menu()
+        except Exception:
+            pass
+
+def _history_label(entry: dict) -> str:
+    preview = ' '.join(entry['result'].split())
+    if len(preview) > HISTORY_PREVIEW_CHARS:
+        preview = preview[:HISTORY_PREVIEW_CHARS - 1] + '…'
+    kind = 'Çeviri' if entry['operation'] == 'translate' else 'Düzeltme'
+    return f"{time.strftime('%H:%M', time.localtime(entry['created']))} {kind}: {preview}"
+
+def _history_action(entry_id: int, original: bool):
+    # pystray actions take (icon, item); bind the entry here
+    def action(icon, item):
+        repaste_history(entry_id, original=original, to_source=True)
+    return action
+
+def _history_menu_items():
+    import pystray
+    entries = history_entries()[:HISTORY_MENU_ITEMS]
+    if not entries:
+        yield pystray.MenuItem('(boş)', None, enabled=False)
+        return
+    for entry in entries:
+        yield pystray.MenuItem(_history_label(entry), pystray.Menu(
+            pystray.MenuItem('Sonucu Yapıştır', _history_action(entry['id'], original=False)),
+            pystray.MenuItem('Orijinali Yapıştır', _history_action(entry['id'], original=True)),
+        ))
+    yield pystray.Menu.SEPARATOR
+    yield pystray.MenuItem('Geçmişi Temizle', lambda icon, item: clear_history())
+
+def _cache_menu_text(item) -> str:
+    hits = cache_stats['memory_hits'] + cache_stats['disk_hits']
+    return f"Önbelleği Temizle (isabet {hits} / ıska {cache_stats['misses']})"
+
 def menu_exit(icon, item):
     try:
         icon.stop()
@@ -572,10 +4434,14 @@ def menu_exit(icon, item):
         pass
 
 def build_menu():
+    import pystray
     return pystray.Menu(
         pystray.MenuItem('Başlat', menu_start, default=False, enabled=not is_listening),
         pystray.MenuItem('Durdur', menu_stop, default=False, enabled=is_listening),
+        pystray.MenuItem(_cancel_menu_text, menu_cancel, enabled=_has_active_tasks),
+        pystray.MenuItem('Geçmiş', pystray.Menu(_history_menu_items)),
         pystray.MenuItem('Ayarlar', menu_settings),
+        pystray.MenuItem(_cache_menu_text, menu_clear_cache),
         pystray.MenuItem('Çıkış', menu_exit)
     )
 
@@ -597,21 +4463,394 @@ def ui_dispatch_loop():
         ui_queue.task_done()
 
 def on_hotkey_activate():
-    original_clipboard_content = pyperclip.paste()
-    pyperclip.copy('')
-    keyboard.send('ctrl+c')
-    time.sleep(0.2)
-    selected_text = pyperclip.paste()
-    if selected_text:
-        task_queue.put((original_clipboard_content, selected_text))
-    else:
-        pyperclip.copy(original_clipboard_content)
+    _post_hotkey('rewrite')
+
+def _batch_target(src: str, rel: str, out_dir: Optional[str], suffix: str) -> str:
+    if out_dir:
+        return os.path.join(out_dir, rel)
+    stem, ext = os.path.splitext(src)
+    return stem + suffix + ext
+
+def iter_batch_jobs(paths: list, out_dir: Optional[str], suffix: str, extensions: tuple) -> Iterator[tuple]:
+    """Yield ``(source, target)`` for every input file; directories are walked recursively."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, _batch_target(path, os.path.basename(path), out_dir, suffix)
+            continue
+        skip = os.path.abspath(out_dir) if out_dir else None
+        for root, dirs, files in os.walk(path):
+            # Never pick up our own outputs when --out lies inside an input folder
+            dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip)
+            for name in sorted(files):
+                stem, ext = os.path.splitext(name)
+                if ext.lower() not in extensions or (not out_dir and stem.endswith(suffix)):
+                    continue
+                src = os.path.join(root, name)
+                yield src, _batch_target(src, os.path.relpath(src, path), out_dir, suffix)
+
+def _batch_done(src: str, dst: str) -> bool:
+    # Outputs are written atomically, so an existing, newer one is complete
+    try:
+        return os.path.getmtime(dst) >= os.path.getmtime(src)
+    except OSError:
+        return False
+
+def _batch_process(text: str, operation: str) -> Union[str, None]:
+    result = translate_text_tr_en(text) if operation == 'translate' else rewrite_text(text)
+    if result:
+        result = strip_technical_tokens(result).strip()
+    return result or None
+
+def _batch_file(src: str, dst: str, operation: str) -> tuple:
+    t0 = time.perf_counter()
+    with open(src, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        text = f.read()
+    if not text.strip():
+        return 'empty', len(text), time.perf_counter() - t0
+    result = _batch_process(text, operation)
+    if result is None:
+        return 'fail', len(text), time.perf_counter() - t0
+    if os.path.dirname(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + '.part'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(result + '\n')
+    os.replace(tmp, dst)
+    return 'ok', len(text), time.perf_counter() - t0
+
+def _batch_report(fut, src: str, dst: str) -> dict:
+    try:
+        status, chars, seconds = fut.result()
+    except Exception as e:
+        logging.warning('Batch: %s failed: %s', src, e)
+        status, chars, seconds = 'fail', 0, 0.0
+    print(f'{status:<5} {seconds * 1000:8.0f} ms  {src}', file=sys.stderr)
+    return {'source': src, 'target': dst, 'status': status, 'chars': chars, 'seconds': round(seconds, 3)}
+
+def run_batch(argv: list) -> int:
+    """``--batch`` entry point: polish or translate files without tray, Tk or hotkeys.
+
+    Up to ``--concurrency`` files are in flight at a time and only that many
+    are read ahead. Results go next to the inputs (``name.polished.txt`` /
+    ``name.en.txt``) or into ``--out`` with the same relative paths. Outputs
+    are written atomically, so an interrupted run can simply be restarted:
+    files whose output is newer than the input are skipped unless ``--force``.
+    Without paths, stdin is processed and the result written to stdout.
+    """
+    import argparse
+    ap = argparse.ArgumentParser(prog='CopyPolish --batch', description='Metinleri toplu düzelt veya çevir.')
+    ap.add_argument('--batch', action='store_true', help=argparse.SUPPRESS)
+    ap.add_argument('paths', nargs='*', help="files or folders; '-' or nothing reads stdin")
+    ap.add_argument('--translate', action='store_true', help='TR->EN translation instead of rewriting')
+    ap.add_argument('--concurrency', type=int, default=DEFAULT_BATCH_CONCURRENCY)
+    ap.add_argument('--out', help='output folder (default: next to each input)')
+    ap.add_argument('--suffix', help='output name suffix when writing next to the inputs')
+    ap.add_argument('--ext', default=','.join(BATCH_EXTENSIONS), help='extensions to pick up in folders')
+    ap.add_argument('--force', action='store_true', help='redo files that already have an up-to-date output')
+    ap.add_argument('--report', help='write per-file results and totals as JSON to this file')
+    for flag in ('--debug', '--profile', '--no-admin', '--trace'):
+        ap.add_argument(flag, action='store_true', help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    load_config()
+    env_key = os.getenv('OPENROUTER_API_KEY')
+    if env_key:
+        set_api_key_snapshot(env_key)
+    if not cached_api_key() and len(get_providers()) < 2:
+        print('API key bulunamadı: Ayarlar penceresinden veya OPENROUTER_API_KEY ile ayarlayın.', file=sys.stderr)
+        return 2
+    operation = 'translate' if args.translate else 'rewrite'
+
+    if not args.paths or args.paths == ['-']:
+        result = _batch_process(sys.stdin.read(), operation)
+        if result is None:
+            print('İşlem başarısız oldu.', file=sys.stderr)
+            return 1
+        sys.stdout.write(result + '\n')
+        return 0
+
+    suffix = args.suffix or ('.en' if args.translate else '.polished')
+    extensions = tuple('.' + e.strip().lstrip('.').lower() for e in args.ext.split(',') if e.strip())
+    jobs = iter_batch_jobs(args.paths, args.out, suffix, extensions)
+    concurrency = max(1, args.concurrency)
+    results = []
+    skipped = 0
+    t0 = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    pending = {}
+    try:
+        for src, dst in jobs:
+            if not args.force and _batch_done(src, dst):
+                skipped += 1
+                continue
+            while len(pending) >= concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results.append(_batch_report(fut, *pending.pop(fut)))
+            pending[pool.submit(_batch_file, src, dst, operation)] = (src, dst)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results.append(_batch_report(fut, *pending.pop(fut)))
+    except KeyboardInterrupt:
+        print('Durduruldu; tekrar çalıştırınca kalan dosyalardan devam eder.', file=sys.stderr)
+        return 130
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r['status'] == 'ok']
+    failed = [r for r in results if r['status'] == 'fail']
+    latencies = sorted(r['seconds'] for r in ok)
+    chars = sum(r['chars'] for r in ok)
+    totals = {
+        'ok': len(ok),
+        'failed': len(failed),
+        'empty': len(results) - len(ok) - len(failed),
+        'skipped': skipped,
+        'wall_s': round(wall, 3),
+        'files_per_s': round(len(ok) / wall, 2) if wall else 0.0,
+        'chars_per_s': round(chars / wall, 1) if wall else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+    print(
+        f"{totals['ok']} tamam, {totals['failed']} başarısız, {totals['empty']} boş, {skipped} atlandı | "
+        f"{wall:.1f} sn, {totals['files_per_s']} dosya/sn, {totals['chars_per_s']:.0f} karakter/sn | "
+        f"p50 {totals['p50_ms']:.0f} ms, p95 {totals['p95_ms']:.0f} ms, en uzun {totals['max_ms']:.0f} ms",
+        file=sys.stderr,
+    )
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'totals': totals, 'files': results}, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+_server_handler_cls = None
+_api_server = None
+_server_slots: Optional[threading.BoundedSemaphore] = None
+_server_ids = itertools.count(1)
+
+def _server_handler_class():
+    """Request handler of the local API server (built on first use)."""
+    global _server_handler_cls
+    if _server_handler_cls is not None:
+        return _server_handler_cls
+    from http.server import BaseHTTPRequestHandler
+
+    class _ApiHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = APP_NAME
+
+        def setup(self):
+            super().setup()
+            # Headers, body and events are separate writes; Nagle + delayed ACK would add ~40 ms
+            import socket
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format, *args):
+            logging.debug('Server: ' + format, *args)
+
+        def _send_json(self, status: int, obj: dict, headers: Optional[dict] = None):
+            body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_event(self, data):
+            payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+            chunk = f'data: {payload}\n\n'.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.flush()
+
+        def _reject(self, status: int, error: str):
+            # The request body is left unread, so the connection cannot carry another request
+            self.close_connection = True
+            self._send_json(status, {'error': error}, {'Connection': 'close'})
+
+        def _authorized(self) -> bool:
+            token = str(config.get('server_token') or '')
+            if not token:
+                return True
+            return hmac.compare_digest(self.headers.get('Authorization', ''), f'Bearer {token}')
+
+        def _host_allowed(self) -> bool:
+            # Without a token, a DNS-rebinding page could reach us under its own host name
+            if config.get('server_token'):
+                return True
+            host = self.headers.get('Host', '').strip().lower()
+            if ':' in host:
+                host, _, port = host.rpartition(':')
+                if not port.isdigit():
+                    return False
+            return host in SERVER_HOSTS
+
+        def do_GET(self):
+            if not self._host_allowed():
+                self._reject(403, 'host not allowed')
+            elif self.path.split('?', 1)[0] == '/health':
+                self._send_json(200, {'status': 'ok', 'listening': is_listening})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            operation = SERVER_ROUTES.get(self.path.split('?', 1)[0])
+            if not self._host_allowed():
+                self._reject(403, 'host not allowed')
+                return
+            if operation is None:
+                self._reject(404, 'not found')
+                return
+            if not self._authorized():
+                self._reject(401, 'invalid token')
+                return
+            # Browsers cannot send a JSON body to another origin without a preflight,
+            # which is never answered, so web pages cannot use the user's API key
+            if 'application/json' not in self.headers.get('Content-Type', ''):
+                self._reject(415, 'Content-Type must be application/json')
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if not 0 < length <= SERVER_MAX_BODY:
+                self._reject(413 if length > SERVER_MAX_BODY else 400, 'bad body length')
+                return
+            try:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+            except (UnicodeDecodeError, ValueError):
+                body = None
+            text = body.get('text') if isinstance(body, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                self._send_json(400, {'error': "'text' must be a non-empty string"})
+                return
+            if not _server_slots.acquire(timeout=SERVER_BUSY_WAIT):
+                increment_counter('server_busy')
+                self._send_json(429, {'error': 'busy'}, {'Retry-After': '1'})
+                return
+            _trace_local.task_id = f'srv{next(_server_ids)}'
+            _trace_local.cancel = threading.Event()
+            _trace_local.deadline = request_deadline()
+            increment_counter('server_requests')
+            t0 = time.perf_counter()
+            try:
+                if body.get('stream'):
+                    self._serve_stream(operation, text)
+                else:
+                    self._serve_complete(operation, text)
+            finally:
+                record_metric('server_request', time.perf_counter() - t0)
+                _trace_local.task_id = '-'
+                _trace_local.cancel = None
+                _trace_local.deadline = None
+                _server_slots.release()
+                # Cache hits and misses show in the tray menu
+                _refresh_tray_menu()
+
+        def _serve_complete(self, operation: str, text: str):
+            result = complete_operation(operation, text, _trace_local.cancel)
+            result = strip_technical_tokens(result).strip() if result else ''
+            if result:
+                self._send_json(200, {'text': result})
+            else:
+                increment_counter('server_failed')
+                self._send_json(502, {'error': 'API request failed'})
+
+        def _serve_stream(self, operation: str, text: str):
+            # Server-sent events: {"delta": ...} per sentence, then [DONE] or {"error": ...}
+            import requests
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            pieces = iter_stream_flushes(_stream_operation(operation, text))
+            sent = False
+            error = None
+            try:
+                try:
+                    for piece in pieces:
+                        # Only the last piece carries the paste path's trailing line breaks
+                        piece = piece[:-4] if piece.endswith('\r\n\r\n') else piece
+                        if piece:
+                            self._send_event({'delta': piece})
+                            sent = True
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    error = str(e)
+                if not sent and error is None:
+                    # The stream ended cleanly but empty (e.g. a blank answer); a failed
+                    # stream is reported as is rather than paying for a second call
+                    result = complete_operation(operation, text, _trace_local.cancel)
+                    result = strip_technical_tokens(result).strip() if result else ''
+                    if result:
+                        self._send_event({'delta': result})
+                    else:
+                        error = 'API request failed'
+                if error is not None:
+                    increment_counter('server_failed')
+                    self._send_event({'error': error})
+                else:
+                    self._send_event('[DONE]')
+                self.wfile.write(b'0\r\n\r\n')
+            except OSError:
+                # The client went away; closing the generator drops the upstream stream
+                increment_counter('server_disconnects')
+                self.close_connection = True
+            finally:
+                pieces.close()
+
+    _server_handler_cls = _ApiHandler
+    return _server_handler_cls
+
+def start_server(port: Optional[int] = None):
+    """Serve rewrite/translate on 127.0.0.1 (``server_port``); returns the server, or None if it cannot listen.
+
+    ``POST /v1/rewrite`` and ``/v1/translate`` take ``{"text": ..., "stream": false}``
+    and answer ``{"text": ...}``, or server-sent events with ``"stream": true``.
+    At most ``server_concurrency`` requests run at a time; others wait
+    ``SERVER_BUSY_WAIT`` seconds for a slot and then get 429. With
+    ``server_token`` set, requests need ``Authorization: Bearer <token>``.
+    """
+    global _api_server, _server_slots
+    if _api_server is not None:
+        return _api_server
+    from http.server import ThreadingHTTPServer
+    if port is None:
+        port = _config_int('server_port', DEFAULT_SERVER_PORT, 0)
+    _server_slots = threading.BoundedSemaphore(_config_int('server_concurrency', DEFAULT_SERVER_CONCURRENCY, 1))
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', port), _server_handler_class())
+    except OSError as e:
+        logging.warning('Local API server cannot listen on port %s: %s', port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='api-server', daemon=True).start()
+    _api_server = server
+    logging.info('Local API server on http://127.0.0.1:%d', server.server_address[1])
+    return server
+
+def stop_server():
+    global _api_server
+    server, _api_server = _api_server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
 
 def main():
+    global profile_enabled
     debug = has_flag('--debug')
+    # --profile: log a timing line for every pipeline stage of every request
+    profile_enabled = has_flag('--profile')
     setup_logging(debug)
     sys.excepthook = _excepthook
-    logging.info('Starting CopyPolish (pid=%s)', os.getpid())
+    logging.info('Starting CopyPolish (pid=%s, profile=%s)', os.getpid(), profile_enabled)
+    if has_flag('--batch'):
+        # Headless: no elevation, console hiding, hotkeys, tray or Tk
+        sys.exit(run_batch(sys.argv[1:]))
     # Always require administrator privileges on Windows (can be disabled with --no-admin)
     if os.name == 'nt' and not has_flag('--no-admin'):
         try:
@@ -650,12 +4889,26 @@ def main():
         logging.info('Debug mode active: console will remain visible')
     load_config()
     logging.info('Config loaded from %s', CONFIG_PATH)
-    worker_thread = threading.Thread(target=processing_worker, daemon=True)
-    worker_thread.start()
-    logging.info('Worker thread started')
+    # Before any hotkey can add an entry, so ids continue after the stored ones
+    load_history()
+    start_workers()
+    # Hotkeys first; metrics, the screenshot index and the tray come up after
     start_listener()
+    record_metric('startup', time.perf_counter() - _process_started)
+    # Load the API key off the hotkey path (keyring backends can take tens of ms)
+    threading.Thread(target=refresh_api_key, daemon=True).start()
+    # Open the clipboard window / X connection before the first hotkey needs it
+    threading.Thread(target=get_clipboard, daemon=True).start()
+    logging.info('Listener ready %.0f ms after import', (time.perf_counter() - _process_started) * 1000)
+    start_metrics()
+    if config.get('trace_enabled', False) or has_flag('--trace'):
+        start_trace_recorder()
+    start_screenshot_index()
+    if config.get('server_enabled', False):
+        start_server()
     global tray_icon
     try:
+        import pystray
         tray_icon = pystray.Icon(APP_NAME, create_tray_image(), APP_NAME, build_menu())
         tray_icon.run_detached()
         logging.info('Tray icon started')
@@ -670,6 +4923,10 @@ def main():
         pass
     finally:
         stop_listener()
+        stop_server()
+        stop_trace_recorder()
+        close_http_session()
+        dump_metrics()
         try:
             if tray_icon:
                 tray_icon.stop()